@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+# per frame ingestion cost of the relay path against reading the gazebo cameras directly.
+# uses the ROS python message and cv_bridge libraries but no running master, the socket
+# transfer itself is not included, serialisation and deserialisation stand in for each TCPROS hop.
+# usage: python3 benchmarks/bench_ingestion.py [size]
+# the live end to end latency of both modes is reported by joint_angles with _profiling:=true
+
+import io
+import os
+import sys
+import numpy as np
+from sensor_msgs.msg import Image
+from cv_bridge import CvBridge
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from ivr_assignment.image_messages import bgr8_image
+from timing import measure, format_time
+
+
+def serialize(msg):
+  buff = io.BytesIO()
+  msg.serialize(buff)
+  return buff.getvalue()
+
+
+def deserialize(data):
+  msg = Image()
+  msg.deserialize(data)
+  return msg
+
+
+def main(args):
+  size = int(args[1]) if len(args) > 1 else 800
+  bridge = CvBridge()
+  rng = np.random.default_rng(0)
+  # gazebo publishes rgb8 frames
+  camera_msg = bridge.cv2_to_imgmsg(rng.integers(0, 256, (size,size,3), dtype=np.uint8), "rgb8")
+  camera_data = serialize(camera_msg)
+
+  def imgmsg_to_bgr8(msg):
+    return bridge.imgmsg_to_cv2(msg, "bgr8")
+
+  def relay_path():
+    # image1.py: camera -> opencv -> image_topic1
+    relay_input = deserialize(camera_data)
+    relay_msg = bridge.cv2_to_imgmsg(bgr8_image(relay_input, imgmsg_to_bgr8), "bgr8")
+    relay_msg.header = relay_input.header
+    # joint_angles: image_topic1 -> opencv
+    return bgr8_image(deserialize(serialize(relay_msg)), imgmsg_to_bgr8)
+
+  def original_relay_path():
+    # the same hops with cv_bridge conversions on both sides
+    relay_msg = bridge.cv2_to_imgmsg(bridge.imgmsg_to_cv2(deserialize(camera_data), "bgr8"), "bgr8")
+    return bridge.imgmsg_to_cv2(deserialize(serialize(relay_msg)), "bgr8")
+
+  def raw_path():
+    # joint_angles with _camera_source:=raw
+    return bgr8_image(deserialize(camera_data), imgmsg_to_bgr8)
+
+  assert np.array_equal(relay_path(), raw_path()) and np.array_equal(original_relay_path(), raw_path())
+  results = [(name, measure(func)['median']) for name, func in
+             [('original relay', original_relay_path), ('relay', relay_path), ('raw camera', raw_path)]]
+  baseline = results[0][1]
+  print("%dx%d frame, per camera:" % (size, size))
+  for name, median in results:
+    print("%-16s %12s  x%.2f" % (name, format_time(median), baseline/median))
+
+
+if __name__ == '__main__':
+  main(sys.argv)
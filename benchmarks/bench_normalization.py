@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+# compares the integer rgb_normalizer against the original float normalisation
+# usage: python3 benchmarks/bench_normalization.py [repeats]
+
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from ivr_assignment.normalization import rgb_normalizer, normalize_rgb_float
+
+
+def main(args):
+  repeats = int(args[1]) if len(args) > 1 else 20
+  rng = np.random.default_rng(0)
+  normalizer = rgb_normalizer()
+
+  for size in (400, 800, 1600):
+    img = rng.integers(0, 256, (size,size,3), dtype=np.uint8)
+
+    if not np.array_equal(normalizer.normalize(img), normalize_rgb_float(img)):
+      print("output mismatch at " + str(size) + "x" + str(size))
+      sys.exit(1)
+
+    float_time = min(timeit.repeat(lambda: normalize_rgb_float(img), number=1, repeat=repeats))
+    int_time = min(timeit.repeat(lambda: normalizer.normalize(img), number=1, repeat=repeats))
+    print("%dx%d: float %.2f ms, integer %.2f ms, speedup %.2fx" % (size, size, float_time*1000, int_time*1000, float_time/int_time))
+
+
+if __name__ == '__main__':
+  main(sys.argv)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# throughput and centroid error of pyramid detection against full resolution detection,
+# on synthetic frames or on a recording made with frame_recorder.py
+#
+# usage: python3 benchmarks/bench_pyramid.py [--factors 2 4 8] [--frames 30] [--recording path]
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from ivr_assignment.pipeline import camera_view
+from ivr_assignment.colour_classifier import JOINT_NAMES
+from ivr_assignment.recording import frame_recording
+from synthetic import synthetic_frames
+
+POINT_NAMES = JOINT_NAMES + ['target']
+
+
+def detect_all(view, frames):
+  # (frames,5,2) joint and target centroids, NaN when missing, and the mean time per frame
+  centroids = np.full((len(frames),len(POINT_NAMES),2), np.nan)
+  start = time.perf_counter()
+  for i, frame in enumerate(frames):
+    # the target position is carried over between frames, reset it to see misses
+    view.target_centroid = np.array([np.nan, np.nan])
+    joint_centroids, view_time = view.process(frame)
+    centroids[i,:-1] = [joint_centroids[name] for name in JOINT_NAMES]
+    centroids[i,-1] = view.target_centroid
+  return centroids, (time.perf_counter() - start)/len(frames)
+
+
+def main():
+  parser = argparse.ArgumentParser(description="pyramid against full resolution detection")
+  parser.add_argument('--factors', type=int, nargs='+', default=[2, 4, 8])
+  parser.add_argument('--frames', type=int, default=30, help="synthetic frame pairs")
+  parser.add_argument('--size', type=int, default=800)
+  parser.add_argument('--recording', default=None, help="use the frames of a recording instead")
+  args = parser.parse_args()
+
+  if args.recording is not None:
+    recording = frame_recording(args.recording)
+    frames = list(recording.yz_frames) + list(recording.xz_frames)
+  else:
+    yz_frames, xz_frames, joint_vectors = synthetic_frames(args.frames, size=args.size, seed=2)
+    frames = list(yz_frames) + list(xz_frames)
+
+  reference, reference_time = detect_all(camera_view(), frames)
+  print("%d frames, full resolution: %.2f ms per frame, %.1f fps" % (len(frames), reference_time*1e3, 1/reference_time))
+  print("%-7s %10s %8s %8s   %s" % ("factor", "per frame", "fps", "speedup", "mean / max centroid error in px, misses"))
+  for factor in args.factors:
+    centroids, frame_time = detect_all(camera_view(pyramid_factor=factor), frames)
+    errors = np.linalg.norm(centroids - reference, axis=2)
+    # a point found by only one of the two searches is a miss
+    misses = np.isnan(centroids[:,:,0]) != np.isnan(reference[:,:,0])
+    summary = ", ".join("%s %.2f/%.1f %d" % (name, np.nanmean(errors[:,i]), np.nanmax(errors[:,i]), np.count_nonzero(misses[:,i]))
+                        for i, name in enumerate(POINT_NAMES))
+    print("%-7d %7.2f ms %8.1f %7.2fx   %s" % (factor, frame_time*1e3, 1/frame_time, reference_time/frame_time, summary))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# throughput of one vision process serving several robots through the shared robot_pool, as the number
+# of robots grows. every robot's camera pair offers frames at --rate, the pool keeps the freshest per robot
+#
+# usage: python3 benchmarks/bench_robots.py [--robots 1 2 4 8] [--workers 0] [--rate 30] [--duration 5]
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from ivr_assignment.pipeline import vision_pipeline
+from ivr_assignment.robot_pool import robot_pool
+from synthetic import synthetic_frames
+
+
+def run(robots, workers, rate, duration, frames):
+  pool = robot_pool([vision_pipeline() for robot in range(robots)], workers)
+  period = 1.0/rate
+  next_tick = time.perf_counter()
+  end = next_tick + duration
+  i = 0
+  pool.reset_stats()
+  while next_tick < end:
+    for robot in range(robots):
+      # each robot sees a different frame of the same sequence
+      yz_image, xz_image = frames[(i + robot) % len(frames)]
+      pool.submit(robot, yz_image, xz_image)
+    i += 1
+    next_tick += period
+    delay = next_tick - time.perf_counter()
+    if delay > 0:
+      time.sleep(delay)
+  pool.wait()
+  throughput, counts = pool.stats()
+  pool.close()
+  return pool.workers, throughput, counts
+
+
+def main():
+  parser = argparse.ArgumentParser(description="vision throughput per core as the number of robots grows")
+  parser.add_argument('--robots', type=int, nargs='+', default=[1, 2, 4, 8])
+  parser.add_argument('--workers', type=int, default=0, help="pool threads, 0 = one per robot up to the core count")
+  parser.add_argument('--rate', type=float, default=30, help="frame pairs per second offered by each robot")
+  parser.add_argument('--duration', type=float, default=5, help="seconds per robot count")
+  parser.add_argument('--frames', type=int, default=30, help="distinct synthetic frame pairs")
+  parser.add_argument('--size', type=int, default=800)
+  args = parser.parse_args()
+
+  yz_frames, xz_frames, joint_vectors = synthetic_frames(args.frames, size=args.size, seed=3)
+  frames = list(zip(yz_frames, xz_frames))
+  print("%d cores, %g frame pairs per second offered per robot" % (os.cpu_count(), args.rate))
+  print("%-7s %8s %10s %10s %12s %14s   %s" % ("robots", "workers", "pairs/s", "cores used", "pairs/cpu s", "dropped", "pairs/s per robot (min-max)"))
+  for robots in args.robots:
+    workers, throughput, counts = run(robots, args.workers, args.rate, args.duration, frames)
+    per_robot = counts[:,0]/args.duration
+    offered = args.rate*args.duration*robots
+    print("%-7d %8d %10.1f %10.2f %12.1f %13.1f%%   %.1f-%.1f" % (robots, workers, throughput[0], throughput[1], throughput[2],
+                                                              100*counts[:,1].sum()/offered, per_robot.min(), per_robot.max()))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+# micro benchmarks for every hot function of the vision and control pipeline.
+# results are written as json so runs on different commits can be diffed with --compare
+#
+# usage: python3 benchmarks/bench_suite.py [--sizes 200 400 800] [--output results.json] [--compare baseline.json]
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import itertools
+import subprocess
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from ivr_assignment.normalization import rgb_normalizer, normalize_rgb_float
+from ivr_assignment.colour_classifier import colour_classifier, JOINT_COLOUR_THRESHOLDS
+from ivr_assignment.detection import get_joint_center, get_target_image_coord, get_black_joint_centers
+from ivr_assignment.geometry import center_image_coordinates_around_first_joint, merge_plane_coordinates, compute_joint_angles
+from ivr_assignment.kinematics import forward_kinematics, jacobian, closed_loop_step, forward_kinematics_batch, jacobian_batch, damped_least_squares
+from ivr_assignment.pipeline import vision_pipeline
+from synthetic import synthetic_frames, random_joint_vectors, joint_positions, project
+from timing import measure, scaling_exponent, format_time
+
+FRAME_BUDGET = 1/30.0 # camera rate
+BATCH_SIZE = 10000
+RED_THRESHOLDS = dict(JOINT_COLOUR_THRESHOLDS)['red']
+
+
+def cycle(values):
+  # every call of a benchmarked function gets the next of a fixed set of inputs
+  return itertools.cycle(list(values)).__next__
+
+
+def image_cases(size, frames):
+  yz_frames, xz_frames, joint_vectors = synthetic_frames(frames, size=size, seed=size)
+  black_yz_frames = synthetic_frames(frames, size=size, seed=size, black=True)[0]
+  normalizer = rgb_normalizer()
+  normalized_frames = [normalize_rgb_float(frame) for frame in yz_frames]
+  classifier = colour_classifier()
+  pipeline = vision_pipeline()
+
+  frame = cycle(yz_frames)
+  normalized = cycle(normalized_frames)
+  black_frame = cycle(black_yz_frames)
+  frame_pair = cycle(zip(yz_frames, xz_frames))
+  return [
+    ('normalizeRGB', lambda: normalize_rgb_float(frame())),
+    ('rgb_normalizer.normalize', lambda: normalizer.normalize(frame())),
+    ('get_joint_center', lambda: get_joint_center(normalized(), RED_THRESHOLDS, 0, 2)),
+    ('colour_classifier.classify', lambda: classifier.classify(normalized())),
+    ('get_target_image_coord', lambda: get_target_image_coord(normalized())),
+    ('get_black_joint_centers', lambda: get_black_joint_centers(black_frame())),
+    ('vision_pipeline.process', lambda: pipeline.process(*frame_pair())),
+  ]
+
+
+def geometry_cases(count):
+  # image coordinates of the four spheres projected from random joint vectors
+  joint_vectors = random_joint_vectors(count, np.random.default_rng(1), fixed_base=True)
+  centred_views = []
+  coordinates_3d = []
+  for q in joint_vectors:
+    yz, xz = project(joint_positions(q), 800)
+    yz = yz.astype(np.int64)
+    xz = xz.astype(np.int64)
+    centred_yz = center_image_coordinates_around_first_joint(yz[0], yz[1:])
+    centred_xz = center_image_coordinates_around_first_joint(xz[0], xz[1:])
+    centred_views.append((centred_yz, centred_xz))
+    coordinates_3d.append(merge_plane_coordinates(centred_yz, centred_xz))
+
+  views = cycle(centred_views)
+  coordinates = cycle(coordinates_3d)
+  return [
+    ('merge_plane_coordinates', lambda: merge_plane_coordinates(*views())),
+    ('compute_joint_angles', lambda: compute_joint_angles(coordinates())),
+  ]
+
+
+def kinematics_cases(count):
+  rng = np.random.default_rng(2)
+  joint_vectors = random_joint_vectors(count, rng)
+  targets = rng.uniform([-5, -5, 1], [5, 5, 8], (count,3))
+  q = cycle(joint_vectors)
+  step = cycle(zip(joint_vectors, targets))
+  fixed_base_jacobians = [jacobian(joints)*[0,1,1,1] for joints in joint_vectors]
+  J = cycle(fixed_base_jacobians)
+  error_prev = np.zeros(3)
+
+  def control_step():
+    joints, target = step()
+    return closed_loop_step(joints, target, error_prev, 0.05)
+
+  # the batched versions are timed over BATCH_SIZE configurations per call
+  batch = random_joint_vectors(BATCH_SIZE, rng)
+  return [
+    ('getEndFKPos', lambda: forward_kinematics(q())),
+    ('getJacobian', lambda: jacobian(q())),
+    ('getClosedLoopMovement', control_step),
+    ('np.linalg.pinv', lambda: np.linalg.pinv(J())),
+    ('damped_least_squares', lambda: damped_least_squares(J(), error_prev)),
+    ('forward_kinematics_batch[' + str(BATCH_SIZE) + ']', lambda: forward_kinematics_batch(batch)),
+    ('jacobian_batch[' + str(BATCH_SIZE) + ']', lambda: jacobian_batch(batch)),
+  ]
+
+
+def git_revision():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   stderr=subprocess.DEVNULL).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def run(args):
+  results = {}
+
+  def record(name, size, func):
+    key = name if size is None else name + '@' + str(size)
+    stats = measure(func, repeats=args.repeats, min_time=args.min_time)
+    stats['function'] = name
+    stats['size'] = size
+    results[key] = stats
+    print("%-40s median %12s  iqr %12s" % (key, format_time(stats['median']), format_time(stats['iqr'])))
+
+  for size in args.sizes:
+    for name, func in image_cases(size, args.frames):
+      record(name, size, func)
+  for name, func in geometry_cases(args.frames) + kinematics_cases(args.frames):
+    record(name, None, func)
+
+  # how each image function grows with the frame size, and whether it still fits the 30 Hz budget
+  scaling = {}
+  for name in sorted(set(stats['function'] for stats in results.values() if stats['size'] is not None)):
+    medians = [results[name + '@' + str(size)]['median'] for size in args.sizes]
+    scaling[name] = {
+      'sizes': list(args.sizes),
+      'median': medians,
+      'exponent': scaling_exponent(args.sizes, medians),
+      'budget_fraction': [median/FRAME_BUDGET for median in medians],
+    }
+
+  return {
+    'meta': {
+      'revision': git_revision(),
+      'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+      'python': platform.python_version(),
+      'numpy': np.__version__,
+      'opencv': cv2.__version__,
+      'machine': platform.machine(),
+      'processor': platform.processor(),
+      'cpu_count': os.cpu_count(),
+    },
+    'config': {'sizes': list(args.sizes), 'repeats': args.repeats, 'min_time': args.min_time, 'frames': args.frames},
+    'frame_budget': FRAME_BUDGET,
+    'results': results,
+    'scaling': scaling,
+  }
+
+
+def print_scaling(report):
+  print("\nscaling with frame size (exponent 1.0 = linear in pixels, budget = fraction of a 30 Hz frame)")
+  for name, entry in report['scaling'].items():
+    exponent = 'n/a' if entry['exponent'] is None else "%.2f" % entry['exponent']
+    budget = ', '.join("%d: %.1f%%" % (size, fraction*100) for size, fraction in zip(entry['sizes'], entry['budget_fraction']))
+    print("%-30s exponent %5s  budget %s" % (name, exponent, budget))
+
+
+def compare(report, baseline, tolerance):
+  # a regression is slower by more than the tolerance with non overlapping confidence intervals
+  regressions = []
+  print("\ncomparison against " + str(baseline['meta'].get('revision')))
+  for key, stats in report['results'].items():
+    if key not in baseline['results']:
+      continue
+    old = baseline['results'][key]
+    ratio = stats['median']/old['median']
+    regressed = ratio > 1 + tolerance and stats['ci95_median'][0] > old['ci95_median'][1]
+    improved = ratio < 1 - tolerance and stats['ci95_median'][1] < old['ci95_median'][0]
+    flag = 'REGRESSION' if regressed else ('improved' if improved else '')
+    print("%-40s %12s -> %12s  x%.2f %s" % (key, format_time(old['median']), format_time(stats['median']), ratio, flag))
+    if regressed:
+      regressions.append(key)
+  return regressions
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description='micro benchmarks of the vision and control pipeline')
+  parser.add_argument('--sizes', type=int, nargs='+', default=[200, 400, 800])
+  parser.add_argument('--repeats', type=int, default=15)
+  parser.add_argument('--min-time', type=float, default=0.02, help='minimum seconds per repeat')
+  parser.add_argument('--frames', type=int, default=8, help='number of distinct inputs per function')
+  parser.add_argument('--output', help='write the json report to this file')
+  parser.add_argument('--compare', help='json report of a previous run to compare against')
+  parser.add_argument('--tolerance', type=float, default=0.1, help='relative slowdown reported as a regression')
+  args = parser.parse_args(argv[1:])
+
+  report = run(args)
+  print_scaling(report)
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+    if len(compare(report, baseline, args.tolerance)) > 0:
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+  main(sys.argv)
@@ -0,0 +1,107 @@
+# synthetic camera frames and joint vectors for the benchmarks.
+# the arm is rendered as coloured discs from its forward kinematics, seen by the two orthographic
+# views used by the vision pipeline: camera 1 looks along -x (yz image), camera 2 along +y (xz image)
+
+import numpy as np
+import cv2
+
+REFERENCE_SIZE = 800
+PIXELS_PER_METRE = 26.0 # 2.5m between the yellow and blue spheres is 65 pixels at 800x800
+BASE_PIXEL = np.array([398, 535]) # yellow sphere at 800x800
+SPHERE_RADIUS = 0.55
+
+SPHERE_COLOURS = {
+  'yellow': (0, 255, 255),
+  'blue': (255, 0, 0),
+  'green': (0, 255, 0),
+  'red': (0, 0, 255),
+}
+BLACK = (0, 0, 0)
+ORANGE = (0, 128, 255)
+BACKGROUND = (178, 178, 178)
+
+# joint limits from urdf/robot.urdf
+JOINT_LOWER_LIMITS = np.array([-np.pi, -np.pi/2, -np.pi/2, -np.pi/2])
+JOINT_UPPER_LIMITS = np.array([np.pi, np.pi/2, np.pi/2, np.pi/2])
+
+
+def random_joint_vectors(n, rng=None, fixed_base=False):
+  # fixed_base keeps joint 1 at 0, as assumed by the vision pipeline and the controller
+  rng = np.random.default_rng(0) if rng is None else rng
+  joint_vectors = rng.uniform(JOINT_LOWER_LIMITS, JOINT_UPPER_LIMITS, (n,4))
+  if fixed_base:
+    joint_vectors[:,0] = 0
+  return joint_vectors
+
+
+def joint_positions(q):
+  # 3d positions of the yellow, blue, green and red spheres in metres
+  s = np.sin(q)
+  c = np.cos(q)
+  link_3 = np.array([c[0]*s[2] + s[0]*s[1]*c[2], s[0]*s[2] - c[0]*s[1]*c[2], c[1]*c[2]])
+  link_4 = np.array([s[0]*c[1]*s[3] + c[3]*(c[0]*s[2] + s[0]*s[1]*c[2]),
+                     c[3]*(s[0]*s[2] - c[0]*s[1]*c[2]) - c[0]*c[1]*s[3],
+                     c[1]*c[2]*c[3] - s[1]*s[3]])
+  yellow = np.zeros(3)
+  blue = np.array([0, 0, 2.5])
+  green = blue + 3.5*link_3
+  red = green + 3*link_4
+  return np.array([yellow, blue, green, red])
+
+
+def target_positions(t):
+  # orange sphere and box trajectories of target_move.py at time t
+  sphere = np.array([0.5 + 2.5*np.cos(t*np.pi/15), 2.5*np.sin(t*np.pi/15), 7 + np.sin(t*np.pi/15)])
+  box = np.array([2 + 2*np.cos(t*np.pi/15), 2.5 + 1.5*np.sin(t*np.pi/15), 7.5])
+  return sphere, box
+
+
+def project(points, size):
+  # metres -> (yz pixel, xz pixel) coordinates
+  scale = PIXELS_PER_METRE*size/REFERENCE_SIZE
+  base = BASE_PIXEL*size/REFERENCE_SIZE
+  points = np.atleast_2d(points)
+  yz = np.stack([base[0] + points[:,1]*scale, base[1] - points[:,2]*scale], axis=1)
+  xz = np.stack([base[0] + points[:,0]*scale, base[1] - points[:,2]*scale], axis=1)
+  return yz, xz
+
+
+def render_views(q, t=0.0, size=REFERENCE_SIZE, rng=None, black=False, noise=12):
+  # returns the (yz, xz) bgr frames for joint vector q with the targets at time t
+  rng = np.random.default_rng(0) if rng is None else rng
+  scale = PIXELS_PER_METRE*size/REFERENCE_SIZE
+  radius = max(int(round(SPHERE_RADIUS*scale)), 2)
+  sphere, box = target_positions(t)
+
+  shapes = [(position, BLACK if black else SPHERE_COLOURS[name], 'sphere') for name, position in zip(SPHERE_COLOURS, joint_positions(q))]
+  shapes.append((sphere, ORANGE, 'sphere'))
+  shapes.append((box, ORANGE, 'box'))
+
+  views = []
+  for view in range(2):
+    img = np.empty((size,size,3), np.uint8)
+    img[:] = BACKGROUND
+    if noise > 0:
+      cv2.add(img, rng.integers(0, noise, img.shape, dtype=np.uint8), dst=img)
+    # camera 1 sits at +x and camera 2 at -y, draw the furthest shapes first
+    depth = [position[0] if view == 0 else -position[1] for position, colour, kind in shapes]
+    for i in np.argsort(depth):
+      position, colour, kind = shapes[i]
+      pixel = project(position, size)[view][0].astype(int)
+      if kind == 'sphere':
+        cv2.circle(img, (int(pixel[0]), int(pixel[1])), radius, colour, -1)
+      else:
+        cv2.rectangle(img, (int(pixel[0]) - radius, int(pixel[1]) - radius), (int(pixel[0]) + radius, int(pixel[1]) + radius), colour, -1)
+    views.append(img)
+  return views[0], views[1]
+
+
+def synthetic_frames(n, size=REFERENCE_SIZE, seed=0, black=False):
+  # n frame pairs at random joint vectors, returns (yz frames, xz frames, joint vectors)
+  rng = np.random.default_rng(seed)
+  joint_vectors = random_joint_vectors(n, rng, fixed_base=True)
+  yz_frames = np.empty((n,size,size,3), np.uint8)
+  xz_frames = np.empty((n,size,size,3), np.uint8)
+  for i in range(n):
+    yz_frames[i], xz_frames[i] = render_views(joint_vectors[i], t=i/30.0, size=size, rng=rng, black=black)
+  return yz_frames, xz_frames, joint_vectors
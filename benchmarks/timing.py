@@ -0,0 +1,73 @@
+# repeated timing with summary statistics, shared by the benchmark scripts
+
+import gc
+import time
+import numpy as np
+
+
+def autorange(func, min_time):
+  # number of calls per repeat so that one repeat takes at least min_time seconds
+  loops = 1
+  while True:
+    start = time.perf_counter()
+    for _ in range(loops):
+      func()
+    elapsed = time.perf_counter() - start
+    if elapsed >= min_time:
+      return loops
+    loops = loops*2 if elapsed == 0 else max(loops*2, int(np.ceil(loops*min_time/elapsed)))
+
+
+def median_confidence_interval(samples, z=1.96):
+  # distribution free 95% interval of the median from order statistics
+  samples = np.sort(samples)
+  n = len(samples)
+  half_width = z*np.sqrt(n)/2
+  lower = int(max(np.floor(n/2 - half_width), 0))
+  upper = int(min(np.ceil(n/2 + half_width), n-1))
+  return float(samples[lower]), float(samples[upper])
+
+
+def measure(func, repeats=15, min_time=0.02, warmup=1):
+  # per call times in seconds over `repeats` independent repeats
+  for _ in range(warmup):
+    func()
+  loops = autorange(func, min_time)
+  samples = np.empty(repeats)
+  gc_enabled = gc.isenabled()
+  gc.disable()
+  try:
+    for i in range(repeats):
+      start = time.perf_counter()
+      for _ in range(loops):
+        func()
+      samples[i] = (time.perf_counter() - start)/loops
+  finally:
+    if gc_enabled:
+      gc.enable()
+  q1, median, q3 = np.percentile(samples, [25, 50, 75])
+  ci_low, ci_high = median_confidence_interval(samples)
+  return {
+    'loops': loops,
+    'repeats': repeats,
+    'min': float(samples.min()),
+    'median': float(median),
+    'mean': float(samples.mean()),
+    'stdev': float(samples.std(ddof=1)) if repeats > 1 else 0.0,
+    'iqr': float(q3 - q1),
+    'ci95_median': [ci_low, ci_high],
+  }
+
+
+def scaling_exponent(sizes, times):
+  # slope of log(time) against log(pixels), 1.0 means linear in the number of pixels
+  if len(sizes) < 2:
+    return None
+  pixels = np.array(sizes, dtype=np.float64)**2
+  return float(np.polyfit(np.log(pixels), np.log(times), 1)[0])
+
+
+def format_time(seconds):
+  if seconds >= 1e-3:
+    return "%.3f ms" % (seconds*1e3)
+  return "%.2f us" % (seconds*1e6)
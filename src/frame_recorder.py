@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import rospy
+import numpy as np
+import message_filters
+from sensor_msgs.msg import Image, JointState
+from cv_bridge import CvBridge, CvBridgeError
+from ivr_assignment.recording import frame_recorder, DEFAULT_META_INTERVAL
+from ivr_assignment.image_messages import bgr8_image
+
+# records synchronised camera frames with the robot and target joint states into a memory mapped
+# recording that ivr_assignment.replay can feed back into the vision pipeline without ROS
+
+ROBOT_JOINT_NAMES = ['base_to_link0', 'link0_to_link1', 'link0_to_link1_2', 'link1_to_link2']
+TARGET_JOINT_NAMES = ['move_x', 'move_y', 'move_z']
+
+
+def joint_positions(msg, names):
+  # positions in the given joint order, joint_state_controller does not guarantee one
+  position = dict(zip(msg.name, msg.position))
+  return np.array([position.get(name, np.nan) for name in names])
+
+
+class recorder_node:
+
+  def __init__(self):
+    rospy.init_node('frame_recorder', anonymous = True)
+    self.bridge = CvBridge()
+    self.path = rospy.get_param('~output', 'recording')
+    self.capacity = rospy.get_param('~capacity', 3000)
+    # frames between metadata updates, the most a killed recorder can lose
+    self.meta_interval = rospy.get_param('~meta_interval', DEFAULT_META_INTERVAL)
+    # the recording is created on the first frame, once the image size is known
+    self.recorder = None
+    self.robot_joints = None
+    self.target_position = None
+    self.closed = False
+
+    self.img1_subscriber = message_filters.Subscriber("/image_topic1", Image)
+    self.img2_subscriber = message_filters.Subscriber("/image_topic2", Image)
+    time_sync = message_filters.TimeSynchronizer([self.img1_subscriber, self.img2_subscriber], 10)
+    time_sync.registerCallback(self.callback)
+    self.robot_joints_sub = rospy.Subscriber("/robot/joint_states", JointState, self.robot_joints_callback)
+    self.target_sub = rospy.Subscriber("/target/joint_states", JointState, self.target_callback)
+    rospy.on_shutdown(self.close)
+
+  def robot_joints_callback(self, msg):
+    self.robot_joints = joint_positions(msg, ROBOT_JOINT_NAMES)
+
+  def target_callback(self, msg):
+    self.target_position = joint_positions(msg, TARGET_JOINT_NAMES)
+
+  def imgmsg_to_bgr8(self, msg):
+    return self.bridge.imgmsg_to_cv2(msg, "bgr8")
+
+  def callback(self, yz_image_msg, xz_image_msg):
+    try:
+      yz_image = bgr8_image(yz_image_msg, self.imgmsg_to_bgr8)
+      xz_image = bgr8_image(xz_image_msg, self.imgmsg_to_bgr8)
+    except CvBridgeError as e:
+      print(e)
+      return
+
+    if self.closed:
+      return
+    if self.recorder is None:
+      self.recorder = frame_recorder(self.path, yz_image.shape[0], yz_image.shape[1], self.capacity, self.meta_interval)
+      rospy.loginfo("recording up to %d frames to %s", self.capacity, self.path)
+    if self.recorder.full():
+      rospy.logwarn_once("recording full, further frames are dropped")
+      return
+    self.recorder.append(yz_image, xz_image, yz_image_msg.header.stamp.to_sec(), self.robot_joints, self.target_position)
+
+  def close(self):
+    self.closed = True
+    if self.recorder is not None:
+      self.recorder.close()
+      rospy.loginfo("recorded %d frames to %s", self.recorder.count, self.path)
+
+
+if __name__ == '__main__':
+  recorder_node()
+  try:
+    rospy.spin()
+  except KeyboardInterrupt:
+    print("Shutting Down")
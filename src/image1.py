@@ -9,6 +9,7 @@ from std_msgs.msg import String
 from sensor_msgs.msg import Image
 from std_msgs.msg import Float64MultiArray, Float64
 from cv_bridge import CvBridge, CvBridgeError
+from ivr_assignment.image_messages import bgr8_image
 
 
 class image_converter:
@@ -23,17 +24,18 @@ class image_converter:
     self.image_sub1 = rospy.Subscriber("/camera1/robot/image_raw",Image,self.callback1)
     # initialize the bridge between openCV and ROS
     self.bridge = CvBridge()
-    
-    self.joint2_pub = rospy.Publisher("/robot/joint2_position_controller/command",Float64, queue_size = 10)
-    self.joint3_pub = rospy.Publisher("/robot/joint3_position_controller/command",Float64, queue_size = 10)
-    self.joint4_pub = rospy.Publisher("/robot/joint4_position_controller/command",Float64, queue_size = 10)
+    # the sinusoidal joint commands are sent by joint_commands.py
+
 
+  def imgmsg_to_bgr8(self, msg):
+    return self.bridge.imgmsg_to_cv2(msg, "bgr8")
 
   # Recieve data from camera 1, process it, and publish
   def callback1(self,data):
     # Recieve the image
     try:
-      self.cv_image1 = self.bridge.imgmsg_to_cv2(data, "bgr8")
+      # bgr8 frames are read only views of the message data, other encodings are converted
+      self.cv_image1 = bgr8_image(data, self.imgmsg_to_bgr8)
     except CvBridgeError as e:
       print(e)
     
@@ -43,27 +45,16 @@ class image_converter:
     #im1=cv2.imshow('window1', self.cv_image1)
     #cv2.waitKey(1)
     
-    current_time = rospy.get_time()
-    joint2 = (np.pi/2)*np.sin(np.array([(np.pi/15)*current_time]))
-    joint3 = (np.pi/2)*np.sin(np.array([(np.pi/18)*current_time]))
-    joint4 = (np.pi/2)*np.sin(np.array([(np.pi/20)*current_time]))
-    
-    joint2_payload = Float64()
-    joint2_payload.data = joint2
-    
-    joint3_payload = Float64()
-    joint3_payload.data = joint3
-    
-    joint4_payload = Float64()
-    joint4_payload.data = joint4
-    
     # Publish the results
     try: 
-      self.joint2_pub.publish(joint2_payload)
-      self.joint3_pub.publish(joint3_payload)
-      self.joint4_pub.publish(joint4_payload)
-      
-      self.image_pub1.publish(self.bridge.cv2_to_imgmsg(self.cv_image1, "bgr8"))
+      if data.encoding == "bgr8":
+        # already in the format joint_angles expects, relay the message untouched
+        self.image_pub1.publish(data)
+      else:
+        image_msg = self.bridge.cv2_to_imgmsg(self.cv_image1, "bgr8")
+        # keep the camera stamp, so frames can be paired and latency measured downstream
+        image_msg.header = data.header
+        self.image_pub1.publish(image_msg)
     except CvBridgeError as e:
       print(e)
 
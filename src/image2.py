@@ -9,6 +9,7 @@ from std_msgs.msg import String
 from sensor_msgs.msg import Image
 from std_msgs.msg import Float64MultiArray, Float64
 from cv_bridge import CvBridge, CvBridgeError
+from ivr_assignment.image_messages import bgr8_image
 
 
 class image_converter:
@@ -25,11 +26,15 @@ class image_converter:
     self.bridge = CvBridge()
 
 
+  def imgmsg_to_bgr8(self, msg):
+    return self.bridge.imgmsg_to_cv2(msg, "bgr8")
+
   # Recieve data, process it, and publish
   def callback2(self,data):
     # Recieve the image
     try:
-      self.cv_image2 = self.bridge.imgmsg_to_cv2(data, "bgr8")
+      # bgr8 frames are read only views of the message data, other encodings are converted
+      self.cv_image2 = bgr8_image(data, self.imgmsg_to_bgr8)
     except CvBridgeError as e:
       print(e)
     # Uncomment if you want to save the image
@@ -39,7 +44,14 @@ class image_converter:
 
     # Publish the results
     try: 
-      self.image_pub2.publish(self.bridge.cv2_to_imgmsg(self.cv_image2, "bgr8"))
+      if data.encoding == "bgr8":
+        # already in the format joint_angles expects, relay the message untouched
+        self.image_pub2.publish(data)
+      else:
+        image_msg = self.bridge.cv2_to_imgmsg(self.cv_image2, "bgr8")
+        # keep the camera stamp, so frames can be paired and latency measured downstream
+        image_msg.header = data.header
+        self.image_pub2.publish(image_msg)
     except CvBridgeError as e:
       print(e)
 
@@ -0,0 +1,4 @@
+# the nodes run from src/, where this package hides the one catkin generates in the devel space with the
+# message modules, so both directories make up ivr_assignment
+import pkgutil
+__path__ = pkgutil.extend_path(__path__, __name__)
@@ -0,0 +1,90 @@
+import os
+import json
+import numpy as np
+
+# the yellow and blue spheres (joints 1 and 2) never move in the images, so their image positions and the
+# pixel scale they give are estimated once from the median over the first frames and reused afterwards.
+# an occasional drift check detects them again and starts a new calibration when they moved
+
+# real distance between the yellow and blue spheres
+YELLOW_TO_BLUE_METRES = 2.5
+VIEW_NAMES = ['yz', 'xz']
+
+
+class base_calibration:
+
+  def __init__(self, frames=30, drift_check_interval=30, drift_tolerance=3.0, path=None):
+    self.frames = frames
+    self.drift_check_interval = drift_check_interval # frames between drift checks, 0 = never
+    self.drift_tolerance = drift_tolerance # pixels
+    # calibrations are saved here once complete
+    self.path = path
+    # (2,2,2) [yz, xz] x [yellow, blue] x [x, y] image positions and the metres per pixel they give, None until calibrated
+    self.positions = None
+    self.scale = None
+    self.samples = []
+    self.frame_count = 0
+    self.recalibrations = 0
+
+  def calibrated(self):
+    return self.positions is not None
+
+  def needs_detection(self):
+    # whether the base joints have to be detected in the next frame
+    if not self.calibrated():
+      return True
+    return self.drift_check_interval > 0 and (self.frame_count + 1) % self.drift_check_interval == 0
+
+  def advance(self):
+    # a frame in which the base joints were not detected
+    self.frame_count += 1
+
+  def observe(self, positions):
+    # (2,2,2) detected base joint positions of one frame, NaN where missing.
+    # returns True when this frame completed a calibration
+    self.frame_count += 1
+    positions = np.asarray(positions, dtype=np.float64)
+    if not self.calibrated():
+      if np.all(np.isfinite(positions)):
+        self.samples.append(positions)
+      if len(self.samples) < self.frames:
+        return False
+      self.positions = np.median(self.samples, axis=0)
+      self.scale = self.metres_per_pixel()
+      self.samples = []
+      if self.path is not None:
+        self.save(self.path)
+      return True
+
+    # drift check, an occluded base joint is not evidence of drift
+    drift = np.linalg.norm(positions - self.positions, axis=2)
+    if np.nanmax(drift, initial=0.0) > self.drift_tolerance:
+      self.positions = None
+      self.scale = None
+      self.recalibrations += 1
+    return False
+
+  def metres_per_pixel(self):
+    # scale from the yellow to blue distance in the merged 3d coordinates, computed like vision_pipeline.locate
+    # does from detected spheres: x from the xz view, y and z from the yz view
+    (yz_yellow, yz_blue), (xz_yellow, xz_blue) = self.positions
+    yellow_to_blue = np.array([xz_blue[0] - xz_yellow[0], yz_blue[0] - yz_yellow[0], yz_yellow[1] - yz_blue[1]])
+    return YELLOW_TO_BLUE_METRES/np.linalg.norm(yellow_to_blue)
+
+  def save(self, path):
+    calibration = dict((view, {'yellow': self.positions[i,0].tolist(), 'blue': self.positions[i,1].tolist()})
+                       for i, view in enumerate(VIEW_NAMES))
+    calibration['metres_per_pixel'] = float(self.scale)
+    with open(path, 'w') as f:
+      json.dump(calibration, f, indent=2)
+
+  def load(self, path):
+    # returns False when there is no calibration file yet
+    if not os.path.exists(path):
+      return False
+    with open(path) as f:
+      calibration = json.load(f)
+    self.positions = np.array([[calibration[view]['yellow'], calibration[view]['blue']] for view in VIEW_NAMES], dtype=np.float64)
+    self.scale = calibration['metres_per_pixel']
+    self.samples = []
+    return True
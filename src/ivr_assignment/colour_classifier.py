@@ -0,0 +1,99 @@
+import numpy as np
+import cv2
+
+# thresholds on the chromaticity normalised image, shared by every detection stage
+JOINT_COLOUR_THRESHOLDS = [
+  ('yellow', [(0, 100, 100), (7, 255, 255)]),
+  ('blue', [(100, 0, 0), (255, 7, 7)]),
+  ('green', [(0, 100, 0), (7, 255, 7)]),
+  ('red', [(0, 0, 100), (7, 7, 255)]),
+]
+JOINT_NAMES = [name for name, thresholds in JOINT_COLOUR_THRESHOLDS]
+ORANGE_THRESHOLDS = [(0, 64, 70), (20, 100, 255)]
+COLOUR_THRESHOLDS = JOINT_COLOUR_THRESHOLDS + [('orange', ORANGE_THRESHOLDS)]
+
+
+def build_channel_tables(colour_thresholds):
+  # box thresholds are separable, so the BGR -> label lookup table factors into one 256 entry
+  # bitmask table per channel: label(b,g,r) = table[0][b] & table[1][g] & table[2][r]
+  # each colour owns one bit, so overlapping ranges (yellow and orange) keep both labels
+  if len(colour_thresholds) > 8:
+    raise ValueError("at most 8 colours fit in a uint8 label image")
+  values = np.arange(256)
+  tables = np.zeros((3,256), np.uint8)
+  for bit, (name, (lower, upper)) in enumerate(colour_thresholds):
+    for channel in range(3):
+      in_range = (values >= lower[channel]) & (values <= upper[channel])
+      tables[channel, in_range] |= np.uint8(1 << bit)
+  return tables
+
+
+class colour_classifier:
+
+  def __init__(self, colour_thresholds=COLOUR_THRESHOLDS, dilation=2):
+    self.names = [name for name, thresholds in colour_thresholds]
+    self.bits = dict((name, np.uint8(1 << bit)) for bit, name in enumerate(self.names))
+    self.tables = build_channel_tables(colour_thresholds)
+    self.dilation = dilation
+    self.shape = None
+    self.moments = {}
+
+  def allocate(self, shape):
+    height, width = shape[:2]
+    self.shape = shape
+    self.channel_labels = [np.empty((height,width), np.uint8) for channel in range(3)]
+    self.raw_labels = np.empty((height,width), np.uint8)
+    self.row_dilated = np.empty((height,width), np.uint8)
+    self.labels = np.empty((height,width), np.uint8)
+
+  def classify(self, img):
+    # one lookup pass produces the label image, which is then dilated like get_joint_center
+    # (2x2 kernel) and reduced to m00/m10/m01 for every label
+    if img.shape != self.shape:
+      self.allocate(img.shape)
+
+    cv2.split(img, self.channel_labels)
+    for channel in range(3):
+      cv2.LUT(self.channel_labels[channel], self.tables[channel], dst=self.channel_labels[channel])
+    cv2.bitwise_and(self.channel_labels[0], self.channel_labels[1], dst=self.raw_labels)
+    cv2.bitwise_and(self.raw_labels, self.channel_labels[2], dst=self.raw_labels)
+
+    self.dilate(self.raw_labels)
+    self.accumulate_moments()
+    return self.labels
+
+  def dilate(self, raw_labels):
+    # n iterations of cv2.dilate with a 2x2 kernel turn on every pixel that has a set pixel up
+    # to n rows above and n columns to the left, which is a bitwise OR over shifted copies
+    n = self.dilation
+    np.copyto(self.row_dilated, raw_labels)
+    for shift in range(1, n+1):
+      cv2.bitwise_or(self.row_dilated[:,shift:], raw_labels[:,:-shift], dst=self.row_dilated[:,shift:])
+    np.copyto(self.labels, self.row_dilated)
+    for shift in range(1, n+1):
+      cv2.bitwise_or(self.labels[shift:,:], self.row_dilated[:-shift,:], dst=self.labels[shift:,:])
+
+  def accumulate_moments(self):
+    # only labelled pixels are visited, the spheres cover a small part of the frame
+    self.moments = dict((name, (0.0, 0.0, 0.0)) for name in self.names)
+    points = cv2.findNonZero(self.labels)
+    if points is None:
+      return self.moments
+    points = points.reshape(-1,2)
+    pixel_labels = self.labels[points[:,1], points[:,0]]
+    for name in self.names:
+      selected = points[(pixel_labels & self.bits[name]) != 0]
+      m10, m01 = np.sum(selected, axis=0, dtype=np.int64)
+      self.moments[name] = (float(len(selected)), float(m10), float(m01))
+    return self.moments
+
+  def centroid(self, name):
+    # same rounding and missing value convention as detection.get_joint_center
+    m00, m10, m01 = self.moments[name]
+    if(m00 == 0):
+      return np.array([np.nan, np.nan])
+    return np.array([int(m10 / m00), int(m01 / m00)], dtype=np.float64)
+
+  def mask(self, name):
+    # binary 0/255 image of one label, equivalent to inRange followed by the dilation
+    return cv2.compare(cv2.bitwise_and(self.labels, int(self.bits[name])), 0, cv2.CMP_GT)
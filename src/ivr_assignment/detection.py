@@ -0,0 +1,163 @@
+import numpy as np
+import cv2
+from ivr_assignment.colour_classifier import ORANGE_THRESHOLDS
+
+# image space detection of the joint spheres and the orange target, independent of ROS
+
+# fixed image positions of joint 1 (yellow) and joint 2 (blue), used when the spheres are all black
+JOINT_1_IMAGE_COORDINATES = np.array([398,535])
+JOINT_2_IMAGE_COORDINATES = np.array([398,470])
+# joints 3 and 4 are at most 3.5 + 3 m from joint 2, joints 1 and 2 are 2.5 m apart in the image
+BLACK_JOINT_REACH = (3.5 + 3)/2.5*np.linalg.norm(JOINT_2_IMAGE_COORDINATES - JOINT_1_IMAGE_COORDINATES)
+# largest circle the hough search looks for, also the margin around the reachable disc
+BLACK_JOINT_MAX_RADIUS = 18
+# matches closer than this to joint 1 or 2 are those spheres themselves, unless nothing else is found
+BLACK_JOINT_MIN_DISTANCE = 50
+BLACK_JOINT_MAX_CANDIDATES = 32
+
+
+def get_joint_center(image, thresholds, erosion=0, dilation=0):
+  binary_image = cv2.inRange(image, thresholds[0], thresholds[1])
+
+  kernel = np.ones((2, 2), np.uint8)
+  eroded_image = cv2.erode(binary_image, kernel, iterations=erosion)
+  dilated_image = cv2.dilate(eroded_image, kernel, iterations=dilation)
+
+  M = cv2.moments(dilated_image)
+
+  # missing colours are NaN, so centroids always stack into float arrays
+  if(M['m00'] == 0):
+    return np.array([np.nan, np.nan])
+
+  cx = int(M['m10'] / M['m00'])
+  cy = int(M['m01'] / M['m00'])
+  return np.array([cx, cy], dtype=np.float64)
+
+
+def threshold_and_dilate(image, thresholds, iteration_num):
+  binary_image = cv2.inRange(image, thresholds[0], thresholds[1])
+  kernel = np.ones((2, 2), np.uint8)
+  dilated_image = cv2.dilate(binary_image, kernel, iterations=2)
+  return dilated_image
+
+
+# a blob is a rectangle when it fills its bounding box and a circle when it fills the circle
+# around its centroid that reaches its furthest pixel
+RECTANGLE_FILL_RATIO = 0.95
+CIRCLE_FILL_RATIO = 0.9
+
+
+def label_target_blobs(orange_image):
+  # 8-connected orange blobs as (labels, stats, centroids, order, offset), None when there is no orange.
+  # labels, stats and centroids are those of the box around the orange pixels, offset is its top left corner.
+  # order lists the blob labels bottom up, the order findContours reports them in
+  x, y, w, h = cv2.boundingRect(orange_image)
+  if w == 0:
+    return None
+  # labelling only the box around the orange pixels keeps this cheaper than a full frame pass
+  count, labels, stats, centroids = cv2.connectedComponentsWithStats(orange_image[y:y+h,x:x+w], connectivity=8)
+  # label 0 is the background
+  return labels, stats, centroids, np.arange(count-1, 0, -1), np.array([x, y])
+
+
+def blob_fill_ratios(stats, order):
+  # fraction of each bounding box covered by its blob
+  return stats[order, cv2.CC_STAT_AREA]/(stats[order, cv2.CC_STAT_WIDTH]*stats[order, cv2.CC_STAT_HEIGHT])
+
+
+def blob_circleness(labels, stats, centroids, order):
+  # blob area over the area of the circle around its centroid reaching its furthest pixel, about 1 for a disc
+  pixel_ys, pixel_xs = np.nonzero(labels)
+  pixel_labels = labels[pixel_ys, pixel_xs]
+  offsets_x = pixel_xs - centroids[pixel_labels,0]
+  offsets_y = pixel_ys - centroids[pixel_labels,1]
+  radii_squared = np.zeros(len(stats))
+  np.maximum.at(radii_squared, pixel_labels, offsets_x*offsets_x + offsets_y*offsets_y)
+  return stats[order, cv2.CC_STAT_AREA]/(np.pi*(np.sqrt(radii_squared[order]) + 0.5)**2)
+
+
+def get_target_image_coord(image, orange_image=None):
+  # image coordinate of the orange sphere, telling it apart from the orange box by shape.
+  # every blob is scored at once from one labelling pass, None when the sphere cannot be told apart
+  if orange_image is None:
+    orange_image = threshold_and_dilate(image,ORANGE_THRESHOLDS,2)
+  blobs = label_target_blobs(orange_image)
+  if blobs is None:
+    return None
+  labels, stats, centroids, order, offset = blobs
+  centres = centroids[order].astype(np.int64) + offset
+
+  if len(order) == 1:
+    return centres[0]
+  is_rectangle = blob_fill_ratios(stats, order) > RECTANGLE_FILL_RATIO
+  if len(order) == 2 and is_rectangle.any():
+    # one shape is the box, the other is the sphere
+    return centres[1 - np.argmax(is_rectangle)]
+  if len(order) >= 3 and np.count_nonzero(is_rectangle) == 1:
+    # exactly one box, the other shapes are parts of the split sphere
+    return np.sum(centres[~is_rectangle], axis=0)//np.count_nonzero(~is_rectangle)
+
+  # no box to rule out, take the first shape that is definitely a circle
+  is_circle = blob_circleness(labels, stats, centroids, order) > CIRCLE_FILL_RATIO
+  if is_circle.any():
+    return centres[np.argmax(is_circle)]
+  return None
+
+
+def reachable_window(image_shape, centre=JOINT_2_IMAGE_COORDINATES, radius=BLACK_JOINT_REACH + BLACK_JOINT_MAX_RADIUS):
+  # (x0, y0, x1, y1) box around the disc the arm can reach, clipped to the image
+  height, width = image_shape[:2]
+  x0 = int(max(centre[0] - radius, 0))
+  y0 = int(max(centre[1] - radius, 0))
+  x1 = int(min(centre[0] + radius + 1, width))
+  y1 = int(min(centre[1] + radius + 1, height))
+  return x0, y0, x1, y1
+
+
+def assign_black_joint_candidates(candidates, joint_1=JOINT_1_IMAGE_COORDINATES, joint_2=JOINT_2_IMAGE_COORDINATES):
+  # picks joints 3 and 4 from (n,2) hough centres in vote order, like the original full frame distance
+  # relaxation: the first two candidates at least the largest of
+  # 50, 45, 40, ... pixels from joints 1 and 2 that leaves two candidates, the one closer to joint 2 is joint 3
+  if len(candidates) == 0:
+    return np.array([joint_2, joint_2], dtype=np.int64)
+  if len(candidates) == 1:
+    return np.array([candidates[0], candidates[0]], dtype=np.int64)
+
+  distances = np.linalg.norm(candidates[:,None,:] - np.array([joint_1, joint_2])[None], axis=2)
+  fixed_joint_distance = distances.min(axis=1)
+  second_largest = np.partition(fixed_joint_distance, -2)[-2]
+  minimum_distance = BLACK_JOINT_MIN_DISTANCE
+  if second_largest < minimum_distance:
+    minimum_distance -= 5*np.ceil((minimum_distance - second_largest)/5)
+  first, second = np.flatnonzero(fixed_joint_distance >= minimum_distance)[:2]
+  if distances[first,1] <= distances[second,1]:
+    return np.array([candidates[first], candidates[second]], dtype=np.int64)
+  return np.array([candidates[second], candidates[first]], dtype=np.int64)
+
+
+def get_black_joint_centers(image, joint_1=JOINT_1_IMAGE_COORDINATES, joint_2=JOINT_2_IMAGE_COORDINATES):
+  # joint 3 and 4 image coordinates when every sphere is black. the hough search only covers the
+  # disc the arm can reach around joint 2 and the candidates are assigned in one vectorised step,
+  # so the cost is bounded by the size of that disc and BLACK_JOINT_MAX_CANDIDATES.
+  # joints 1 and 2 default to their usual image positions, e.g. a base_calibration gives them per camera
+  joint_1 = np.asarray(joint_1)
+  joint_2 = np.asarray(joint_2)
+  reach = BLACK_JOINT_REACH/np.linalg.norm(JOINT_2_IMAGE_COORDINATES - JOINT_1_IMAGE_COORDINATES)*np.linalg.norm(joint_2 - joint_1)
+  x0, y0, x1, y1 = reachable_window(image.shape, joint_2, reach + BLACK_JOINT_MAX_RADIUS)
+  if x1 <= x0 or y1 <= y0:
+    # joint 2 is too far outside the frame for any joint to be visible, e.g. on a smaller frame
+    return assign_black_joint_candidates(np.zeros((0,2), dtype=np.int64), joint_1, joint_2)
+  binary_image = cv2.inRange(image[y0:y1,x0:x1], (0, 0, 0), (10, 10, 10))
+  # black outside the reachable disc cannot be a joint. there is no inner radius to mask: a link pointing
+  # towards a camera projects to any length down to 0, so joint 3 and 4 can appear right on joint 2
+  reach_mask = np.zeros_like(binary_image)
+  centre = (int(joint_2[0]) - x0, int(joint_2[1]) - y0)
+  cv2.circle(reach_mask, centre, int(reach + BLACK_JOINT_MAX_RADIUS), 255, -1)
+  cv2.bitwise_and(binary_image, reach_mask, dst=binary_image)
+
+  joint_matches = cv2.HoughCircles(binary_image, cv2.HOUGH_GRADIENT, dp=1.0, minDist=0.78, maxRadius=BLACK_JOINT_MAX_RADIUS, param1=100, param2=7)
+  if joint_matches is None:
+    candidates = np.zeros((0,2), dtype=np.int64)
+  else:
+    candidates = joint_matches[0,:BLACK_JOINT_MAX_CANDIDATES,0:2].astype(np.int64) + np.array([x0, y0])
+  return assign_black_joint_candidates(candidates, joint_1, joint_2)
@@ -0,0 +1,265 @@
+import os
+import time
+import json
+import platform
+import multiprocessing
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+import cv2
+from ivr_assignment.recording import frame_recording
+from ivr_assignment.pipeline import vision_pipeline
+from ivr_assignment.replay import replay
+from ivr_assignment.kinematics import forward_kinematics_batch
+from ivr_assignment.colour_classifier import JOINT_NAMES
+
+# accuracy and throughput of the vision pipeline over recordings made with frame_recorder.py.
+# every recording is split into chunks of consecutive frames that worker processes replay through
+# their own pipeline, reading the frames straight from the memory mapped recording. tracking state
+# starts afresh at every chunk boundary, so chunks should be long compared to the tracking warm up.
+# the estimates are compared with the recorded ground truth:
+#   joints 2-4 against /robot/joint_states, the end effector against the forward kinematics of those,
+#   the target against /target/joint_states relative to the centre of the yellow sphere, which is taken
+#   from urdf/robot.urdf (the target's joint states are already the centre of the orange sphere)
+#
+# usage: python3 -m ivr_assignment.evaluation recording [recording ...] [--workers 4] [--output report.json]
+
+ESTIMATED_JOINTS = ['joint2', 'joint3', 'joint4']
+ROBOT_URDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'urdf', 'robot.urdf')
+# the link drawn as the yellow sphere, the origin of the vision estimates
+YELLOW_SPHERE_LINK = 'sphere_base'
+VIEW_NAMES = ['yz', 'xz']
+DEFAULT_CHUNK_SIZE = 500
+# pipeline keyword arguments that can be set from the command line, and their defaults
+PIPELINE_OPTIONS = {
+  'roi_tracking': False,
+  'kalman_filter': False,
+  'detection_interval': 1,
+  'pyramid_factor': 1,
+  'parallel_views': False,
+}
+
+
+def rpy_matrix(rpy):
+  # urdf roll, pitch, yaw about the fixed x, y, z axes
+  (sr, sp, sy), (cr, cp, cy) = np.sin(rpy), np.cos(rpy)
+  return np.array([[cy*cp, cy*sp*sr - sy*cr, cy*sp*cr + sy*sr],
+                   [sy*cp, sy*sp*sr + cy*cr, sy*sp*cr - cy*sr],
+                   [-sp, cp*sr, cp*cr]])
+
+
+def parse_origin(element):
+  # (xyz, rotation) of a urdf <origin>, identity when it is absent
+  if element is None:
+    return np.zeros(3), np.eye(3)
+  xyz = np.array([float(v) for v in element.get('xyz', '0 0 0').split()])
+  rpy = np.array([float(v) for v in element.get('rpy', '0 0 0').split()])
+  return xyz, rpy_matrix(rpy)
+
+
+def urdf_visual_centre(path, link):
+  # model frame position of the visual of link with every joint at 0, i.e. relative to the spawn position
+  robot = ElementTree.parse(path).getroot()
+  parent_joints = dict((joint.find('child').get('link'), joint) for joint in robot.findall('joint'))
+  visual = robot.find("link[@name='" + link + "']/visual")
+  if visual is None:
+    raise ValueError("no visual for link " + link + " in " + path)
+  position, rotation = parse_origin(visual.find('origin'))
+  # walk up to the root link, moving the point into each parent frame
+  while link in parent_joints:
+    joint = parent_joints[link]
+    xyz, joint_rotation = parse_origin(joint.find('origin'))
+    position = xyz + joint_rotation @ position
+    link = joint.find('parent').get('link')
+  return position
+
+
+def chunks(path, chunk_size, count=None):
+  # (path, start, stop) frame ranges covering a recording
+  count = len(frame_recording(path)) if count is None else count
+  return [(path, start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+
+
+def evaluate_chunk(task):
+  # runs in a worker process: estimates of frames start to stop of one recording
+  path, start, stop, pipeline_options = task
+  recording = frame_recording(path)
+  estimates = []
+  report = replay(recording, vision_pipeline(**pipeline_options), start=start, stop=stop,
+                  on_estimate=lambda i, estimate: estimates.append(estimate))
+  return {
+    'path': path,
+    'start': start,
+    'stop': stop,
+    'joint_angles': np.array([estimate.joint_angles for estimate in estimates]).reshape(-1,3),
+    'end_effector_location': np.array([estimate.end_effector_location for estimate in estimates]).reshape(-1,3),
+    'target_location': np.array([estimate.target_location for estimate in estimates]).reshape(-1,3),
+    'joint_detections': np.array([estimate.joint_detections for estimate in estimates]).reshape(-1,2,len(JOINT_NAMES)),
+    'process_time': report.mean_process_time*report.frames,
+    'max_process_time': report.max_process_time,
+  }
+
+
+def initialize_worker():
+  # one opencv thread per process, the parallelism comes from the processes
+  cv2.setNumThreads(1)
+
+
+def finite_mean(values):
+  # mean over the frames with finite values, per column; NaN without any
+  values = np.asarray(values, dtype=np.float64)
+  valid = np.isfinite(values)
+  with np.errstate(invalid='ignore', divide='ignore'):
+    return np.where(valid, values, 0).sum(axis=0)/valid.sum(axis=0)
+
+
+def rmse(errors):
+  return np.sqrt(finite_mean(np.square(errors)))
+
+
+def finite_float(value):
+  # json has no NaN, missing values are written as null
+  value = float(value)
+  return value if np.isfinite(value) else None
+
+
+def occlusion_cases(joint_detections):
+  # (N,2,M) per view sphere detections -> (N,) case names:
+  # 'visible' every sphere in both views, 'one_view' some sphere missing from exactly one view,
+  # 'both_views' some sphere missing from both views
+  missing = ~joint_detections
+  both_views = (missing[:,0] & missing[:,1]).any(axis=1)
+  one_view = (missing[:,0] ^ missing[:,1]).any(axis=1)
+  return np.where(both_views, 'both_views', np.where(one_view, 'one_view', 'visible'))
+
+
+def accuracy(joint_angles, end_effector_location, target_location, true_joints, true_target, yellow_sphere_position):
+  # rmse and failure rates of one set of frames, as a json compatible dict.
+  # yellow_sphere_position is the world position of the vision origin, the target is measured from it
+  joint_errors = joint_angles - true_joints[:,1:]
+  end_effector_errors = end_effector_location - forward_kinematics_batch(true_joints)
+  target_errors = target_location - (true_target - yellow_sphere_position)
+  joint_failures = ~np.isfinite(joint_angles).all(axis=1)
+  target_failures = ~np.isfinite(target_location).all(axis=1)
+  frames = len(joint_angles)
+  return {
+    'frames': frames,
+    'joint_rmse': dict((name, finite_float(value)) for name, value in zip(ESTIMATED_JOINTS, rmse(joint_errors))),
+    'joint_mean_abs_error': dict((name, finite_float(value)) for name, value in zip(ESTIMATED_JOINTS, finite_mean(np.abs(joint_errors)))),
+    'end_effector_rmse': finite_float(rmse(np.linalg.norm(end_effector_errors, axis=1))),
+    'target_rmse': finite_float(rmse(np.linalg.norm(target_errors, axis=1))),
+    'target_axis_rmse': [finite_float(value) for value in rmse(target_errors)],
+    'joint_failure_rate': finite_float(joint_failures.mean()) if frames > 0 else None,
+    'target_failure_rate': finite_float(target_failures.mean()) if frames > 0 else None,
+  }
+
+
+def evaluate(paths, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, pipeline_options=None, urdf=ROBOT_URDF):
+  # returns the json compatible report of the pipeline over every recording in paths,
+  # for a robot spawned at the world origin from urdf
+  pipeline_options = dict(PIPELINE_OPTIONS, **(pipeline_options or {}))
+  yellow_sphere_position = urdf_visual_centre(urdf, YELLOW_SPHERE_LINK)
+  workers = workers if workers else os.cpu_count() or 1
+  tasks = [chunk + (pipeline_options,) for path in paths for chunk in chunks(path, chunk_size)]
+  if len(tasks) == 0:
+    raise ValueError("the recordings hold no frames")
+
+  start_time = time.perf_counter()
+  if workers == 1:
+    results = [evaluate_chunk(task) for task in tasks]
+  else:
+    with multiprocessing.Pool(workers, initializer=initialize_worker) as pool:
+      results = pool.map(evaluate_chunk, tasks, chunksize=1)
+  elapsed = time.perf_counter() - start_time
+
+  # ground truth of the chunks, in the order of the results
+  recordings = dict((path, frame_recording(path)) for path in paths)
+  true_joints = np.concatenate([recordings[r['path']].joint_positions[r['start']:r['stop']] for r in results])
+  true_target = np.concatenate([recordings[r['path']].target_positions[r['start']:r['stop']] for r in results])
+  joint_angles = np.concatenate([r['joint_angles'] for r in results])
+  end_effector_location = np.concatenate([r['end_effector_location'] for r in results])
+  target_location = np.concatenate([r['target_location'] for r in results])
+  joint_detections = np.concatenate([r['joint_detections'] for r in results])
+  process_time = sum(r['process_time'] for r in results)
+  frames = len(joint_angles)
+
+  cases = occlusion_cases(joint_detections)
+  occlusion = {}
+  for case in ['visible', 'one_view', 'both_views']:
+    selected = cases == case
+    occlusion[case] = accuracy(joint_angles[selected], end_effector_location[selected], target_location[selected],
+                               true_joints[selected], true_target[selected], yellow_sphere_position)
+    occlusion[case]['fraction'] = finite_float(selected.mean()) if frames > 0 else None
+
+  return {
+    'meta': {
+      'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+      'python': platform.python_version(),
+      'numpy': np.__version__,
+      'opencv': cv2.__version__,
+      'cpu_count': os.cpu_count(),
+    },
+    'config': {'recordings': list(paths), 'workers': workers, 'chunk_size': chunk_size, 'pipeline': pipeline_options,
+               'yellow_sphere_position': yellow_sphere_position.tolist()},
+    'throughput': {
+      'frames': frames,
+      'elapsed': elapsed,
+      'frames_per_second': frames/elapsed if elapsed > 0 else 0.0,
+      # pipeline speed of one process, without the pool overhead, as long as the workers do not outnumber the cores
+      'frames_per_process_second': frames/process_time if process_time > 0 else 0.0,
+      'mean_process_time': process_time/frames if frames > 0 else 0.0,
+      'max_process_time': max([r['max_process_time'] for r in results] + [0.0]),
+    },
+    'accuracy': accuracy(joint_angles, end_effector_location, target_location, true_joints, true_target, yellow_sphere_position),
+    # per view fraction of frames in which each sphere was not detected
+    'sphere_missing_rate': dict((view, dict((name, finite_float(rate)) for name, rate in zip(JOINT_NAMES, (~joint_detections[:,v]).mean(axis=0))))
+                                for v, view in enumerate(VIEW_NAMES)) if frames > 0 else {},
+    'occlusion': occlusion,
+  }
+
+
+def print_report(report):
+  throughput = report['throughput']
+  print("%d frames in %.2f s with %d workers: %.1f fps, %.1f fps per process, %.2f ms mean, %.2f ms max per frame"
+        % (throughput['frames'], throughput['elapsed'], report['config']['workers'], throughput['frames_per_second'],
+           throughput['frames_per_process_second'], throughput['mean_process_time']*1000, throughput['max_process_time']*1000))
+
+  def value(x, scale=1.0):
+    return "   n/a" if x is None else "%6.3f" % (x*scale)
+
+  print("%-11s %7s %8s  %s %s %s  %8s %8s  %8s %8s" % ("case", "frames", "fraction", "rmse j2", "rmse j3", "rmse j4",
+                                                      "ee rmse", "tgt rmse", "j fail", "tgt fail"))
+  rows = [('all', report['accuracy'])] + list(report['occlusion'].items())
+  for name, entry in rows:
+    fraction = entry.get('fraction', 1.0)
+    print("%-11s %7d %8s  %7s %7s %7s  %8s %8s  %8s %8s" % (name, entry['frames'], value(fraction),
+          value(entry['joint_rmse']['joint2']), value(entry['joint_rmse']['joint3']), value(entry['joint_rmse']['joint4']),
+          value(entry['end_effector_rmse']), value(entry['target_rmse']),
+          value(entry['joint_failure_rate']), value(entry['target_failure_rate'])))
+
+
+def main():
+  import argparse
+
+  parser = argparse.ArgumentParser(description="accuracy and throughput of the vision pipeline over frame recordings")
+  parser.add_argument('recordings', nargs='+')
+  parser.add_argument('--workers', type=int, default=0, help="processes, 0 = one per core")
+  parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="consecutive frames per task")
+  parser.add_argument('--output', help="write the json report to this file")
+  parser.add_argument('--urdf', default=ROBOT_URDF, help="robot description the yellow sphere position is read from")
+  parser.add_argument('--roi-tracking', action='store_true')
+  parser.add_argument('--kalman-filter', action='store_true')
+  parser.add_argument('--detection-interval', type=int, default=1)
+  parser.add_argument('--pyramid-factor', type=int, default=1)
+  args = parser.parse_args()
+
+  pipeline_options = {'roi_tracking': args.roi_tracking, 'kalman_filter': args.kalman_filter,
+                      'detection_interval': args.detection_interval, 'pyramid_factor': args.pyramid_factor}
+  report = evaluate(args.recordings, args.workers, args.chunk_size, pipeline_options, args.urdf)
+  print_report(report)
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+  main()
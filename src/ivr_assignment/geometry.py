@@ -0,0 +1,111 @@
+import numpy as np
+
+# merging of the two camera views into 3d joint coordinates and the joint angle estimate
+
+
+def compute_joint_angles(joint_coordinates):
+  # (4,3) yellow, blue, green, red coordinates -> joint 2, 3 and 4 angles
+  return compute_joint_angles_batch(np.asarray(joint_coordinates, dtype=np.float64)[np.newaxis])[0]
+
+
+def compute_joint_angles_batch(joint_coordinates):
+  # (N,4,3) stack of yellow, blue, green, red coordinates -> (N,3) joint 2, 3 and 4 angles.
+  # the coordinates stay floating point through both rotations
+  joint_coordinates = np.asarray(joint_coordinates, dtype=np.float64)
+
+  blue_green_vector = joint_coordinates[:,2] - joint_coordinates[:,1]
+  joint_2_angle = -np.arctan2(blue_green_vector[:,1],blue_green_vector[:,2])
+
+  joint_coordinates_rotated_around_x = rotate_around_x_axis(-joint_2_angle, joint_coordinates)
+
+  blue_green_vector_rotated_around_x = joint_coordinates_rotated_around_x[:,2] - joint_coordinates_rotated_around_x[:,1]
+  joint_3_angle = np.arctan2(blue_green_vector_rotated_around_x[:,0], blue_green_vector_rotated_around_x[:,2])
+
+  joint_coordinates_rotated_around_x_and_y = rotate_around_y_axis(joint_3_angle, joint_coordinates_rotated_around_x)
+
+  green_red_vector_rotated_around_x_and_y = joint_coordinates_rotated_around_x_and_y[:,3] - joint_coordinates_rotated_around_x_and_y[:,2]
+  joint_4_angle = -np.arctan2(green_red_vector_rotated_around_x_and_y[:,1], green_red_vector_rotated_around_x_and_y[:,2])
+
+  joint_angles = np.empty((len(joint_coordinates),3))
+  joint_angles[:,0] = joint_2_angle
+  joint_angles[:,1] = joint_3_angle
+  joint_angles[:,2] = joint_4_angle
+  return joint_angles
+
+
+def rotate_around_y_axis(angle, coordinates):
+  # rotates every point of coordinates, either (M,3) by a scalar angle or (N,M,3) by (N,) angles
+  c = np.cos(angle)
+  s = np.sin(angle)
+  rotation_matrix = np.zeros(np.shape(angle) + (3,3))
+  rotation_matrix[...,0,0] = c
+  rotation_matrix[...,0,2] = -s
+  rotation_matrix[...,1,1] = 1
+  rotation_matrix[...,2,0] = s
+  rotation_matrix[...,2,2] = c
+  return np.matmul(coordinates, np.swapaxes(rotation_matrix, -1, -2))
+
+
+def rotate_around_x_axis(angle, coordinates):
+  # rotates every point of coordinates, either (M,3) by a scalar angle or (N,M,3) by (N,) angles
+  c = np.cos(angle)
+  s = np.sin(angle)
+  rotation_matrix = np.zeros(np.shape(angle) + (3,3))
+  rotation_matrix[...,0,0] = 1
+  rotation_matrix[...,1,1] = c
+  rotation_matrix[...,1,2] = -s
+  rotation_matrix[...,2,1] = s
+  rotation_matrix[...,2,2] = c
+  return np.matmul(coordinates, np.swapaxes(rotation_matrix, -1, -2))
+
+
+def detected(coordinates):
+  # validity mask of (...,M,2) image coordinates, missing detections are NaN
+  return ~np.isnan(coordinates).any(axis=-1)
+
+
+def merge_plane_coordinates(yz_coordinates, xz_coordinates):
+  # (...,M,2) centred yz and xz coordinates -> (...,M,3) x,y,z coordinates.
+  # a point missing from one view borrows the horizontal coordinate, in that view, of the point
+  # closest to it on the z axis in the view that sees it
+  yz_coordinates = np.asarray(yz_coordinates, dtype=np.float64)
+  xz_coordinates = np.asarray(xz_coordinates, dtype=np.float64)
+
+  coordinates_3d = np.empty(yz_coordinates.shape[:-1] + (3,))
+  coordinates_3d[...,0] = xz_coordinates[...,0]
+  coordinates_3d[...,1:] = yz_coordinates
+
+  xz_missing = np.isnan(xz_coordinates[...,0])
+  if xz_missing.any():
+    inferred_x = np.take_along_axis(xz_coordinates[...,0], closest_points_on_z_axis(yz_coordinates), axis=-1)
+    coordinates_3d[...,0][xz_missing] = inferred_x[xz_missing]
+
+  yz_missing = np.isnan(yz_coordinates[...,0]) & ~xz_missing
+  if yz_missing.any():
+    inferred_y = np.take_along_axis(yz_coordinates[...,0], closest_points_on_z_axis(xz_coordinates), axis=-1)
+    coordinates_3d[...,1][yz_missing] = inferred_y[yz_missing]
+    coordinates_3d[...,2][yz_missing] = xz_coordinates[...,1][yz_missing]
+
+  return coordinates_3d
+
+
+def closest_points_on_z_axis(coordinates):
+  # (...,M,2) -> (...,M) index of the other point with the nearest z (image y) coordinate,
+  # the first one on ties, undetected points are never chosen
+  z = coordinates[...,1]
+  distances = np.abs(z[...,:,np.newaxis] - z[...,np.newaxis,:])
+  distances[np.isnan(distances)] = np.inf
+  diagonal = np.arange(z.shape[-1])
+  distances[...,diagonal,diagonal] = np.inf
+  return np.argmin(distances, axis=-1)
+
+
+def center_image_coordinates_around_first_joint(first_joint, other_joints):
+  # (...,2) first joint and (...,M,2) other joints -> (...,M+1,2) coordinates relative to the
+  # first joint with the image y axis flipped to point up. missing joints stay NaN
+  first_joint = np.asarray(first_joint, dtype=np.float64)
+  other_joints = np.asarray(other_joints, dtype=np.float64)
+
+  centred_joints = (other_joints - first_joint[...,np.newaxis,:])*np.array([1,-1])
+  first_joint_origin = np.zeros(centred_joints.shape[:-2] + (1,2))
+  return np.concatenate([first_joint_origin, centred_joints], axis=-2)
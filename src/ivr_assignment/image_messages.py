@@ -0,0 +1,25 @@
+import numpy as np
+
+# ingestion of sensor_msgs/Image messages without cv_bridge.
+# a bgr8 message is wrapped as a read only view of msg.data, so no frame copy is made,
+# other encodings go through the given conversion (normally CvBridge.imgmsg_to_cv2)
+
+
+def bgr8_view(msg):
+  # read only (height,width,3) uint8 view of msg.data, None if the message needs a conversion
+  if msg.encoding != 'bgr8' or not isinstance(msg.data, (bytes, bytearray, memoryview)):
+    return None
+  if msg.step < 3*msg.width or len(msg.data) < msg.step*msg.height:
+    return None
+  # rows may be padded, the step is the row stride
+  image = np.ndarray((msg.height, msg.width, 3), dtype=np.uint8, buffer=msg.data, strides=(msg.step, 3, 1))
+  image.flags.writeable = False
+  return image
+
+
+def bgr8_image(msg, convert):
+  # convert(msg) is only called for messages that cannot be viewed directly
+  image = bgr8_view(msg)
+  if image is None:
+    return convert(msg)
+  return image
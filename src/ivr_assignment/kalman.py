@@ -0,0 +1,70 @@
+import numpy as np
+
+# constant velocity kalman filters for a fixed set of image points, all updated at once.
+# the state of every point is [x, y, vx, vy] in pixels and pixels per frame
+
+
+class constant_velocity_filter:
+
+  def __init__(self, count, acceleration_std=1.0, measurement_std=1.0, initial_velocity_std=10.0, max_coast=5):
+    self.count = count
+    self.acceleration_variance = acceleration_std**2
+    self.measurement_variance = measurement_std**2
+    self.initial_velocity_variance = initial_velocity_std**2
+    # frames a point is predicted without a measurement before its track is dropped
+    self.max_coast = max_coast
+    self.state = np.full((count,4), np.nan)
+    self.covariance = np.zeros((count,4,4))
+    self.covariance[:] = np.eye(4)
+    self.tracking = np.zeros(count, dtype=bool)
+    # frames since the last measurement of each point
+    self.coasting = np.zeros(count, dtype=np.int64)
+
+  def predict(self, dt=1.0):
+    transition = np.eye(4)
+    transition[0,2] = transition[1,3] = dt
+    # white acceleration noise
+    noise = np.zeros((4,4))
+    noise[0,0] = noise[1,1] = dt**4/4
+    noise[0,2] = noise[2,0] = noise[1,3] = noise[3,1] = dt**3/2
+    noise[2,2] = noise[3,3] = dt**2
+    self.state = self.state @ transition.T
+    self.covariance = transition @ self.covariance @ transition.T + noise*self.acceleration_variance
+    self.coasting += 1
+
+    # drop tracks that went too long without a measurement
+    lost = self.tracking & (self.coasting > self.max_coast)
+    self.tracking[lost] = False
+    self.state[lost] = np.nan
+
+  def update(self, measurements):
+    # measurements is (count,2), NaN rows are points that were not measured this frame
+    measured = np.isfinite(measurements).all(axis=1)
+
+    # first measurement of a point starts its track at rest
+    start = measured & ~self.tracking
+    self.state[start,:2] = measurements[start]
+    self.state[start,2:] = 0
+    self.covariance[start] = np.diag([self.measurement_variance, self.measurement_variance,
+                                      self.initial_velocity_variance, self.initial_velocity_variance])
+
+    correct = measured & self.tracking
+    if correct.any():
+      P = self.covariance[correct]
+      innovation = measurements[correct] - self.state[correct,:2]
+      innovation_covariance = P[:,:2,:2] + np.eye(2)*self.measurement_variance
+      gain = P[:,:,:2] @ np.linalg.inv(innovation_covariance)
+      self.state[correct] += (gain @ innovation[:,:,None])[:,:,0]
+      self.covariance[correct] = P - gain @ P[:,:2,:]
+
+    self.tracking |= measured
+    self.coasting[measured] = 0
+
+  def positions(self):
+    # (count,2) filtered positions, NaN for points without a track
+    return self.state[:,:2].copy()
+
+  def position_std(self):
+    # rms standard deviation of the position of each point, inf without a track
+    std = np.sqrt((self.covariance[:,0,0] + self.covariance[:,1,1])/2)
+    return np.where(self.tracking, std, np.inf)
@@ -0,0 +1,215 @@
+import math
+import numpy as np
+
+# forward kinematics, jacobian and the closed loop control step of the 4 joint arm
+
+DEFAULT_K_P = np.eye(3)*10
+DEFAULT_K_D = np.eye(3)*0.1
+
+# damped least squares: the damping factor fades in from 0 to DEFAULT_DAMPING as the smallest
+# singular value of the jacobian drops from DEFAULT_SINGULAR_THRESHOLD to 0
+DEFAULT_DAMPING = 0.5
+DEFAULT_SINGULAR_THRESHOLD = 0.5
+
+# [lower, upper] joint limits of urdf/robot.urdf
+JOINT_LIMITS = np.array([[-np.pi, -np.pi/2, -np.pi/2, -np.pi/2],
+                         [np.pi, np.pi/2, np.pi/2, np.pi/2]])
+
+
+def forward_kinematics(q):
+  # to save space, every sine and cosine is evaluated once on python floats
+  s0, s1, s2, s3 = [math.sin(angle) for angle in q]
+  c0, c1, c2, c3 = [math.cos(angle) for angle in q]
+
+  x = 3.5*(c0*s2 + s0*s1*c2) + 3*(s0*c1*s3 + c3*(c0*s2 + s0*s1*c2))
+  y = 3.5*(s0*s2 - c0*s1*c2) + 3*(c3*( s0*s2 - c0*s1*c2 ) - c0*c1*s3)
+  z = 3.5*c1*c2 + 3*(c1*c2*c3 - s1*s3) + 2.5
+  return np.array([x,y,z])
+
+
+def jacobian(q):
+  # to save space, every sine and cosine is evaluated once on python floats
+  s0, s1, s2, s3 = [math.sin(angle) for angle in q]
+  c0, c1, c2, c3 = [math.cos(angle) for angle in q]
+
+  # get partial derivatives:
+  dx_dq0 = 3.5*(-s2*s0 + s1*c2*c0) + 3*(c1*s3*c0 + c3*(-s2*s0 + s1*c2*c0))
+  dx_dq1 = 3.5*(s0*c2*c1) + 3*(-s0*s3*s1 + c3*s0*c2*c1)
+  dx_dq2 = 3.5*(c0*c2 - s0*s1*s2) + 3*c3*(c0*c2 - s0*s1*s2)
+  dx_dq3 = 3*(s0*c1*c3 - s3*(c0*s2 + s0*c2*s1))
+
+  dy_dq0 = 3.5*(s2*c0 + s1*c2*s0) + 3*(c3*( s2*c0 + s1*c2*s0 ) + c1*s3*s0)
+  dy_dq1 = -3.5*c0*c2*c1 + 3*(-c3*c0*c2*c1 + c0*s3*s1)
+  dy_dq2 = 3.5*(s0*c2 + c0*s1*s2) + 3*c3*( s0*c2 + c0*s1*s2 )
+  dy_dq3 = 3*(-s3*( s0*s2 - c0*c2*s1) - c0*c1*c3)
+
+  dz_dq0 = 0
+  dz_dq1 = 3*(-s1*c2*c3 - c1*s3) - 3.5*s1*c2
+  dz_dq2 = -3.5*c1*s2 - 3*c1*s2*c3
+  dz_dq3 = 3*(-c1*c2*s3 - s1*c3)
+
+  # use partial derivatives to return the Jacobian
+  return np.array([[dx_dq0,dx_dq1,dx_dq2,dx_dq3],
+                   [dy_dq0,dy_dq1,dy_dq2,dy_dq3],
+                   [dz_dq0,dz_dq1,dz_dq2,dz_dq3]])
+
+
+def closed_loop_step(q, target, error_prev, dt, K_p=DEFAULT_K_P, K_d=DEFAULT_K_D, **solver_options):
+  # returns the new joint angles and the current end effector error
+  q, error, condition = resolved_rate_step(q, target, error_prev, dt, K_p, K_d, **solver_options)
+  return q, error
+
+
+def resolved_rate_step(q, target, error_prev, dt, K_p=DEFAULT_K_P, K_d=DEFAULT_K_D, damping=DEFAULT_DAMPING,
+                       singular_threshold=DEFAULT_SINGULAR_THRESHOLD, null_space_gain=0.0, joint_limits=JOINT_LIMITS,
+                       fixed_base=True, target_velocity=None):
+  # closed loop step through the damped least squares inverse of the jacobian, see damped_least_squares.
+  # with null_space_gain > 0 the joints are also pulled towards the centre of joint_limits without
+  # moving the end effector. the arm is only redundant with a free base joint (fixed_base=False), with q0
+  # fixed the null space is empty away from singular poses. a known target_velocity is fed forward
+  # so the end effector moves with the target instead of lagging behind it.
+  # returns the new joint angles, the end effector error and the condition number
+  q = np.asarray(q, dtype=np.float64)
+
+  # get vector from end effector to the target position
+  error = target - forward_kinematics(q)
+
+  J = jacobian(q)
+  # if q0 is fixed, we should account for this in the Jacobian
+  # dx,dy,dz can't be affected by change in q0, so set dx_dq0,dy_dq0,dz_dq0 to zero
+  if fixed_base:
+    J[:,0] = 0
+
+  # get error derivative
+  de_dt = (error - error_prev)/dt
+
+  secondary = None
+  if null_space_gain > 0:
+    secondary = null_space_gain*joint_limit_velocity(q, joint_limits)
+    if fixed_base:
+      secondary[0] = 0
+
+  # desired end effector velocity
+  v = K_p @ error + K_d @ de_dt
+  if target_velocity is not None:
+    v = v + target_velocity
+
+  # desired changes in joint angles q
+  dq, condition = damped_least_squares(J, v, damping, singular_threshold, secondary)
+
+  return q + dt*dq, error, condition
+
+
+def damped_least_squares(J, v, damping=DEFAULT_DAMPING, singular_threshold=DEFAULT_SINGULAR_THRESHOLD, secondary=None):
+  # joint velocities J^T (J J^T + l^2 I)^-1 v of a (3,n) jacobian through a closed form 3x3 inverse.
+  # l is 0 while the smallest singular value s of J is above singular_threshold, which gives the
+  # pseudo-inverse, and grows to damping as s goes to 0, which bounds the velocities at singular poses.
+  # the (n,) joint velocities secondary are projected into the null space of J.
+  # returns the joint velocities and the condition number of J
+  JJt = J @ J.T
+  eigenvalues = symmetric_eigenvalues_3x3(JJt)
+  singular_min = np.sqrt(max(eigenvalues[0], 0.0))
+  singular_max = np.sqrt(max(eigenvalues[2], 0.0))
+  condition = singular_max/singular_min if singular_min > 0 else np.inf
+
+  damping_squared = 0.0
+  if singular_min < singular_threshold:
+    damping_squared = (1 - (singular_min/singular_threshold)**2)*damping**2
+  J_inv = J.T @ inverse_3x3(JJt + damping_squared*np.eye(3))
+
+  dq = J_inv @ v
+  if secondary is not None:
+    dq += secondary - J_inv @ (J @ secondary)
+  return dq, condition
+
+
+def joint_limit_velocity(q, joint_limits=JOINT_LIMITS):
+  # negative gradient of sum(((q - centre)/half range)^2)/2, zero at the centre of every joint range
+  # and -1/half range at the limits
+  lower, upper = joint_limits
+  half_range = (upper - lower)/2
+  return -(q - (upper + lower)/2)/half_range**2
+
+
+def inverse_3x3(A):
+  # adjugate over determinant, on python floats since numpy call overhead dominates at this size
+  (a, b, c), (d, e, f), (g, h, i) = np.asarray(A, dtype=np.float64).tolist()
+  ei_fh = e*i - f*h
+  fg_di = f*g - d*i
+  dh_eg = d*h - e*g
+  determinant = a*ei_fh + b*fg_di + c*dh_eg
+  return np.array([[ei_fh, c*h - b*i, b*f - c*e],
+                   [fg_di, a*i - c*g, c*d - a*f],
+                   [dh_eg, b*g - a*h, a*e - b*d]])/determinant
+
+
+def symmetric_eigenvalues_3x3(A):
+  # closed form (trigonometric) eigenvalues of a symmetric 3x3 matrix, ascending
+  (a, b, c), (_, e, f), (_, _, i) = np.asarray(A, dtype=np.float64).tolist()
+  off_diagonal = b*b + c*c + f*f
+  if off_diagonal == 0:
+    return np.sort([a, e, i])
+  mean = (a + e + i)/3
+  a, e, i = a - mean, e - mean, i - mean
+  p = math.sqrt((a*a + e*e + i*i + 2*off_diagonal)/6)
+  # half the determinant of (A - mean I)/p
+  half_determinant = (a*(e*i - f*f) - b*(b*i - f*c) + c*(b*f - e*c))/(2*p**3)
+  phi = math.acos(min(max(half_determinant, -1.0), 1.0))/3
+  largest = mean + 2*p*math.cos(phi)
+  smallest = mean + 2*p*math.cos(phi + 2*math.pi/3)
+  return np.array([smallest, 3*mean - largest - smallest, largest])
+
+
+def forward_kinematics_batch(joint_vectors):
+  # (N,4) joint configurations -> (N,3) end effector positions.
+  # same expressions as forward_kinematics, with every sin/cos evaluated once per joint over the whole batch
+  q = np.asarray(joint_vectors, dtype=np.float64).reshape(-1,4)
+  s = np.sin(q)
+  c = np.cos(q)
+  s0, s1, s2, s3 = s.T
+  c0, c1, c2, c3 = c.T
+
+  # shared sub-expressions: direction of the 3.5 link and of the 3 link
+  link_3_x = c0*s2 + s0*s1*c2
+  link_3_y = s0*s2 - c0*s1*c2
+  link_3_z = c1*c2
+
+  positions = np.empty((len(q),3))
+  positions[:,0] = 3.5*link_3_x + 3*(s0*c1*s3 + c3*link_3_x)
+  positions[:,1] = 3.5*link_3_y + 3*(c3*link_3_y - c0*c1*s3)
+  positions[:,2] = 3.5*link_3_z + 3*(link_3_z*c3 - s1*s3) + 2.5
+  return positions
+
+
+def jacobian_batch(joint_vectors):
+  # (N,4) joint configurations -> (N,3,4) jacobians, the batched form of jacobian
+  q = np.asarray(joint_vectors, dtype=np.float64).reshape(-1,4)
+  s = np.sin(q)
+  c = np.cos(q)
+  s0, s1, s2, s3 = s.T
+  c0, c1, c2, c3 = c.T
+
+  s1c2 = s1*c2
+  c1c2 = c1*c2
+  c1s2 = c1*s2
+  s1s2 = s1*s2
+
+  J = np.zeros((len(q),3,4))
+  dx_dq0_link = -s2*s0 + s1c2*c0
+  J[:,0,0] = 3.5*dx_dq0_link + 3*(c1*s3*c0 + c3*dx_dq0_link)
+  J[:,0,1] = 3.5*(s0*c1c2) + 3*(-s0*s3*s1 + c3*s0*c1c2)
+  J[:,0,2] = 3.5*(c0*c2 - s0*s1s2) + 3*c3*(c0*c2 - s0*s1s2)
+  J[:,0,3] = 3*(s0*c1*c3 - s3*(c0*s2 + s0*s1c2))
+
+  dy_dq0_link = s2*c0 + s1c2*s0
+  dy_dq2_link = s0*c2 + c0*s1s2
+  J[:,1,0] = 3.5*dy_dq0_link + 3*(c3*dy_dq0_link + c1*s3*s0)
+  J[:,1,1] = -3.5*c0*c1c2 + 3*(-c3*c0*c1c2 + c0*s3*s1)
+  J[:,1,2] = 3.5*dy_dq2_link + 3*c3*dy_dq2_link
+  J[:,1,3] = 3*(-s3*(s0*s2 - c0*s1c2) - c0*c1*c3)
+
+  # dz_dq0 stays 0
+  J[:,2,1] = 3*(-s1c2*c3 - c1*s3) - 3.5*s1c2
+  J[:,2,2] = -3.5*c1s2 - 3*c1s2*c3
+  J[:,2,3] = 3*(-c1c2*s3 - s1*c3)
+  return J
@@ -0,0 +1,69 @@
+import numpy as np
+
+# chromaticity normalisation: every channel is scaled to c*255/(b+g+r) and truncated to uint8.
+# the float version below is the original implementation and is kept as the reference output.
+
+RECIPROCAL_SHIFT = 20
+MAX_CHANNEL_SUM = 3*255
+
+
+def normalize_rgb_float(img):
+  height, width = img.shape[:2]
+
+  normalized_rgb = np.zeros((height,width,3),np.float64)
+
+  img_float = img.astype(np.float64)
+
+  b = img_float[:,:,0]
+  g = img_float[:,:,1]
+  r = img_float[:,:,2]
+
+  rgb_sum = b + g + r
+  rgb_sum[rgb_sum == 0] = 1
+
+  normalized_rgb[:,:,0]=(b/rgb_sum)*255.0
+  normalized_rgb[:,:,1]=(g/rgb_sum)*255.0
+  normalized_rgb[:,:,2]=(r/rgb_sum)*255.0
+
+  return normalized_rgb.astype(np.uint8)
+
+
+def build_reciprocal_table(shift=RECIPROCAL_SHIFT):
+  # fixed point reciprocal ceil(255*2^shift/s) for every possible channel sum s in 0..765.
+  # since a channel value c never exceeds its sum, (c*table[s]) >> shift == floor(c*255/s) exactly
+  # and c*table[s] <= 255*2^shift + 255, which fits in uint32 for shift <= 23
+  sums = np.arange(MAX_CHANNEL_SUM+1, dtype=np.int64)
+  sums[0] = 1
+  table = -((-(255 << shift)) // sums)
+  table[0] = 0 # black pixels stay black
+  return table.astype(np.uint32)
+
+
+class rgb_normalizer:
+
+  def __init__(self, shift=RECIPROCAL_SHIFT):
+    self.shift = shift
+    self.reciprocal_table = build_reciprocal_table(shift)
+    self.shape = None
+
+  def allocate(self, shape):
+    height, width = shape[:2]
+    self.shape = shape
+    self.rgb_sum = np.empty((height,width), np.uint16)
+    self.reciprocal = np.empty((height,width,1), np.uint32)
+    self.product = np.empty((height,width,3), np.uint32)
+    self.output = np.empty((height,width,3), np.uint8)
+
+  def normalize(self, img):
+    # returns a view of the internal output buffer, which is overwritten on the next call
+    if img.shape != self.shape:
+      self.allocate(img.shape)
+
+    np.add(img[:,:,0], img[:,:,1], out=self.rgb_sum, dtype=np.uint16)
+    np.add(self.rgb_sum, img[:,:,2], out=self.rgb_sum)
+    np.take(self.reciprocal_table, self.rgb_sum, out=self.reciprocal[:,:,0])
+
+    np.multiply(img, self.reciprocal, out=self.product, dtype=np.uint32)
+    np.right_shift(self.product, self.shift, out=self.product)
+    np.copyto(self.output, self.product, casting='unsafe')
+    return self.output
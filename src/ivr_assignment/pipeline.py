@@ -0,0 +1,286 @@
+import time
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from ivr_assignment.normalization import rgb_normalizer
+from ivr_assignment.profiling import latency_profiler
+from ivr_assignment.kalman import constant_velocity_filter
+from ivr_assignment.pyramid import pyramid_detector
+from ivr_assignment.calibration import YELLOW_TO_BLUE_METRES
+from ivr_assignment.colour_classifier import colour_classifier, JOINT_NAMES
+from ivr_assignment.roi_tracking import roi_tracker
+from ivr_assignment.detection import get_target_image_coord, get_black_joint_centers, JOINT_1_IMAGE_COORDINATES, JOINT_2_IMAGE_COORDINATES
+from ivr_assignment.geometry import detected, center_image_coordinates_around_first_joint, merge_plane_coordinates, compute_joint_angles, compute_joint_angles_batch
+
+# the full vision pipeline from a synchronised pair of bgr frames to joint angles and target location.
+# the yz image comes from camera 1 and the xz image from camera 2
+
+# joints 1 and 2 do not move in the images and can come from a base_calibration instead
+BASE_JOINT_NAMES = JOINT_NAMES[:2]
+MOVING_JOINT_NAMES = JOINT_NAMES[2:]
+
+# joint_detections is the (2,4) validity mask of the [yz, xz] x [yellow, blue, green, red] sphere centroids,
+# values computed from undetected spheres are NaN
+# points followed by the optional kalman filter of each view, the joint spheres then the target
+TRACKED_NAMES = JOINT_NAMES + ['orange']
+
+vision_estimate = namedtuple('vision_estimate', ['joint_angles', 'end_effector_location', 'target_location', 'view_times', 'joint_detections'])
+
+
+class camera_view:
+  # per camera state: each view owns its buffers, so two views can be processed at the same time
+
+  def __init__(self, roi_tracking=False, window_size=120, fallback='immediate', full_search_interval=0, profiler=None, name='view',
+               kalman_filter=False, detection_interval=1, confident_std=2.0, max_coast=5, pyramid_factor=1):
+    # stages are timed as <name>_normalize, <name>_joints and <name>_target
+    self.profiler = latency_profiler() if profiler is None else profiler
+    self.stage_names = [name + '_normalize', name + '_joints', name + '_target']
+    self.normalizer = rgb_normalizer()
+    self.classifier = colour_classifier()
+    self.tracker = None
+    if roi_tracking:
+      self.tracker = roi_tracker(self.classifier, window_size, fallback, full_search_interval, self.normalizer)
+    # coarse to fine search instead of full resolution classification of the whole frame
+    self.pyramid = None
+    if pyramid_factor > 1:
+      if roi_tracking:
+        raise ValueError("pyramid detection and roi tracking cannot be combined")
+      self.pyramid = pyramid_detector(pyramid_factor, self.classifier.dilation)
+    # last known target position, kept when the target cannot be found
+    self.target_centroid = np.array([0,0])
+
+    # optional constant velocity filter over the spheres and the target. spheres whose position is known
+    # to within confident_std pixels are only detected every detection_interval frames and predicted otherwise
+    self.filter = None
+    if kalman_filter:
+      self.filter = constant_velocity_filter(len(TRACKED_NAMES), max_coast=max_coast)
+      self.detection_interval = detection_interval
+      self.confident_std = confident_std
+      self.filter_frames = 0
+
+  def detect(self, image, joint_names, find_target):
+    # normalise, locate the given joint spheres and optionally the target, returns ({name: centroid}, target coordinate or None)
+    normalize_stage, joints_stage, target_stage = self.stage_names
+    if self.pyramid is not None:
+      return self.pyramid_detect(image, joint_names, find_target)
+
+    # same centroids as get_joint_center(image, thresholds, erosion=0, dilation=2) for every colour
+    target_coord = None
+    if self.tracker is not None:
+      # the tracker normalises its windows, and the full frame only when it falls back to a full search
+      with self.profiler.stage(joints_stage):
+        joint_centroids = self.tracker.locate(image, joint_names)
+      if find_target:
+        with self.profiler.stage(target_stage):
+          target_coord = self.tracker.locate_target(image, get_target_image_coord)
+    else:
+      with self.profiler.stage(normalize_stage):
+        image_normalized = self.normalizer.normalize(image)
+      with self.profiler.stage(joints_stage):
+        self.classifier.classify(image_normalized)
+        joint_centroids = dict((name, self.classifier.centroid(name)) for name in joint_names)
+      if find_target:
+        with self.profiler.stage(target_stage):
+          # the orange mask was already produced by the colour classifier
+          target_coord = get_target_image_coord(image_normalized, self.classifier.mask('orange'))
+    return joint_centroids, target_coord
+
+  def pyramid_detect(self, image, joint_names, find_target):
+    # the coarse pass normalises and classifies the downsampled frame, then each colour is refined
+    normalize_stage, joints_stage, target_stage = self.stage_names
+    with self.profiler.stage(normalize_stage):
+      self.pyramid.coarse_pass(image)
+    with self.profiler.stage(joints_stage):
+      joint_centroids = dict((name, self.pyramid.joint_centroid(image, name)) for name in joint_names)
+    target_coord = None
+    if find_target:
+      with self.profiler.stage(target_stage):
+        target_coord = self.pyramid.target_coord(image)
+    return joint_centroids, target_coord
+
+  def filtered_detect(self, image):
+    # predict every tracked point, detect the ones that need it and correct the filter with the results
+    self.filter.predict()
+    self.filter_frames += 1
+    skip = np.zeros(len(TRACKED_NAMES), dtype=bool)
+    if self.detection_interval > 1 and self.filter_frames % self.detection_interval != 0:
+      skip = self.filter.position_std() < self.confident_std
+
+    if self.tracker is not None:
+      # search windows are centred on the predicted positions
+      for name, position in zip(TRACKED_NAMES, self.filter.positions()):
+        if np.isfinite(position[0]):
+          self.tracker.last_centroids[name] = position
+
+    measurements = np.full((len(TRACKED_NAMES),2), np.nan)
+    if not skip.all():
+      names = [name for name, skipped in zip(JOINT_NAMES, skip) if not skipped]
+      joint_centroids, target_coord = self.detect(image, names, not skip[-1])
+      for i, name in enumerate(JOINT_NAMES):
+        # a deferred roi fallback repeats the window position, which is not a measurement
+        if name in joint_centroids and (self.tracker is None or self.tracker.last_centroids.get(name) is not None):
+          measurements[i] = joint_centroids[name]
+      if target_coord is not None:
+        measurements[-1] = target_coord
+    self.filter.update(measurements)
+
+    positions = self.filter.positions()
+    if np.isfinite(positions[-1,0]):
+      self.target_centroid = positions[-1]
+    return dict(zip(JOINT_NAMES, positions[:-1]))
+
+  def process(self, image, joint_names=JOINT_NAMES):
+    # locate the given joint spheres and the target, returns (joint centroids, processing time).
+    # the kalman filter always follows every sphere
+    start_time = time.perf_counter()
+    if self.filter is not None:
+      return self.filtered_detect(image), time.perf_counter() - start_time
+
+    joint_centroids, target_coord = self.detect(image, joint_names, True)
+    # try get image location of sphere, if one cant - use previously found position
+    if target_coord is not None:
+      self.target_centroid = target_coord
+
+    return joint_centroids, time.perf_counter() - start_time
+
+  def filter_state(self):
+    # (state, covariance) of the tracked points, [x, y, vx, vy] in pixels and pixels per frame
+    return self.filter.state.copy(), self.filter.covariance.copy()
+
+  def roi_hit_rate(self):
+    if self.tracker is None:
+      return 0.0
+    return self.tracker.hit_rate()
+
+
+class vision_pipeline:
+
+  def __init__(self, roi_tracking=False, window_size=120, fallback='immediate', full_search_interval=0, parallel_views=False, profiler=None,
+               kalman_filter=False, detection_interval=1, confident_std=2.0, max_coast=5, pyramid_factor=1, calibration=None):
+    # per stage timings, disabled unless an enabled latency_profiler is passed in
+    self.profiler = latency_profiler() if profiler is None else profiler
+    self.kalman_filter = kalman_filter
+    self.yz_view = camera_view(roi_tracking, window_size, fallback, full_search_interval, self.profiler, 'yz',
+                               kalman_filter, detection_interval, confident_std, max_coast, pyramid_factor)
+    self.xz_view = camera_view(roi_tracking, window_size, fallback, full_search_interval, self.profiler, 'xz',
+                               kalman_filter, detection_interval, confident_std, max_coast, pyramid_factor)
+    # optionally process the two views concurrently, opencv releases the GIL in the heavy calls
+    self.view_pool = ThreadPoolExecutor(max_workers=1) if parallel_views else None
+    # optional base_calibration, once calibrated joints 1 and 2 are only detected for its drift checks
+    self.calibration = calibration
+
+  def process_views(self, yz_image, xz_image, joint_names=JOINT_NAMES):
+    if self.view_pool is not None:
+      # the yz branch runs on the pool thread while this thread handles the xz branch
+      yz_branch = self.view_pool.submit(self.yz_view.process, yz_image, joint_names)
+      xz_result = self.xz_view.process(xz_image, joint_names)
+      return yz_branch.result(), xz_result
+    return self.yz_view.process(yz_image, joint_names), self.xz_view.process(xz_image, joint_names)
+
+  def calibrate(self, yz_joint_centroids, xz_joint_centroids, detected_base):
+    # feeds the base joint detections to the calibration and replaces them with the calibrated positions
+    if detected_base:
+      self.calibration.observe([[joint_centroids[name] for name in BASE_JOINT_NAMES]
+                                for joint_centroids in (yz_joint_centroids, xz_joint_centroids)])
+    else:
+      self.calibration.advance()
+    if self.calibration.calibrated():
+      for joint_centroids, positions in zip((yz_joint_centroids, xz_joint_centroids), self.calibration.positions):
+        joint_centroids.update(zip(BASE_JOINT_NAMES, positions))
+
+  def locate(self, yz_image, xz_image):
+    # 3d sphere coordinates in pixels, end effector and target location in metres, view times, detections
+    detect_base = self.calibration is None or self.calibration.needs_detection()
+    joint_names = JOINT_NAMES if detect_base else MOVING_JOINT_NAMES
+    (yz_joint_centroids, yz_time), (xz_joint_centroids, xz_time) = self.process_views(yz_image, xz_image, joint_names)
+
+    with self.profiler.stage('merge'):
+      if self.calibration is not None:
+        self.calibrate(yz_joint_centroids, xz_joint_centroids, detect_base)
+
+      # yellow, blue, green, red
+      yz_centroids = np.array([yz_joint_centroids[name] for name in JOINT_NAMES])
+      xz_centroids = np.array([xz_joint_centroids[name] for name in JOINT_NAMES])
+
+      centered_yz_centroids = center_image_coordinates_around_first_joint(yz_centroids[0],yz_centroids[1:])
+      centered_xz_centroids = center_image_coordinates_around_first_joint(xz_centroids[0],xz_centroids[1:])
+
+      coordinates_3d = merge_plane_coordinates(centered_yz_centroids, centered_xz_centroids)
+
+      # find distance between yellow and blue spheres, and we know the real metre distance is 2.5m.
+      # a calibration has already measured it
+      if self.calibration is not None and self.calibration.calibrated():
+        metres_per_pixel_ratio = self.calibration.scale
+      else:
+        yellow_to_blue_dist = np.linalg.norm(coordinates_3d[1])
+        metres_per_pixel_ratio = YELLOW_TO_BLUE_METRES/yellow_to_blue_dist
+
+      # end effector position (red sphere position)
+      red_sphere_position = coordinates_3d[3]*metres_per_pixel_ratio
+
+      centred_target_yz_centroid = center_image_coordinates_around_first_joint(yz_centroids[0],np.array([self.yz_view.target_centroid]))[1]
+      centred_target_xz_centroid = center_image_coordinates_around_first_joint(xz_centroids[0],np.array([self.xz_view.target_centroid]))[1]
+      target_location = merge_plane_coordinates([centred_target_yz_centroid],[centred_target_xz_centroid])[0]
+      target_location = target_location*metres_per_pixel_ratio
+
+      joint_detections = np.stack([detected(yz_centroids), detected(xz_centroids)])
+    return coordinates_3d, red_sphere_position, target_location, np.array([yz_time, xz_time]), joint_detections
+
+  def process(self, yz_image, xz_image):
+    coordinates_3d, end_effector_location, target_location, view_times, joint_detections = self.locate(yz_image, xz_image)
+    with self.profiler.stage('angles'):
+      joint_angles = compute_joint_angles(coordinates_3d)
+    return vision_estimate(joint_angles, end_effector_location, target_location, view_times, joint_detections)
+
+  def process_batch(self, yz_images, xz_images):
+    # frames are located in order, so target and roi tracking state carries over between them,
+    # then the joint angles of all frames come from one call.
+    # returns a vision_estimate whose fields are stacked over the frames
+    located = [self.locate(yz_image, xz_image) for yz_image, xz_image in zip(yz_images, xz_images)]
+    coordinates_3d, end_effector_locations, target_locations, view_times, joint_detections = [np.array(field) for field in zip(*located)]
+    with self.profiler.stage('angles'):
+      joint_angles = compute_joint_angles_batch(coordinates_3d.reshape(-1,4,3))
+    return vision_estimate(joint_angles, end_effector_locations.reshape(-1,3),
+                           target_locations.reshape(-1,3), view_times.reshape(-1,2), joint_detections.reshape(-1,2,4))
+
+  def roi_hit_rates(self):
+    return np.array([self.yz_view.roi_hit_rate(), self.xz_view.roi_hit_rate()])
+
+  def filter_states(self):
+    # (2,5,4) states and (2,5,4,4) covariances of the [yz, xz] kalman filters, points ordered as TRACKED_NAMES
+    (yz_state, yz_covariance), (xz_state, xz_covariance) = self.yz_view.filter_state(), self.xz_view.filter_state()
+    return np.stack([yz_state, xz_state]), np.stack([yz_covariance, xz_covariance])
+
+
+class black_joint_pipeline:
+  # joint angles when every sphere is black: joints 1 and 2 are at fixed image positions and
+  # joints 3 and 4 are found with a hough circle search
+
+  def __init__(self, calibration=None):
+    # (2,2,2) [yz, xz] x [joint 1, joint 2] image positions. black spheres cannot be calibrated by colour,
+    # so a calibrated base_calibration from the coloured robot replaces the usual positions
+    self.base_positions = np.array([[JOINT_1_IMAGE_COORDINATES, JOINT_2_IMAGE_COORDINATES]]*2)
+    if calibration is not None and calibration.calibrated():
+      self.base_positions = calibration.positions
+
+  def locate(self, yz_image, xz_image):
+    # 3d sphere coordinates in pixels
+    (yz_joint_1, yz_joint_2), (xz_joint_1, xz_joint_2) = self.base_positions
+    detected_centroids_yz = get_black_joint_centers(yz_image, yz_joint_1, yz_joint_2)
+    detected_centroids_xz = get_black_joint_centers(xz_image, xz_joint_1, xz_joint_2)
+
+    # yellow, blue, green, red
+    yz_centroids = np.array([yz_joint_1, yz_joint_2, detected_centroids_yz[0], detected_centroids_yz[1]])
+    xz_centroids = np.array([xz_joint_1, xz_joint_2, detected_centroids_xz[0], detected_centroids_xz[1]])
+
+    centered_yz_centroids = center_image_coordinates_around_first_joint(yz_centroids[0],yz_centroids[1:])
+    centered_xz_centroids = center_image_coordinates_around_first_joint(xz_centroids[0],xz_centroids[1:])
+
+    return merge_plane_coordinates(centered_yz_centroids, centered_xz_centroids)
+
+  def process(self, yz_image, xz_image):
+    return compute_joint_angles(self.locate(yz_image, xz_image))
+
+  def process_batch(self, yz_images, xz_images):
+    coordinates_3d = np.array([self.locate(yz_image, xz_image) for yz_image, xz_image in zip(yz_images, xz_images)])
+    return compute_joint_angles_batch(coordinates_3d.reshape(-1,4,3))
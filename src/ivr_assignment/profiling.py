@@ -0,0 +1,88 @@
+import time
+import threading
+import numpy as np
+from contextlib import nullcontext
+
+# per stage latency histograms over the most recent samples.
+# a disabled profiler hands out one shared no-op context, so instrumented code costs next to nothing
+
+PERCENTILES = [50, 95, 99]
+NULL_STAGE = nullcontext()
+
+
+class rolling_histogram:
+
+  def __init__(self, window=1000):
+    self.samples = np.zeros(window)
+    self.count = 0
+    # samples can arrive from several threads, e.g. the views of parallel_views or the robot_pool workers
+    self.lock = threading.Lock()
+
+  def add(self, value):
+    with self.lock:
+      self.samples[self.count % len(self.samples)] = value
+      self.count += 1
+
+  def percentiles(self):
+    # [p50, p95, p99, max] of the samples in the window, NaN before the first sample
+    with self.lock:
+      values = self.samples[:min(self.count, len(self.samples))].copy()
+    if len(values) == 0:
+      return np.full(len(PERCENTILES) + 1, np.nan)
+    return np.append(np.percentile(values, PERCENTILES), values.max())
+
+
+class stage_timing:
+
+  __slots__ = ('histogram', 'start')
+
+  def __init__(self, histogram):
+    self.histogram = histogram
+
+  def __enter__(self):
+    self.start = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc):
+    self.histogram.add(time.perf_counter() - self.start)
+    return False
+
+
+class latency_profiler:
+
+  def __init__(self, enabled=False, window=1000):
+    self.enabled = enabled
+    self.window = window
+    # stage name -> rolling_histogram, in the order stages were first seen
+    self.histograms = {}
+
+  def histogram(self, name):
+    histogram = self.histograms.get(name)
+    if histogram is None:
+      histogram = self.histograms.setdefault(name, rolling_histogram(self.window))
+    return histogram
+
+  def stage(self, name):
+    # with profiler.stage('name'): ... records the duration of the block in seconds
+    if not self.enabled:
+      return NULL_STAGE
+    return stage_timing(self.histogram(name))
+
+  def record(self, name, seconds):
+    # for durations measured elsewhere, e.g. end to end latency from a message stamp
+    if self.enabled:
+      self.histogram(name).add(seconds)
+
+  def summary(self):
+    # stage name -> (sample count, [p50, p95, p99, max] in seconds)
+    return dict((name, (histogram.count, histogram.percentiles())) for name, histogram in list(self.histograms.items()))
+
+  def report_values(self):
+    # (stage name, [(key, value string)]) pairs with times in ms, ready for diagnostic messages
+    report = []
+    for name, (count, percentiles) in self.summary().items():
+      values = [('count', str(count))]
+      for key, value in zip(['p' + str(p) for p in PERCENTILES] + ['max'], percentiles*1000):
+        values.append((key + '_ms', '%.3f' % value))
+      report.append((name, values))
+    return report
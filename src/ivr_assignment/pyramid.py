@@ -0,0 +1,74 @@
+import numpy as np
+import cv2
+from ivr_assignment.normalization import rgb_normalizer
+from ivr_assignment.colour_classifier import colour_classifier, JOINT_NAMES
+from ivr_assignment.detection import get_target_image_coord
+
+# coarse to fine colour detection: every colour is found on a frame downsampled by `factor`,
+# then its centroid is recomputed at full resolution in a window around the coarse blob.
+# a window holds every full resolution pixel of its colour unless part of the blob is thinner
+# than the downsampling step, in which case the result matches the full frame search
+
+
+class pyramid_detector:
+
+  def __init__(self, factor=2, dilation=2):
+    if factor < 1:
+      raise ValueError("pyramid factor must be at least 1")
+    self.factor = factor
+    self.coarse_normalizer = rgb_normalizer()
+    self.coarse_classifier = colour_classifier(dilation=dilation)
+    self.window_normalizer = rgb_normalizer()
+    self.window_classifier = colour_classifier(dilation=dilation)
+    # the dilation only reaches down and right, so the margin covers it plus one coarse step
+    self.margin = factor + dilation + 1
+    self.image_shape = None
+
+  def coarse_pass(self, image):
+    # nearest neighbour downsampling keeps the saturated sphere colours unmixed
+    self.image_shape = image.shape
+    height, width = image.shape[:2]
+    coarse = cv2.resize(image, (width//self.factor, height//self.factor), interpolation=cv2.INTER_NEAREST)
+    self.coarse_classifier.classify(self.coarse_normalizer.normalize(coarse))
+
+  def window(self, name):
+    # full resolution (x0, y0, x1, y1) around the coarse blob of one colour, None if it was not found
+    if self.coarse_classifier.moments[name][0] == 0:
+      return None
+    x, y, w, h = cv2.boundingRect(self.coarse_classifier.mask(name))
+    height, width = self.image_shape[:2]
+    x0 = max(x*self.factor - self.margin, 0)
+    y0 = max(y*self.factor - self.margin, 0)
+    x1 = min((x + w)*self.factor + self.margin, width)
+    y1 = min((y + h)*self.factor + self.margin, height)
+    return x0, y0, x1, y1
+
+  def classify_window(self, image, window):
+    x0, y0, x1, y1 = window
+    window_image = self.window_normalizer.normalize(image[y0:y1,x0:x1])
+    self.window_classifier.classify(window_image)
+    return window_image
+
+  def joint_centroid(self, image, name):
+    # same convention as colour_classifier.centroid, NaN when the colour is missing
+    window = self.window(name)
+    if window is None:
+      return np.array([np.nan, np.nan])
+    self.classify_window(image, window)
+    return self.window_classifier.centroid(name) + np.array([window[0], window[1]])
+
+  def target_coord(self, image, detect=get_target_image_coord, name='orange'):
+    window = self.window(name)
+    if window is None:
+      return None
+    window_image = self.classify_window(image, window)
+    coord = detect(window_image, self.window_classifier.mask(name))
+    if coord is None:
+      return None
+    return np.array(coord) + np.array([window[0], window[1]])
+
+  def locate(self, image, names=JOINT_NAMES, find_target=True):
+    # ({name: centroid}, target coordinate or None) for one frame
+    self.coarse_pass(image)
+    joint_centroids = dict((name, self.joint_centroid(image, name)) for name in names)
+    return joint_centroids, self.target_coord(image) if find_target else None
@@ -0,0 +1,106 @@
+import os
+import json
+import numpy as np
+
+# on disk recording of synchronised frame pairs with ground truth.
+# a recording is a directory holding fixed stride memory mapped arrays:
+#   frames.u8  (capacity,2,height,width,3) uint8, the [yz, xz] bgr frame pair of every entry
+#   stamps.f8  (capacity,) float64 image header stamps in seconds
+#   joints.f8  (capacity,4) float64 robot joint positions from /robot/joint_states
+#   target.f8  (capacity,3) float64 target position from /target/joint_states
+# and meta.json with the frame shape and the number of valid entries. meta.json is rewritten every
+# meta_interval frames, so a recorder that is killed leaves a readable recording missing at most that many
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+DEFAULT_META_INTERVAL = 30
+
+
+def recording_arrays(height, width):
+  # file name, dtype and per entry shape of every array of a recording
+  return [
+    ('frames', 'frames.u8', np.uint8, (2,height,width,3)),
+    ('stamps', 'stamps.f8', np.float64, ()),
+    ('joints', 'joints.f8', np.float64, (4,)),
+    ('target', 'target.f8', np.float64, (3,)),
+  ]
+
+
+class frame_recorder:
+
+  def __init__(self, path, height, width, capacity, meta_interval=DEFAULT_META_INTERVAL):
+    os.makedirs(path, exist_ok=True)
+    self.path = path
+    self.height = height
+    self.width = width
+    self.capacity = capacity
+    self.meta_interval = meta_interval
+    self.count = 0
+    self.arrays = {}
+    for name, filename, dtype, shape in recording_arrays(height, width):
+      self.arrays[name] = np.memmap(os.path.join(path, filename), dtype=dtype, mode='w+', shape=(capacity,) + shape)
+    self.write_meta()
+
+  def full(self):
+    return self.count >= self.capacity
+
+  def append(self, yz_image, xz_image, stamp, joint_positions=None, target_position=None):
+    # copies one synchronised frame pair into the next slot, missing ground truth is stored as NaN
+    if self.full():
+      raise IndexError("recording is full (" + str(self.capacity) + " frames)")
+    i = self.count
+    self.arrays['frames'][i,0] = yz_image
+    self.arrays['frames'][i,1] = xz_image
+    self.arrays['stamps'][i] = stamp
+    self.arrays['joints'][i] = np.nan if joint_positions is None else joint_positions
+    self.arrays['target'][i] = np.nan if target_position is None else target_position
+    self.count += 1
+    # the memory maps are shared with the page cache, so the frames outlive the process without a flush
+    if self.meta_interval > 0 and self.count % self.meta_interval == 0:
+      self.write_meta()
+
+  def write_meta(self):
+    meta = {'version': FORMAT_VERSION, 'height': self.height, 'width': self.width, 'capacity': self.capacity, 'count': self.count}
+    # written next to the old file and renamed over it, so meta.json is never seen half written
+    path = os.path.join(self.path, META_FILE)
+    with open(path + '.tmp', 'w') as f:
+      json.dump(meta, f)
+    os.replace(path + '.tmp', path)
+
+  def flush(self):
+    for array in self.arrays.values():
+      array.flush()
+    self.write_meta()
+
+  def close(self):
+    self.flush()
+    self.arrays = {}
+
+
+class frame_recording:
+  # read only view of a recording, every frame accessor returns a view into the memory map
+
+  def __init__(self, path):
+    with open(os.path.join(path, META_FILE)) as f:
+      meta = json.load(f)
+    if meta['version'] != FORMAT_VERSION:
+      raise ValueError("unsupported recording version: " + str(meta['version']))
+    self.path = path
+    self.height = meta['height']
+    self.width = meta['width']
+    self.count = meta['count']
+    arrays = {}
+    for name, filename, dtype, shape in recording_arrays(self.height, self.width):
+      arrays[name] = np.memmap(os.path.join(path, filename), dtype=dtype, mode='r', shape=(meta['capacity'],) + shape)[:self.count]
+    self.frames = arrays['frames']
+    self.stamps = arrays['stamps']
+    self.joint_positions = arrays['joints']
+    self.target_positions = arrays['target']
+    self.yz_frames = self.frames[:,0]
+    self.xz_frames = self.frames[:,1]
+
+  def __len__(self):
+    return self.count
+
+  def frame_pair(self, i):
+    return self.yz_frames[i], self.xz_frames[i]
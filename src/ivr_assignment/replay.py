@@ -0,0 +1,65 @@
+import time
+import numpy as np
+from collections import namedtuple
+
+# feeds a recording into a vision pipeline, as fast as possible or at a fixed frame rate
+
+replay_report = namedtuple('replay_report', ['frames', 'elapsed', 'frames_per_second', 'mean_process_time', 'max_process_time', 'late_frames'])
+
+
+def replay(recording, pipeline, rate=None, start=0, stop=None, on_estimate=None):
+  # recording is a frame_recording, pipeline anything with process(yz_image, xz_image).
+  # frames are passed as views into the memory map, so nothing is copied before the pipeline.
+  # with a rate, frame i is released at i/rate seconds and frames that finish after the next
+  # release time are counted as late. on_estimate(i, estimate) is called for every frame
+  stop = len(recording) if stop is None else min(stop, len(recording))
+  process_times = np.zeros(max(stop - start, 0))
+  late_frames = 0
+
+  start_time = time.perf_counter()
+  for n, i in enumerate(range(start, stop)):
+    if rate is not None:
+      release_time = start_time + n/rate
+      delay = release_time - time.perf_counter()
+      if delay > 0:
+        time.sleep(delay)
+
+    frame_start = time.perf_counter()
+    estimate = pipeline.process(recording.yz_frames[i], recording.xz_frames[i])
+    frame_end = time.perf_counter()
+    process_times[n] = frame_end - frame_start
+
+    if rate is not None and frame_end > start_time + (n+1)/rate:
+      late_frames += 1
+    if on_estimate is not None:
+      on_estimate(i, estimate)
+  elapsed = time.perf_counter() - start_time
+
+  frames = len(process_times)
+  return replay_report(frames, elapsed, frames/elapsed if elapsed > 0 else 0.0,
+                       float(process_times.mean()) if frames > 0 else 0.0,
+                       float(process_times.max()) if frames > 0 else 0.0, late_frames)
+
+
+def main():
+  import argparse
+  from ivr_assignment.recording import frame_recording
+  from ivr_assignment.pipeline import vision_pipeline
+
+  parser = argparse.ArgumentParser(description="replay a frame recording through the vision pipeline")
+  parser.add_argument('recording')
+  parser.add_argument('--rate', type=float, default=None, help="frames per second, as fast as possible if omitted")
+  parser.add_argument('--roi-tracking', action='store_true')
+  parser.add_argument('--parallel-views', action='store_true')
+  args = parser.parse_args()
+
+  recording = frame_recording(args.recording)
+  pipeline = vision_pipeline(roi_tracking=args.roi_tracking, parallel_views=args.parallel_views)
+  report = replay(recording, pipeline, rate=args.rate)
+  print("%d frames in %.2f s: %.1f fps, %.2f ms mean, %.2f ms max per frame, %d late"
+        % (report.frames, report.elapsed, report.frames_per_second, report.mean_process_time*1000,
+           report.max_process_time*1000, report.late_frames))
+
+
+if __name__ == '__main__':
+  main()
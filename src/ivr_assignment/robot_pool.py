@@ -0,0 +1,105 @@
+import os
+import time
+import threading
+import traceback
+from collections import deque
+import numpy as np
+
+# one vision process serving several robots. every robot has its own pipeline, since the tracking and
+# calibration state belongs to one camera pair, and all of them share a pool of worker threads; opencv
+# releases the GIL in the heavy calls, so the workers run on as many cores as there are threads.
+# a robot keeps only its freshest pending frame pair and has at most one pair in flight, and robots with a
+# pending pair are served round robin, so a fast or busy camera pair cannot starve the others
+
+
+class robot_pool:
+
+  def __init__(self, pipelines, workers=None, on_estimate=None):
+    # pipelines: one object with process(yz_image, xz_image) per robot.
+    # on_estimate(robot, estimate, context) is called on the worker thread after every processed pair
+    self.pipelines = pipelines
+    self.on_estimate = on_estimate
+    self.workers = workers if workers else min(len(pipelines), os.cpu_count() or 1)
+    self.condition = threading.Condition()
+    count = len(pipelines)
+    self.pending = [None]*count
+    self.busy = [False]*count
+    # robots with a pending pair and none in flight, in the order they became ready
+    self.ready = deque()
+    self.processed = np.zeros(count, dtype=np.int64)
+    self.dropped = np.zeros(count, dtype=np.int64)
+    self.errors = 0
+    self.closed = False
+    self.reset_stats()
+    self.threads = [threading.Thread(target=self.work, name='robot_pool_' + str(i), daemon=True) for i in range(self.workers)]
+    for thread in self.threads:
+      thread.start()
+
+  def submit(self, robot, yz_image, xz_image, context=None):
+    # queues a frame pair of robot, replacing its previous pair if that is still waiting
+    with self.condition:
+      if self.pending[robot] is not None:
+        self.dropped[robot] += 1
+      elif not self.busy[robot]:
+        self.ready.append(robot)
+        self.condition.notify()
+      self.pending[robot] = (yz_image, xz_image, context)
+
+  def work(self):
+    while True:
+      with self.condition:
+        while len(self.ready) == 0 and not self.closed:
+          self.condition.wait()
+        if self.closed:
+          return
+        robot = self.ready.popleft()
+        yz_image, xz_image, context = self.pending[robot]
+        self.pending[robot] = None
+        self.busy[robot] = True
+
+      try:
+        estimate = self.pipelines[robot].process(yz_image, xz_image)
+        if self.on_estimate is not None:
+          self.on_estimate(robot, estimate, context)
+      except Exception:
+        self.errors += 1
+        traceback.print_exc()
+
+      with self.condition:
+        self.busy[robot] = False
+        self.processed[robot] += 1
+        # a pair that arrived meanwhile queues the robot again, behind the ones already waiting
+        if self.pending[robot] is not None:
+          self.ready.append(robot)
+        self.condition.notify_all()
+
+  def wait(self):
+    # blocks until every submitted pair is processed
+    with self.condition:
+      while len(self.ready) > 0 or any(self.busy):
+        self.condition.wait()
+
+  def reset_stats(self):
+    with self.condition:
+      self.processed[:] = 0
+      self.dropped[:] = 0
+      self.start_wall_time = time.perf_counter()
+      self.start_cpu_time = time.process_time()
+
+  def stats(self):
+    # [frames per second, cpu seconds per second (cores kept busy), frames per cpu second (throughput per core)]
+    # since the last reset, and the per robot processed and dropped pair counts
+    wall_time = time.perf_counter() - self.start_wall_time
+    cpu_time = time.process_time() - self.start_cpu_time
+    processed = self.processed.sum()
+    throughput = np.array([processed/wall_time if wall_time > 0 else 0.0,
+                           cpu_time/wall_time if wall_time > 0 else 0.0,
+                           processed/cpu_time if cpu_time > 0 else 0.0])
+    return throughput, np.stack([self.processed, self.dropped], axis=1)
+
+  def close(self):
+    with self.condition:
+      self.closed = True
+      self.condition.notify_all()
+    for thread in self.threads:
+      thread.join()
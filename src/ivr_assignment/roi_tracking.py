@@ -0,0 +1,158 @@
+import numpy as np
+import cv2
+from ivr_assignment.normalization import rgb_normalizer
+from ivr_assignment.colour_classifier import colour_classifier
+from ivr_assignment.detection import RECTANGLE_FILL_RATIO
+
+# region of interest tracking: colours are searched for in a window around their last centroid and
+# only fall back to a full frame search when they are lost or run into the window edge.
+# the tracker takes the raw bgr frame and normalises only what it classifies, the windows or,
+# on a fallback, the full frame. normalisation is per pixel, so a window gives the same values
+# as the same part of a normalised full frame
+FALLBACK_POLICIES = ('immediate', 'deferred')
+
+
+class roi_tracker:
+
+  def __init__(self, classifier=None, window_size=120, fallback='immediate', full_search_interval=0, normalizer=None):
+    if fallback not in FALLBACK_POLICIES:
+      raise ValueError("unknown roi fallback policy: " + str(fallback))
+    # full frame normaliser and classifier (shared with the caller) and separate ones for the small
+    # windows, so the two do not keep reallocating each other's buffers
+    self.normalizer = normalizer if normalizer is not None else rgb_normalizer()
+    self.classifier = classifier if classifier is not None else colour_classifier()
+    self.window_normalizer = rgb_normalizer()
+    self.window_classifier = colour_classifier(dilation=self.classifier.dilation)
+    self.window_size = window_size
+    self.fallback = fallback
+    self.full_search_interval = full_search_interval # force a full search every n frames, 0 = never
+    self.edge_margin = self.classifier.dilation + 1
+    self.last_centroids = {}
+    self.frames = 0
+    self.classified_frame = -1
+    self.normalized_frame = None
+    self.roi_attempts = 0
+    self.roi_hits = 0
+
+  def hit_rate(self):
+    if self.roi_attempts == 0:
+      return 0.0
+    return self.roi_hits/self.roi_attempts
+
+  def get_window(self, image, centroid):
+    height, width = image.shape[:2]
+    half = self.window_size//2
+    x0 = max(int(centroid[0]) - half, 0)
+    y0 = max(int(centroid[1]) - half, 0)
+    x1 = min(int(centroid[0]) + half, width)
+    y1 = min(int(centroid[1]) + half, height)
+    return x0, y0, x1, y1
+
+  def cut_by_window(self, rect, window, image_shape):
+    # whether the (x, y, w, h) box of a blob in the window reaches a window edge that is not the image border
+    x0, y0, x1, y1 = window
+    x, y, w, h = rect
+    m = self.edge_margin
+    return ((x < m and x0 > 0) or (y < m and y0 > 0) or
+            (x + w > x1 - x0 - m and x1 < image_shape[1]) or (y + h > y1 - y0 - m and y1 < image_shape[0]))
+
+  def touches_window_edge(self, mask, window, image_shape):
+    # a blob cut by the window (rather than by the image border) has to be searched for again in full
+    return self.cut_by_window(cv2.boundingRect(mask), window, image_shape)
+
+  def drop_cut_boxes(self, mask, window, image_shape):
+    # the target window often cuts into the orange box next to the sphere. a cut box still fills its
+    # bounding box and cannot be the sphere, so it is removed from the mask; any other cut blob could be
+    # part of the sphere and returns None for a full search
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    for label in range(1, count):
+      x, y, w, h, area = stats[label]
+      if self.cut_by_window((x, y, w, h), window, image_shape):
+        if area <= RECTANGLE_FILL_RATIO*w*h:
+          return None
+        mask[labels == label] = 0
+    return mask
+
+  def classify_window(self, image, window):
+    # normalised window of the raw frame, classified by the window classifier
+    x0, y0, x1, y1 = window
+    window_image = self.window_normalizer.normalize(image[y0:y1,x0:x1])
+    self.window_classifier.classify(window_image)
+    return window_image
+
+  def search_window(self, image, name):
+    window = self.get_window(image, self.last_centroids[name])
+    x0, y0, x1, y1 = window
+    self.classify_window(image, window)
+    centroid = self.window_classifier.centroid(name)
+    if np.isnan(centroid[0]) or self.touches_window_edge(self.window_classifier.mask(name), window, image.shape):
+      return None
+    return centroid + np.array([x0, y0])
+
+  def tracking(self, name):
+    if self.last_centroids.get(name) is None:
+      return False
+    return self.full_search_interval <= 0 or self.frames % self.full_search_interval != 0
+
+  def classify_full_frame(self, image):
+    # at most one full frame normalisation and classification per frame, shared by the joints and the target.
+    # returns the normalised frame
+    if self.classified_frame != self.frames:
+      self.normalized_frame = self.normalizer.normalize(image)
+      self.classifier.classify(self.normalized_frame)
+      self.classified_frame = self.frames
+    return self.normalized_frame
+
+  def locate(self, image, names):
+    # returns {name: centroid} of the raw bgr image with the get_joint_center convention for missing colours,
+    # called once per frame before locate_target
+    self.frames += 1
+    centroids = {}
+    missing = []
+    for name in names:
+      if self.tracking(name):
+        self.roi_attempts += 1
+        centroid = self.search_window(image, name)
+        if centroid is not None:
+          self.roi_hits += 1
+          centroids[name] = centroid
+          self.last_centroids[name] = centroid
+          continue
+        if self.fallback == 'deferred':
+          # keep the last position for this frame, the full search happens on the next one
+          centroids[name] = self.last_centroids[name]
+          self.last_centroids[name] = None
+          continue
+      missing.append(name)
+
+    if len(missing) > 0:
+      # one full frame pass finds every colour that could not be tracked
+      self.classify_full_frame(image)
+      for name in missing:
+        centroid = self.classifier.centroid(name)
+        centroids[name] = centroid
+        self.last_centroids[name] = None if np.isnan(centroid[0]) else centroid
+    return centroids
+
+  def locate_target(self, image, detect, name='orange'):
+    # detect(normalised image, mask) -> image coordinate or None, e.g. detection.get_target_image_coord
+    if self.tracking(name):
+      self.roi_attempts += 1
+      window = self.get_window(image, self.last_centroids[name])
+      x0, y0, x1, y1 = window
+      window_image = self.classify_window(image, window)
+      mask = self.drop_cut_boxes(self.window_classifier.mask(name), window, image.shape)
+      coord = None if mask is None else detect(window_image, mask)
+      if coord is not None:
+        self.roi_hits += 1
+        coord = np.array(coord) + np.array([x0, y0])
+        self.last_centroids[name] = coord
+        return coord
+      if self.fallback == 'deferred':
+        self.last_centroids[name] = None
+        return None
+
+    normalized_image = self.classify_full_frame(image)
+    coord = detect(normalized_image, self.classifier.mask(name))
+    self.last_centroids[name] = None if coord is None else np.array(coord)
+    return coord
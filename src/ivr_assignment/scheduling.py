@@ -0,0 +1,72 @@
+import time
+import threading
+import numpy as np
+from ivr_assignment.profiling import rolling_histogram
+
+# fixed rate scheduling of a control loop that idles while there is no new input.
+# clock and sleep can be swapped for the ROS ones so the schedule follows simulated time
+
+
+class rate_scheduler:
+
+  def __init__(self, rate, wait_for_data=True, clock=time.monotonic, sleep=time.sleep, idle_timeout=0.5, window=1000, max_periods=2):
+    self.period = 1.0/rate
+    # the returned time step never exceeds this many periods, however late a tick is
+    self.max_dt = max_periods*self.period
+    self.wait_for_data = wait_for_data
+    self.clock = clock
+    self.sleep = sleep
+    self.idle_timeout = idle_timeout
+    self.data_event = threading.Event()
+    self.next_deadline = None
+    self.last_deadline = None
+    self.ticks = 0
+    # ticks skipped because a step ran past the following deadline
+    self.deadline_misses = 0
+    # how late each tick started, in seconds
+    self.jitter = rolling_histogram(window)
+
+  def notify(self):
+    # new input arrived, e.g. from a subscriber callback
+    self.data_event.set()
+
+  def wait(self):
+    # blocks until the next tick and returns the scheduled time since the previous one, at most max_dt, or
+    # None after idle_timeout seconds without new input, so the caller can check for shutdown
+    if self.wait_for_data and not self.data_event.is_set():
+      if not self.data_event.wait(self.idle_timeout):
+        # the loop is idle, the schedule restarts with the next input
+        self.restart()
+        return None
+      # input arriving after the deadline means the loop was idle, which is neither a
+      # deadline miss nor a late tick, so the schedule restarts now
+      if self.next_deadline is not None and self.clock() > self.next_deadline:
+        self.restart()
+    self.data_event.clear()
+
+    now = self.clock()
+    if self.next_deadline is None:
+      self.next_deadline = now
+    elif now >= self.next_deadline + self.period:
+      missed = int((now - self.next_deadline)//self.period)
+      self.deadline_misses += missed
+      self.next_deadline += missed*self.period
+    delay = self.next_deadline - now
+    if delay > 0:
+      self.sleep(delay)
+    self.jitter.add(max(self.clock() - self.next_deadline, 0.0))
+
+    dt = self.period if self.last_deadline is None else min(self.next_deadline - self.last_deadline, self.max_dt)
+    self.last_deadline = self.next_deadline
+    self.next_deadline += self.period
+    self.ticks += 1
+    return dt
+
+  def restart(self):
+    # the first tick after a restart steps by one period rather than by the time spent idle
+    self.next_deadline = None
+    self.last_deadline = None
+
+  def stats(self):
+    # [ticks, deadline misses, p50, p95, p99, max tick lateness in seconds]
+    return np.append([self.ticks, self.deadline_misses], self.jitter.percentiles())
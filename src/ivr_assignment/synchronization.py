@@ -0,0 +1,87 @@
+import threading
+from collections import deque
+
+# approximate time pairing of two message streams with a freshest pair policy.
+# a message is paired with the newest message of the other stream whose stamp is within slop,
+# everything older than the pair is dropped so a slow consumer always gets the latest frames
+
+SYNC_MODES = ('exact', 'approximate')
+
+
+class pair_synchronizer:
+
+  def __init__(self, slop=0.01, queue_size=5):
+    if queue_size < 1:
+      raise ValueError("queue_size must be at least 1")
+    self.slop = slop
+    self.queue_size = queue_size
+    # (stamp, message) in arrival order for each stream
+    self.queues = [deque(), deque()]
+    # stamp of the last paired message of each stream
+    self.last_stamps = [float('-inf'), float('-inf')]
+    # stamp of the newest pair handed out, used to skip pairs that were superseded before processing
+    self.latest_pair_stamp = float('-inf')
+    # matched: pairs formed, dropped: messages discarded without a partner,
+    # stale: pairs superseded by a newer pair before they were processed
+    self.matched = 0
+    self.dropped = 0
+    self.stale = 0
+    self.lock = threading.Lock()
+
+  def add(self, index, stamp, message):
+    # add a message of stream 0 or 1, returns the paired (stream 0 message, stream 1 message, stamp) or None
+    with self.lock:
+      # behind an already paired message of the same stream
+      if stamp <= self.last_stamps[index]:
+        self.dropped += 1
+        return None
+
+      queue = self.queues[index]
+      queue.append((stamp, message))
+      if len(queue) > self.queue_size:
+        queue.popleft()
+        self.dropped += 1
+
+      # newest message of the other stream within slop
+      other = self.queues[1-index]
+      match = None
+      for j in range(len(other)-1, -1, -1):
+        if abs(other[j][0] - stamp) <= self.slop:
+          match = j
+          break
+      if match is None:
+        return None
+
+      # older messages of both streams can no longer form a fresher pair
+      other_stamp, other_message = other[match]
+      self.dropped += len(queue) - 1 + match
+      queue.clear()
+      for _ in range(match + 1):
+        other.popleft()
+
+      self.last_stamps[index] = stamp
+      self.last_stamps[1-index] = other_stamp
+      self.matched += 1
+      pair_stamp = max(stamp, other_stamp)
+      self.latest_pair_stamp = max(self.latest_pair_stamp, pair_stamp)
+      if index == 0:
+        return message, other_message, pair_stamp
+      return other_message, message, pair_stamp
+
+  def claim(self, pair_stamp):
+    # called right before a pair is processed, false (and counted as stale) if a newer pair exists
+    with self.lock:
+      if pair_stamp < self.latest_pair_stamp:
+        self.stale += 1
+        return False
+      return True
+
+  def counts(self):
+    return [self.matched, self.dropped, self.stale]
+
+  def drop_rate(self):
+    # fraction of received messages that never reached the pipeline
+    received = 2*self.matched + self.dropped
+    if received == 0:
+      return 0.0
+    return (self.dropped + 2*self.stale)/received
@@ -0,0 +1,94 @@
+import numpy as np
+
+# target paths precomputed over one period into lookup tables with one vectorised call, and linearly
+# interpolated at runtime. a path is configured as a dict, e.g. from config/target_trajectories.yaml:
+#   name: target                     # the orange sphere
+#   shape: sinusoid                  # centre + amplitude*sin(2 pi harmonics t/period + phase) per axis
+#   period: 30                       # seconds
+#   centre: [0.5, 0, 7]
+#   amplitude: [2.5, 2.5, 1]
+#   phase: [1.5707963267948966, 0, 0]
+#   harmonics: [1, 1, 1]             # optional, lissajous figures for other values
+#   command_topics: [x, y, z]        # position controller command topics of target_move.py
+# or a closed polyline visited at constant speed:
+#   shape: waypoints
+#   waypoints: [[0, 0, 7], [2, 0, 7], [2, 2, 7]]
+
+TRAJECTORY_SHAPES = ('sinusoid', 'waypoints')
+DEFAULT_SAMPLES = 1024
+
+# the two paths target_move.py has always followed
+DEFAULT_TARGETS = [
+  {'name': 'target', 'shape': 'sinusoid', 'period': 30.0,
+   'centre': [0.5, 0.0, 7.0], 'amplitude': [2.5, 2.5, 1.0], 'phase': [np.pi/2, 0.0, 0.0],
+   'command_topics': ["/target/x_position_controller/command",
+                      "/target/y_position_controller/command",
+                      "/target/z_position_controller/command"]},
+  {'name': 'target2', 'shape': 'sinusoid', 'period': 30.0,
+   'centre': [2.0, 2.5, 7.5], 'amplitude': [2.0, 1.5, 0.0], 'phase': [np.pi/2, 0.0, 0.0],
+   'command_topics': ["/target2/x2_position_controller/command",
+                      "/target2/y2_position_controller/command",
+                      "/target2/z2_position_controller/command"]},
+]
+
+
+def sample_sinusoid(t, period, centre, amplitude, phase=(0, 0, 0), harmonics=(1, 1, 1)):
+  # (N,) times -> (N,3) positions
+  t = np.asarray(t, dtype=np.float64)[:,np.newaxis]
+  angle = (2*np.pi/period)*t*np.asarray(harmonics, dtype=np.float64) + np.asarray(phase, dtype=np.float64)
+  return np.asarray(centre, dtype=np.float64) + np.asarray(amplitude, dtype=np.float64)*np.sin(angle)
+
+
+def sample_waypoints(t, period, waypoints):
+  # (N,) times -> (N,3) positions on the closed polyline through waypoints, every segment takes the same time
+  waypoints = np.asarray(waypoints, dtype=np.float64)
+  closed = np.concatenate([waypoints, waypoints[:1]])
+  knots = np.linspace(0, period, len(closed))
+  t = np.mod(np.asarray(t, dtype=np.float64), period)
+  return np.stack([np.interp(t, knots, closed[:,axis]) for axis in range(3)], axis=1)
+
+
+def sample_trajectory(config, t):
+  # (N,) times -> (N,3) positions of one configured path
+  shape = config.get('shape', 'sinusoid')
+  if shape == 'sinusoid':
+    return sample_sinusoid(t, config['period'], config['centre'], config['amplitude'],
+                           config.get('phase', (0, 0, 0)), config.get('harmonics', (1, 1, 1)))
+  if shape == 'waypoints':
+    return sample_waypoints(t, config['period'], config['waypoints'])
+  raise ValueError("unknown trajectory shape: " + str(shape))
+
+
+class trajectory_tables:
+
+  def __init__(self, targets=DEFAULT_TARGETS, samples=DEFAULT_SAMPLES):
+    self.names = [target['name'] for target in targets]
+    self.samples = samples
+    # (K,) periods and (K,N,3) positions of every path at t = 0, period/N, 2 period/N, ...
+    self.periods = np.array([float(target['period']) for target in targets])
+    self.positions = np.stack([sample_trajectory(target, np.arange(samples)*(target['period']/samples)) for target in targets])
+    # velocities by central differences over the wrapped tables, for feed forward
+    steps = (self.periods/samples)[:,np.newaxis,np.newaxis]
+    self.velocities = (np.roll(self.positions, -1, axis=1) - np.roll(self.positions, 1, axis=1))/(2*steps)
+    # the lookups read a copy of the first sample after the last one instead of wrapping indices
+    self.position_table = np.concatenate([self.positions, self.positions[:,:1]], axis=1)
+    self.velocity_table = np.concatenate([self.velocities, self.velocities[:,:1]], axis=1)
+    self.samples_per_second = samples/self.periods
+    self.rows = np.arange(len(targets))
+
+  def index(self, name):
+    return self.names.index(name)
+
+  def lookup(self, table, t):
+    # (K,3) values of every path at time t, linearly interpolated between the two nearest samples
+    position = np.mod(t*self.samples_per_second, self.samples)
+    # rounding can put a time just below a period boundary on the boundary itself
+    below = np.minimum(position.astype(np.int64), self.samples - 1)
+    fraction = (position - below)[:,np.newaxis]
+    return table[self.rows, below] + fraction*(table[self.rows, below + 1] - table[self.rows, below])
+
+  def positions_at(self, t):
+    return self.lookup(self.position_table, t)
+
+  def velocities_at(self, t):
+    return self.lookup(self.velocity_table, t)
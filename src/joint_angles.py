@@ -2,6 +2,7 @@
 
 import roslib
 import sys
+import threading
 import rospy
 import cv2
 import numpy as np
@@ -9,371 +10,315 @@ import message_filters
 from std_msgs.msg import String
 from sensor_msgs.msg import Image
 from std_msgs.msg import Float64MultiArray, Float64
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
 from cv_bridge import CvBridge, CvBridgeError
+from ivr_assignment.pipeline import vision_pipeline
+from ivr_assignment.image_messages import bgr8_image
+from ivr_assignment.profiling import latency_profiler
+from ivr_assignment.calibration import base_calibration
+from ivr_assignment.synchronization import pair_synchronizer, SYNC_MODES
+from ivr_assignment.robot_pool import robot_pool
+
+# [yz, xz] image topics: 'relay' reads the frames republished by image1.py and image2.py,
+# 'raw' reads the gazebo cameras directly and skips one serialisation and two conversions per frame
+CAMERA_TOPICS = {
+  'relay': ["/image_topic1", "/image_topic2"],
+  'raw': ["/camera1/robot/image_raw", "/camera2/robot/image_raw"],
+}
+
+# 'separate' publishes the joint angles, end effector and target location as unstamped arrays,
+# 'combined' one stamped VisionEstimate per frame pair on /vision_estimate
+OUTPUT_MODES = ('separate', 'combined', 'both')
+
+
+class robot_vision:
+
+  # the pipeline and the input and output topics of one camera pair. every topic is prefixed with the
+  # robot's namespace, the default '' namespace keeps the topics of a single robot deployment
+  def __init__(self, node, index, namespace, pipeline):
+    self.index = index
+    self.namespace = namespace
+    self.pipeline = pipeline
+    # every robot records its stages in its own profiler, so the diagnostics keep the robots apart
+    self.profiler = pipeline.profiler
+    self.callback_lock = threading.Lock()
+
+    if node.separate_output:
+      self.joint_angles_publisher = rospy.Publisher(namespace + "/joint_angles" if namespace else "joint_angles", Float64MultiArray, queue_size=1)
+      #self.base_joint_location_pub = rospy.Publisher("/base_joint_location", Float64MultiArray, queue_size=1)
+      self.end_effector_location_pub = rospy.Publisher(namespace + "/end_effector_location", Float64MultiArray, queue_size=1)
+      self.target_location_pub = rospy.Publisher(namespace + "/target_location", Float64MultiArray, queue_size=1)
+    if node.combined_output:
+      self.estimate_pub = rospy.Publisher(namespace + "/vision_estimate", node.estimate_message, queue_size=1)
+    if node.roi_tracking:
+      self.roi_hit_rate_pub = rospy.Publisher(namespace + "/roi_hit_rate", Float64MultiArray, queue_size=1)
+    if pipeline.kalman_filter:
+      # flattened (2,5,4) [yz, xz] x [yellow, blue, green, red, orange] x [x, y, vx, vy] filter states
+      # and their (2,5,4,4) covariances, in pixels and pixels per frame
+      self.filter_state_pub = rospy.Publisher(namespace + "/kalman_state", Float64MultiArray, queue_size=1)
+      self.filter_covariance_pub = rospy.Publisher(namespace + "/kalman_covariance", Float64MultiArray, queue_size=1)
+    # per view processing times in ms: [yz, xz]
+    self.view_timing_pub = rospy.Publisher(namespace + "/view_processing_time", Float64MultiArray, queue_size=1)
+    if node.republish:
+      self.image_pub1 = rospy.Publisher(namespace + "/image_topic1", Image, queue_size=1)
+      self.image_pub2 = rospy.Publisher(namespace + "/image_topic2", Image, queue_size=1)
+
+    self.synchronizer = None
+    if node.sync_mode == 'approximate':
+      self.synchronizer = pair_synchronizer(slop=rospy.get_param('~sync_slop', 0.01),
+                                            queue_size=rospy.get_param('~sync_queue_size', 5))
+      # matched, dropped and stale pair counts
+      self.sync_stats_pub = rospy.Publisher(namespace + "/sync_stats", Float64MultiArray, queue_size=1)
+
+  def subscribe(self, node, yz_topic, xz_topic):
+    if self.synchronizer is not None:
+      self.img1_subscriber = rospy.Subscriber(self.namespace + yz_topic, Image, node.image_callback, (self, 0), queue_size=1, buff_size=2**24)
+      self.img2_subscriber = rospy.Subscriber(self.namespace + xz_topic, Image, node.image_callback, (self, 1), queue_size=1, buff_size=2**24)
+    else:
+      self.img1_subscriber = message_filters.Subscriber(self.namespace + yz_topic, Image)
+      self.img2_subscriber = message_filters.Subscriber(self.namespace + xz_topic, Image)
+
+      self.time_sync = message_filters.TimeSynchronizer([self.img1_subscriber, self.img2_subscriber], 1)
+      self.time_sync.registerCallback(node.callback, self)
+
 
 class joint_angles:
 
   def __init__(self):
     rospy.init_node('joint_angles_node', anonymous = True)
-    self.img1_subscriber = message_filters.Subscriber("/image_topic1", Image)
-    self.img2_subscriber = message_filters.Subscriber("/image_topic2", Image)
-        
-    time_sync = message_filters.TimeSynchronizer([self.img1_subscriber, self.img2_subscriber], 1)
-    time_sync.registerCallback(self.callback)
-    
     self.bridge = CvBridge()
-    
-    self.joint_angles_publisher = rospy.Publisher("joint_angles", Float64MultiArray, queue_size=1)
-    #self.base_joint_location_pub = rospy.Publisher("/base_joint_location", Float64MultiArray, queue_size=1)
-    self.end_effector_location_pub = rospy.Publisher("/end_effector_location", Float64MultiArray, queue_size=1)
-    self.target_location_pub = rospy.Publisher("/target_location", Float64MultiArray, queue_size=1)
-    # initialise variables to keep track of target position on image
-    self.target_xz_centroid = np.array([0,0])
-    self.target_yz_centroid = np.array([0,0])
-    
-
-  def callback(self, yz_image_msg, xz_image_msg):
+
+    self.output_mode = rospy.get_param('~output_mode', 'separate')
+    if self.output_mode not in OUTPUT_MODES:
+      raise ValueError("unknown output_mode: " + str(self.output_mode))
+    self.separate_output = self.output_mode in ('separate', 'both')
+    self.combined_output = self.output_mode in ('combined', 'both')
+    if self.combined_output:
+      # generated by catkin from msg/VisionEstimate.msg, only needed by the combined output
+      from ivr_assignment.msg import VisionEstimate
+      self.estimate_message = VisionEstimate
+
+    # the pool stats and the diagnostics are published from whichever pool worker passes the period check first
+    self.report_lock = threading.Lock()
+
+    # per robot and stage latency histograms, published on /diagnostics every ~profiling_period seconds
+    self.profiling = rospy.get_param('~profiling', False)
+    if self.profiling:
+      self.profiling_period = rospy.get_param('~profiling_period', 1.0)
+      self.last_diagnostics_time = rospy.get_time()
+      self.diagnostics_pub = rospy.Publisher("/diagnostics", DiagnosticArray, queue_size=1)
+
+    self.roi_tracking = rospy.get_param('~roi_tracking', False)
+
+    self.camera_source = rospy.get_param('~camera_source', 'relay')
+    if self.camera_source not in CAMERA_TOPICS:
+      raise ValueError("unknown camera_source: " + str(self.camera_source))
+    yz_topic, xz_topic = CAMERA_TOPICS[self.camera_source]
+    # with raw cameras, optionally relay the frames in this process for other consumers of /image_topic1 and /image_topic2
+    self.republish = self.camera_source == 'raw' and rospy.get_param('~republish', False)
+
+    # 'exact' pairs frames with identical stamps, 'approximate' pairs the freshest frames within ~sync_slop seconds
+    self.sync_mode = rospy.get_param('~sync_mode', 'exact')
+    if self.sync_mode not in SYNC_MODES:
+      raise ValueError("unknown sync_mode: " + str(self.sync_mode))
+
+    # one camera pair per namespace in ~robots, e.g. ['/robot1', '/robot2'], each with its own pipeline and topics.
+    # the default single robot reads and publishes the unprefixed topics
+    namespaces = rospy.get_param('~robots', [''])
+    self.robots = [robot_vision(self, index, namespace.rstrip('/'), self.create_pipeline(namespace))
+                   for index, namespace in enumerate(namespaces)]
+
+    # several robots share ~workers threads (default one per robot, up to the core count), served round robin.
+    # a single robot is processed on the subscriber thread unless ~workers is set
+    self.pool = None
+    workers = rospy.get_param('~workers', 0)
+    if len(self.robots) > 1 or workers > 0:
+      self.pool = robot_pool([robot.pipeline for robot in self.robots], workers, self.pool_estimate)
+      # [frames per second, cores kept busy, frames per cpu second] followed by [processed, dropped] per robot
+      self.pool_stats_pub = rospy.Publisher("/vision_pool_stats", Float64MultiArray, queue_size=1)
+      self.pool_stats_period = rospy.get_param('~pool_stats_period', 1.0)
+      self.last_pool_stats_time = rospy.get_time()
+      rospy.on_shutdown(self.pool.close)
+
+    # subscribe last, so callbacks only arrive once the node is fully set up
+    for robot in self.robots:
+      robot.subscribe(self, yz_topic, xz_topic)
+
+  def create_pipeline(self, namespace):
+    # base joint positions and pixel scale estimated over the first frames, kept in ~calibration_file across restarts.
+    # with several robots, {robot} in the file name is replaced by the robot's namespace
+    calibration = None
+    if rospy.get_param('~calibration', False):
+      calibration_file = rospy.get_param('~calibration_file', '') or None
+      if calibration_file is not None:
+        calibration_file = calibration_file.replace('{robot}', namespace.strip('/').replace('/', '_'))
+      calibration = base_calibration(frames=rospy.get_param('~calibration_frames', 30),
+                                     drift_check_interval=rospy.get_param('~drift_check_interval', 30),
+                                     drift_tolerance=rospy.get_param('~drift_tolerance', 3.0),
+                                     path=calibration_file)
+      if calibration_file is not None and calibration.load(calibration_file):
+        rospy.loginfo("loaded base joint calibration from %s", calibration_file)
+
+    # all image processing happens in the ROS independent vision pipeline
+    return vision_pipeline(profiler=latency_profiler(enabled=self.profiling),
+                           roi_tracking=self.roi_tracking,
+                           window_size=rospy.get_param('~roi_window_size', 120),
+                           fallback=rospy.get_param('~roi_fallback', 'immediate'), # 'immediate' or 'deferred' full frame search
+                           full_search_interval=rospy.get_param('~roi_full_search_interval', 0),
+                           parallel_views=rospy.get_param('~parallel_views', False),
+                           kalman_filter=rospy.get_param('~kalman_filter', False),
+                           detection_interval=rospy.get_param('~detection_interval', 1), # confidently tracked spheres are detected every n frames
+                           confident_std=rospy.get_param('~confident_std', 2.0),
+                           max_coast=rospy.get_param('~max_coast', 5),
+                           pyramid_factor=rospy.get_param('~pyramid_factor', 1), # coarse to fine detection on frames downsampled 2x, 4x, ...
+                           calibration=calibration)
+
+  def image_callback(self, image_msg, args):
+    # approximate mode: each camera topic arrives on its own thread, the synchronizer pairs them
+    robot, index = args
+    pair = robot.synchronizer.add(index, image_msg.header.stamp.to_sec(), image_msg)
+    if pair is None:
+      return
+    yz_image_msg, xz_image_msg, pair_stamp = pair
+    with robot.callback_lock:
+      # a newer pair may have been matched while waiting for the previous one to finish
+      if robot.synchronizer.claim(pair_stamp):
+        self.callback(yz_image_msg, xz_image_msg, robot)
+    sync_stats_payload = Float64MultiArray()
+    sync_stats_payload.data = robot.synchronizer.counts()
+    robot.sync_stats_pub.publish(sync_stats_payload)
+
+  def imgmsg_to_bgr8(self, msg):
+    return self.bridge.imgmsg_to_cv2(msg, "bgr8")
+
+  def callback(self, yz_image_msg, xz_image_msg, robot):
     try:
-      self.yz_image = self.bridge.imgmsg_to_cv2(yz_image_msg, "bgr8")
-      self.xz_image = self.bridge.imgmsg_to_cv2(xz_image_msg, "bgr8")
-      self.image_height,self.image_width = self.yz_image.shape[:2] # <- assume yz and xz images are the same
-      #print("height, width: " + str(self.yz_image.shape))
-      yz_image_normalized = self.normalizeRGB(self.yz_image)
-      xz_image_normalized = self.normalizeRGB(self.xz_image)
-      
-      #cv2.imshow('yz_view', yz_image_normalized)
-      #cv2.imshow('xz_view', xz_image_normalized)
-      #cv2.waitKey(1)
-      
-      red_centroid_yz = self.get_joint_center(yz_image_normalized, [(0, 0, 100), (7, 7, 255)], 'red_yz', erosion=0, dilation=2)
-      green_centroid_yz = self.get_joint_center(yz_image_normalized, [(0, 100, 0), (7, 255, 7)], 'green_yz', erosion=0, dilation=2)
-      blue_centroid_yz = self.get_joint_center(yz_image_normalized, [(100, 0, 0), (255, 7, 7)], 'blue_yz', erosion=0, dilation=2)
-      yellow_centroid_yz = self.get_joint_center(yz_image_normalized, [(0, 100, 100), (7, 255, 255)], 'yellow_yz', erosion=0, dilation=2)
-      
-      red_centroid_xz = self.get_joint_center(xz_image_normalized, [(0, 0, 100), (7, 7, 255)], 'red_xz', erosion=0, dilation=2)
-      green_centroid_xz = self.get_joint_center(xz_image_normalized, [(0, 100, 0), (7, 255, 7)], 'green_xz', erosion=0, dilation=2)
-      blue_centroid_xz = self.get_joint_center(xz_image_normalized, [(100, 0, 0), (255, 7, 7)], 'blue_xz', erosion=0, dilation=2)
-      yellow_centroid_xz = self.get_joint_center(xz_image_normalized, [(0, 100, 100), (7, 255, 255)], 'yellow_xz', erosion=0, dilation=2)
-      
-      yz_centroids = np.array([yellow_centroid_yz, blue_centroid_yz, green_centroid_yz, red_centroid_yz])
-      xz_centroids = np.array([yellow_centroid_xz, blue_centroid_xz, green_centroid_xz, red_centroid_xz])
-      
-      centered_yz_centroids = self.center_image_coordinates_around_first_joint(yz_centroids[0],yz_centroids[1:])
-      centered_xz_centroids = self.center_image_coordinates_around_first_joint(xz_centroids[0],xz_centroids[1:])
-      
-      coordinates_3d = self.merge_plane_coordinates(centered_yz_centroids, centered_xz_centroids)
-
-      
-
-      self.compute_joint_angles(coordinates_3d)
-      
-      joint_angles = self.compute_joint_angles(coordinates_3d)
-      # publish joint angles
-      joint_angles_payload = Float64MultiArray()
-      joint_angles_payload.data = joint_angles
-      self.joint_angles_publisher.publish(joint_angles_payload)
-      
-      # find distance between yellow and blue spheres, and we know the real metre distance is 2.5m
-      yellow_to_blue_dist = np.linalg.norm(coordinates_3d[1])
-      metres_per_pixel_ratio = 2.5/yellow_to_blue_dist
-
-      #cv2.circle(self.xz_image,(int(red_centroid_xz[0]),int(red_centroid_xz[1])),5,(255,0,0),2)
-      #cv2.circle(self.yz_image,(int(red_centroid_yz[0]),int(red_centroid_yz[1])),5,(255,0,0),2)
-
-      # get and publish end effector position (red sphere position)
-      red_sphere_position = coordinates_3d[3]*metres_per_pixel_ratio
-      end_effector_payload = Float64MultiArray()
-      end_effector_payload.data = red_sphere_position
-      self.end_effector_location_pub.publish(end_effector_payload)
-
-      # get orange sphere image coords
-      self.update_target_location(yz_image_normalized,xz_image_normalized)
-      #cv2.circle(self.xz_image,(self.target_xz_centroid[0],self.target_xz_centroid[1]),5,(0,0,255),2) # display dot on our 'target location'
-      #cv2.circle(self.yz_image,(self.target_yz_centroid[0],self.target_yz_centroid[1]),5,(0,0,255),2)
-      centred_target_yz_centroid = self.center_image_coordinates_around_first_joint(yellow_centroid_yz,np.array([self.target_yz_centroid]))[1]
-      centred_target_xz_centroid = self.center_image_coordinates_around_first_joint(yellow_centroid_xz,np.array([self.target_xz_centroid]))[1]
-      target_location = self.merge_plane_coordinates([centred_target_yz_centroid],[centred_target_xz_centroid])[0]
-      target_location = target_location*metres_per_pixel_ratio
-      #print(target_location)
-      
-      # publish target location:
-      target_location_payload = Float64MultiArray()
-      target_location_payload.data = target_location
-      self.target_location_pub.publish(target_location_payload)
+      with robot.profiler.stage('conversion'):
+        # bgr8 frames are read only views of the message data, other encodings are converted
+        yz_image = bgr8_image(yz_image_msg, self.imgmsg_to_bgr8)
+        xz_image = bgr8_image(xz_image_msg, self.imgmsg_to_bgr8)
+
+      if self.pool is not None:
+        # processed and published on a pool thread, see pool_estimate
+        self.pool.submit(robot.index, yz_image, xz_image, (yz_image_msg, xz_image_msg, yz_image, xz_image))
+        return
+
+      estimate = robot.pipeline.process(yz_image, xz_image)
+      self.handle_estimate(robot, estimate, yz_image_msg, xz_image_msg, yz_image, xz_image)
 
       # uncomment if one needs to display images
-      #im1=cv2.imshow('window1', self.xz_image)
-      #im1=cv2.imshow('window2', self.yz_image)
+      #im1=cv2.imshow('window1', xz_image)
+      #im1=cv2.imshow('window2', yz_image)
       #cv2.waitKey(1)
-      
+
     except CvBridgeError as e:
       print(e)
-   
-
-  def update_target_location(self,yz_image_normalized,xz_image_normalized):
-    # get orange shapes
-    # try get image location of sphere, if one cant - use previously found position
-    yz_image_coord = self.get_target_image_coord(yz_image_normalized)
-    if yz_image_coord is not None:
-      self.target_yz_centroid = yz_image_coord
-    xz_image_coord = self.get_target_image_coord(xz_image_normalized)
-    if xz_image_coord is not None:
-      self.target_xz_centroid = xz_image_coord
-    
-
-  def get_target_image_coord(self,image):
-    ### process image
-    orange_thresholds = [(0, 64, 70), (20, 100, 255)]
-    orange_image = self.threshold_and_dilate(image,orange_thresholds,2)
-
-    ### get all orange objects in image
-    contours,hierarchy = cv2.findContours(orange_image,cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)#cv2.findContours(orange_yz, 1, 2)
-    area_ratios = []
-    centres = []
-    for contour in contours:
-      contour = cv2.approxPolyDP(contour, 0.5, True)
-      #cv2.drawContours(self.xz_image, [contour], -1, (255, 0, 0), 1)
-      #print("contour: " + str(contour.shape))
-      M = cv2.moments(contour)
-      cx = int(M['m10'] / M['m00'])
-      cy = int(M['m01'] / M['m00'])
-      centres.append(np.array([cx,cy]))
-      (x,y,w,h) = cv2.boundingRect(contour)
-      
-      #cv2.rectangle(image, (x,y),(x+w,y+h),(0,255,0),1)
-      # get area of bounding box
-      bbox_area = w*h
-      # get ratio of bounding box area filled by orange shape
-      shape_area = np.sum(orange_image[y:y+h,x:x+w] * (1.0/255.0))
-      area_ratios.append(shape_area/bbox_area)
-
-      
-    ### handle each relevant case where we detect a different number of orange objects:
-    if len(contours) == 1:
-      return centres[0]
-    if len(contours) == 2: # check if one shape is definitely a circle or rectangle (if we know one we can infer the other)
-      # check if definitely a rectangle 
-      if contours[0].shape[0] == 4 or area_ratios[0] > 0.95:
-        return centres[1] # then other shape is sphere
-      if contours[1].shape[0] == 4 or area_ratios[1] > 0.95:
-        return centres[0]
-      # if we cant find definite rectangle, actually check for a circle
-      for i in range(2):
-        (x,y),r = cv2.minEnclosingCircle(contours[i])
-        min_circle_area = 3.14*r*r
-        circleness = cv2.contourArea(contours[i])/min_circle_area
-        if circleness > 0.9:
-          # definentely a circle
-          return centres[i]
-    
-    if len(contours) == 3: # one shape is definitely a sphere or rectangle - other contours come from split shape
-      is_rectangle = [False,False,False]
-      for i in range(3):
-        # check if defenently a rectangle
-        if contours[i].shape[0] == 4 or area_ratios[i] > 0.95:
-          is_rectangle[i] = True
-      if np.sum(np.array(is_rectangle))==1: # we have exactly 1 rectangle, other 2 come from obscured sphere
-        s_ind = [n for n in range(3) if not is_rectangle[n]] # <- other indices for shapes that are not rectangle
-        return ((centres[s_ind[0]][0] + centres[s_ind[1]][0])//2,(centres[s_ind[0]][1] + centres[s_ind[1]][1])//2) # return middle of 2 split sphere shapes
-      # otherwise actually check for single circle:
-      for i in range(3):
-        (x,y),r = cv2.minEnclosingCircle(contours[i])
-        min_circle_area = 3.14*r*r
-        circleness = cv2.contourArea(contours[i])/min_circle_area
-        if circleness > 0.9:
-          # definentely a circle
-          return centres[i]
-    return None
-    
-
-  def threshold_and_dilate(self,image,thresholds,iteration_num):
-    binary_image = cv2.inRange(image, thresholds[0], thresholds[1])
-    kernel = np.ones((2, 2), np.uint8)
-    dilated_image = cv2.dilate(binary_image, kernel, iterations=2)
-    return dilated_image
-
- 
-  def compute_joint_angles(self, joint_coordinates):
-    blue_coordinates = joint_coordinates[1]
-    green_coordinates = joint_coordinates[2]
-    
-    blue_green_vector = green_coordinates - blue_coordinates
-    joint_2_angle = -np.arctan2(blue_green_vector[1],blue_green_vector[2])
-    
-    joint_coordinates_rotated_around_x = self.rotate_around_x_axis(-joint_2_angle, joint_coordinates)
-    
-    blue_coordinates_rotated_around_x = joint_coordinates_rotated_around_x[1]
-    green_coordinates_rotated_around_x = joint_coordinates_rotated_around_x[2]
-    
-    blue_green_vector_rotated_around_x = green_coordinates_rotated_around_x - blue_coordinates_rotated_around_x
-    joint_3_angle = np.arctan2(blue_green_vector_rotated_around_x[0], blue_green_vector_rotated_around_x[2])
-    
-    joint_coordinates_rotated_around_x_and_y = self.rotate_around_y_axis(joint_3_angle, joint_coordinates_rotated_around_x)
-    
-    #print(joint_coordinates_rotated_around_x_and_y)
-    
-    green_coordinates_rotated_around_x_and_y = joint_coordinates_rotated_around_x_and_y[2]
-    red_coordinates_rotated_around_x_and_y = joint_coordinates_rotated_around_x_and_y[3]
-    
-    green_red_vector_rotated_around_x_and_y = red_coordinates_rotated_around_x_and_y - green_coordinates_rotated_around_x_and_y
-    joint_4_angle = -np.arctan2(green_red_vector_rotated_around_x_and_y[1], green_red_vector_rotated_around_x_and_y[2])
-    
-    
-    joint_angles = np.array([joint_2_angle, joint_3_angle, joint_4_angle])
-    
-    #print(joint_angles)
-    
-    return joint_angles
-  
-  
-  def rotate_around_y_axis(self, angle, coordinates):
-    new_coordinates = np.zeros((len(coordinates),3), dtype=np.int64)
-    rotation_matrix = np.array([[np.cos(angle), 0, -np.sin(angle)],[0, 1, 0],[np.sin(angle), 0, np.cos(angle)]])
-    
-    for i in range(len(coordinates)):
-      new_coordinates[i] = rotation_matrix.dot(coordinates[i])
-      
-    return new_coordinates
-  
-  def rotate_around_x_axis(self, angle, coordinates):
-    
-    new_coordinates = np.zeros((len(coordinates),3), dtype=np.int64)
-    rotation_matrix = np.array([[1, 0, 0],[0, np.cos(angle), -np.sin(angle)],[0, np.sin(angle), np.cos(angle)]])
-    
-    for i in range(len(coordinates)):
-      new_coordinates[i] = rotation_matrix.dot(coordinates[i])
-      
-    return new_coordinates
-    
-  
-  def merge_plane_coordinates(self, yz_coordinates, xz_coordinates):
-    coordinates_3d = np.zeros((len(yz_coordinates),3))
-    for i in range(len(yz_coordinates)):
-      xz = xz_coordinates[i]
-      yz = yz_coordinates[i]
-      
-      if(xz[0] == None): 
-        xz = self.infer_coordinates(i, xz_coordinates, yz_coordinates)
-      
-      elif(yz[0] == None):
-        yz = self.infer_coordinates(i, yz_coordinates, xz_coordinates)
-        
-      coordinates_3d[i] = np.array([xz[0], yz[0], yz[1]])
-    
-    return coordinates_3d
-    
-      
-  def infer_coordinates(self, i, loss_coordinates, coordinates_for_inference):
-    the_same_point_in_different_plane = coordinates_for_inference[i]
-    
-    closest_point_index_on_z_axis = None
-    
-    for j in range(len(coordinates_for_inference)):
-      if(j == i):
-        continue
-      
-      if(closest_point_index_on_z_axis == None):
-        closest_point_index_on_z_axis = j
-        continue
-      elif(abs(the_same_point_in_different_plane[1]-coordinates_for_inference[j,1]) < abs(the_same_point_in_different_plane[1]-coordinates_for_inference[closest_point_index_on_z_axis,1])):
-        closest_point_index_on_z_axis = j
-        continue
-    
-    inferred_coordinates = np.array([loss_coordinates[closest_point_index_on_z_axis, 0],coordinates_for_inference[i,1]])
-    
-    return inferred_coordinates
-        
-  
-  def center_image_coordinates_around_first_joint(self, first_joint, other_joints):
-    
-    new_coordinates = np.zeros((len(other_joints)+1,2))
-    new_coordinates[0] = np.array([0,0])
-    
-    for i in range(len(other_joints)):
-      if(other_joints[i,0] == None):
-        new_coordinates[i+1] = other_joints[i]
-        continue
-      
-      new_coordinates[i+1] = other_joints[i]-first_joint
-      new_coordinates[i+1,1] = new_coordinates[i+1,1]*(-1)
-    
-    return new_coordinates
-      
-    
-  
-  def get_joint_center(self, image, thresholds, color_name, erosion=0, dilation=0):
-    binary_image = cv2.inRange(image, thresholds[0], thresholds[1])
-    
-    kernel = np.ones((2, 2), np.uint8)
-    eroded_image = cv2.erode(binary_image, kernel, iterations=erosion)
-    dilated_image = cv2.dilate(eroded_image, kernel, iterations=dilation)
-    final_image = dilated_image
-    
-    #cv2.imshow(color_name, final_image)
-    #cv2.waitKey(1)
-    
-    #contours,hierarchy = cv2.findContours(final_image, 1, 2)
-    
-    #if(len(contours) == 0):
-      #return np.array([None,None])
-    
-    #contour = contours[0]
-    #M = cv2.moments(contour)
-    
-    M = cv2.moments(final_image)
-    
-    #compactness = (2*np.sqrt(M['m00']*np.pi))/cv2.arcLength(contour,True)
-    
-    if(M['m00'] == 0):
-      return np.array([None, None])
-    
-    cx = int(M['m10'] / M['m00'])
-    cy = int(M['m01'] / M['m00'])
-    centroid = np.array([cx, cy])
-    
-    #print(color_name, 'centroid', centroid)
-    # return final_image, centroid
-    return centroid
-  
-  def normalizeRGB(self, img):
-  
-    height, width = img.shape[:2]
-  
-    normalized_rgb = np.zeros((height,width,3),np.float64)
-    
-    img_float = img.astype(np.float64)
-    
-    b = img_float[:,:,0]
-    g = img_float[:,:,1]
-    r = img_float[:,:,2]
-    
-    rgb_sum = b + g + r
-    rgb_sum[rgb_sum == 0] = 1
-    
-    normalized_rgb[:,:,0]=(b/rgb_sum)*255.0
-    normalized_rgb[:,:,1]=(g/rgb_sum)*255.0
-    normalized_rgb[:,:,2]=(r/rgb_sum)*255.0
-    
-    #print(normalized_rgb)
-    
-    normalized_rgb = normalized_rgb.astype(np.uint8)
-    
-    #normalized_rgb=cv2.convertScaleAbs(normalized_rgb)
-    return normalized_rgb
-    
-    
-  ### DO NOT USE
-  def normalizeRGB_slow(self, img):
-    for row in img:
-      for pixel in row:
-        rgb_sum = int(pixel[0])+int(pixel[1])+int(pixel[2])
-        if(rgb_sum==0):
-          continue
-        pixel[0] = np.uint8(round((int(pixel[0])*255)/rgb_sum))
-        pixel[1] = np.uint8(round((int(pixel[1])*255)/rgb_sum))
-        pixel[2] = np.uint8(round((int(pixel[2])*255)/rgb_sum))
-        
-        
+
+  def pool_estimate(self, index, estimate, context):
+    self.handle_estimate(self.robots[index], estimate, *context)
+    self.publish_pool_stats()
+
+  def handle_estimate(self, robot, estimate, yz_image_msg, xz_image_msg, yz_image, xz_image):
+    with robot.profiler.stage('publish'):
+      self.publish_estimate(robot, estimate, yz_image_msg.header)
+
+    if self.republish:
+      with robot.profiler.stage('republish'):
+        self.republish_frame(robot.image_pub1, yz_image_msg, yz_image)
+        self.republish_frame(robot.image_pub2, xz_image_msg, xz_image)
+
+    if self.profiling:
+      # from the camera frame stamp to the estimate being published
+      robot.profiler.record('end_to_end', (rospy.Time.now() - yz_image_msg.header.stamp).to_sec())
+      self.publish_diagnostics()
+
+  def publish_estimate(self, robot, estimate, header):
+    if self.combined_output:
+      # one message per frame pair, stamped with the camera frame, NaN where nothing was estimated
+      estimate_payload = self.estimate_message()
+      estimate_payload.header = header
+      estimate_payload.joint_angles = estimate.joint_angles
+      estimate_payload.end_effector_location = estimate.end_effector_location
+      estimate_payload.target_location = estimate.target_location
+      estimate_payload.view_processing_time = estimate.view_times*1000
+      robot.estimate_pub.publish(estimate_payload)
+
+    if self.separate_output:
+      # estimates that depend on spheres missing from both views are NaN and are not published
+      # publish joint angles
+      if np.all(np.isfinite(estimate.joint_angles)):
+        joint_angles_payload = Float64MultiArray()
+        joint_angles_payload.data = estimate.joint_angles
+        robot.joint_angles_publisher.publish(joint_angles_payload)
+
+      # publish end effector position (red sphere position)
+      if np.all(np.isfinite(estimate.end_effector_location)):
+        end_effector_payload = Float64MultiArray()
+        end_effector_payload.data = estimate.end_effector_location
+        robot.end_effector_location_pub.publish(end_effector_payload)
+
+      # publish target location:
+      if np.all(np.isfinite(estimate.target_location)):
+        target_location_payload = Float64MultiArray()
+        target_location_payload.data = estimate.target_location
+        robot.target_location_pub.publish(target_location_payload)
+
+    view_timing_payload = Float64MultiArray()
+    view_timing_payload.data = estimate.view_times*1000
+    robot.view_timing_pub.publish(view_timing_payload)
+
+    if robot.pipeline.kalman_filter:
+      states, covariances = robot.pipeline.filter_states()
+      filter_state_payload = Float64MultiArray()
+      filter_state_payload.data = states.ravel()
+      robot.filter_state_pub.publish(filter_state_payload)
+      filter_covariance_payload = Float64MultiArray()
+      filter_covariance_payload.data = covariances.ravel()
+      robot.filter_covariance_pub.publish(filter_covariance_payload)
+
+    if self.roi_tracking:
+      roi_hit_rate_payload = Float64MultiArray()
+      roi_hit_rate_payload.data = robot.pipeline.roi_hit_rates()
+      robot.roi_hit_rate_pub.publish(roi_hit_rate_payload)
+
+  def republish_frame(self, publisher, image_msg, image):
+    # same output as the image1.py and image2.py relays
+    if image_msg.encoding == "bgr8":
+      publisher.publish(image_msg)
+    else:
+      relay_msg = self.bridge.cv2_to_imgmsg(image, "bgr8")
+      relay_msg.header = image_msg.header
+      publisher.publish(relay_msg)
+
+  def publish_pool_stats(self):
+    with self.report_lock:
+      now = rospy.get_time()
+      if now - self.last_pool_stats_time < self.pool_stats_period:
+        return
+      self.last_pool_stats_time = now
+      throughput, counts = self.pool.stats()
+      self.pool.reset_stats()
+      pool_stats_payload = Float64MultiArray()
+      pool_stats_payload.data = np.concatenate([throughput, counts.ravel()])
+      self.pool_stats_pub.publish(pool_stats_payload)
+
+  def publish_diagnostics(self):
+    with self.report_lock:
+      now = rospy.get_time()
+      if now - self.last_diagnostics_time < self.profiling_period:
+        return
+      self.last_diagnostics_time = now
+      diagnostics = DiagnosticArray()
+      diagnostics.header.stamp = rospy.Time.now()
+      for robot in self.robots:
+        # stages of the default unprefixed robot keep their single robot names
+        prefix = "joint_angles: " + (robot.namespace + ": " if robot.namespace else "")
+        for stage, values in robot.profiler.report_values():
+          status = DiagnosticStatus(level=DiagnosticStatus.OK, name=prefix + stage, hardware_id="vision")
+          status.values = [KeyValue(key, value) for key, value in values]
+          diagnostics.status.append(status)
+      self.diagnostics_pub.publish(diagnostics)
+
 
 
 if __name__ == '__main__':
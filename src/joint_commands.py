@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+
+import rospy
+import numpy as np
+from std_msgs.msg import Float64, Float64MultiArray
+
+
+# sinusoidal joint 2-4 commands, previously sent from the camera 1 relay on every frame
+def move():
+  rospy.init_node('joint_commands', anonymous=True)
+  rate = rospy.Rate(rospy.get_param('~rate', 30)) # 30hz, the camera rate the commands used to follow
+  # 'joints' commands each joint controller, 'group' sends [joint1, joint2, joint3, joint4] in one message
+  # to the joints_position_controller (spawn.launch group_controller:=true), with joint 1 held at 0
+  group = rospy.get_param('~command_mode', 'joints') == 'group'
+  # initialize a publisher to send joints' angular position to the robot
+  if group:
+    joints_pub = rospy.Publisher("/robot/joints_position_controller/command", Float64MultiArray, queue_size=10)
+  else:
+    joint2_pub = rospy.Publisher("/robot/joint2_position_controller/command", Float64, queue_size=10)
+    joint3_pub = rospy.Publisher("/robot/joint3_position_controller/command", Float64, queue_size=10)
+    joint4_pub = rospy.Publisher("/robot/joint4_position_controller/command", Float64, queue_size=10)
+  while not rospy.is_shutdown():
+    current_time = rospy.get_time()
+    if group:
+      joints = Float64MultiArray()
+      joints.data = [0.0,
+                     (np.pi/2)*np.sin((np.pi/15)*current_time),
+                     (np.pi/2)*np.sin((np.pi/18)*current_time),
+                     (np.pi/2)*np.sin((np.pi/20)*current_time)]
+      joints_pub.publish(joints)
+      rate.sleep()
+      continue
+    joint2 = Float64()
+    joint2.data = (np.pi/2)*np.sin((np.pi/15)*current_time)
+    joint3 = Float64()
+    joint3.data = (np.pi/2)*np.sin((np.pi/18)*current_time)
+    joint4 = Float64()
+    joint4.data = (np.pi/2)*np.sin((np.pi/20)*current_time)
+    joint2_pub.publish(joint2)
+    joint3_pub.publish(joint3)
+    joint4_pub.publish(joint4)
+    rate.sleep()
+
+
+
+# run the code if the node is called
+if __name__ == '__main__':
+  try:
+    move()
+  except rospy.ROSInterruptException:
+    pass
@@ -6,49 +6,124 @@ from std_msgs.msg import String
 from std_msgs.msg import Float64
 from std_msgs.msg import Float64MultiArray
 from sensor_msgs.msg import JointState
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+from ivr_assignment.kinematics import forward_kinematics, jacobian, resolved_rate_step, JOINT_LIMITS, DEFAULT_DAMPING, DEFAULT_SINGULAR_THRESHOLD
+from ivr_assignment.profiling import latency_profiler
+from ivr_assignment.scheduling import rate_scheduler
+from ivr_assignment.trajectories import trajectory_tables, DEFAULT_SAMPLES
+
+# 'joints' sends one Float64 to each joint position controller, 'group' the whole joint vector in one message
+# to the joints_position_controller of config/joints.yaml (spawn.launch group_controller:=true)
+COMMAND_MODES = ('joints', 'group')
+# 'separate' reads the /joint_angles and /target_location arrays, 'combined' the stamped /vision_estimate
+VISION_INPUTS = ('separate', 'combined')
+# target paths and their start time, set by target_move.py
+TRAJECTORY_PARAM = "/target_trajectories"
 
 class robot_control:
 
     def __init__(self):
         rospy.init_node('robot_control', anonymous=True)
-        rate = rospy.Rate(30) # 30hz
         self.joints = []
         self.target_position = []
         self.base_joint_location = []
         # initialize publishers to send joint angles to the robot
-        self.joint1_pub = rospy.Publisher("/robot/joint1_position_controller/command", Float64, queue_size=10)
-        self.joint2_pub = rospy.Publisher("/robot/joint2_position_controller/command", Float64, queue_size=10)
-        self.joint3_pub = rospy.Publisher("/robot/joint3_position_controller/command", Float64, queue_size=10)
-        self.joint4_pub = rospy.Publisher("/robot/joint4_position_controller/command", Float64, queue_size=10)
+        self.command_mode = rospy.get_param('~command_mode', 'joints')
+        if self.command_mode not in COMMAND_MODES:
+            raise ValueError("unknown command_mode: " + str(self.command_mode))
+        if self.command_mode == 'group':
+            self.joints_pub = rospy.Publisher("/robot/joints_position_controller/command", Float64MultiArray, queue_size=10)
+        else:
+            self.joint1_pub = rospy.Publisher("/robot/joint1_position_controller/command", Float64, queue_size=10)
+            self.joint2_pub = rospy.Publisher("/robot/joint2_position_controller/command", Float64, queue_size=10)
+            self.joint3_pub = rospy.Publisher("/robot/joint3_position_controller/command", Float64, queue_size=10)
+            self.joint4_pub = rospy.Publisher("/robot/joint4_position_controller/command", Float64, queue_size=10)
         
         # publish end effector Forward Kinematics results
         self.fk_results_pub = rospy.Publisher("/forward_kinematics_result", Float64MultiArray, queue_size=1)
         
-        # initialize subscriber to get joint angles from robot
-        # if one wants real joint states, uncomment this instead
-        #self.joint_states_sub = rospy.Subscriber("/robot/joint_states", JointState,callback=self.joint_callback)
-        # computer vision joint angles:
-        self.joint_states_sub = rospy.Subscriber("/joint_angles", Float64MultiArray,callback=self.joint_callback)
-
-        # target location subscriber
-        #self.target_sub = rospy.Subscriber("/target/joint_states", JointState,callback=self.target_callback) # real world location
-        self.target_sub = rospy.Subscriber("/target_location", Float64MultiArray,callback=self.target_callback) # computer vision result
-        
+        self.vision_input = rospy.get_param('~vision_input', 'separate')
+        if self.vision_input not in VISION_INPUTS:
+            raise ValueError("unknown vision_input: " + str(self.vision_input))
+
         # initialize time variables
         self.start_time = rospy.get_time()
         self.time_prev = self.start_time
         self.time = None
 
+        # fixed rate control loop on the ROS clock, woken by new vision estimates instead of spinning.
+        # the default 20hz matches the old 0.05s delay, which kept the robot from shaking
+        self.scheduler = rate_scheduler(rospy.get_param('~control_rate', 20),
+                                        wait_for_data=rospy.get_param('~wait_for_data', True),
+                                        clock=rospy.get_time, sleep=rospy.sleep)
+        # [ticks, deadline misses, p50, p95, p99, max tick lateness in ms]
+        self.control_timing_pub = rospy.Publisher("/control_timing", Float64MultiArray, queue_size=1)
+
         # other kinematics variables
         self.error_prev = np.array([0,0,0],dtype='float64')
 
+        # damped least squares solver, the damping fades in below ~singular_threshold (smallest singular value of the jacobian).
+        # ~null_space_gain > 0 pulls the joints towards the centre of the joint limits loaded from config/joints.yaml,
+        # but only a free base joint leaves a null space. this node keeps joint 1 at 0, since the vision estimates
+        # assume it, so the gain has no effect here
+        self.solver_options = dict(damping=rospy.get_param('~damping', DEFAULT_DAMPING),
+                                   singular_threshold=rospy.get_param('~singular_threshold', DEFAULT_SINGULAR_THRESHOLD),
+                                   null_space_gain=rospy.get_param('~null_space_gain', 0.0),
+                                   joint_limits=np.array([rospy.get_param('/robot/joint_limits/lower', JOINT_LIMITS[0].tolist()),
+                                                          rospy.get_param('/robot/joint_limits/upper', JOINT_LIMITS[1].tolist())]))
+        # condition number of the jacobian at every control tick
+        self.condition_pub = rospy.Publisher("/jacobian_condition", Float64, queue_size=1)
+
+        # feed forward of the target velocity from the trajectory tables of target_move.py, looked up
+        # ~feed_forward_lookahead seconds ahead to make up for the vision latency
+        self.feed_forward = rospy.get_param('~feed_forward', False)
+        self.feed_forward_target = rospy.get_param('~feed_forward_target', 'target')
+        self.feed_forward_lookahead = rospy.get_param('~feed_forward_lookahead', 0.0)
+        self.trajectories = None
+        self.last_trajectory_check = None
+
+        # control step latency histograms, published on /diagnostics every ~profiling_period seconds
+        self.profiler = latency_profiler(enabled=rospy.get_param('~profiling', False))
+        if self.profiler.enabled:
+            self.profiling_period = rospy.get_param('~profiling_period', 1.0)
+            self.last_diagnostics_time = rospy.get_time()
+            self.diagnostics_pub = rospy.Publisher("/diagnostics", DiagnosticArray, queue_size=1)
+
+        # subscribe last, the callbacks wake the scheduler
+        if self.vision_input == 'combined':
+            # joint angles and target location of the same frame pair in one message,
+            # generated by catkin from msg/VisionEstimate.msg
+            from ivr_assignment.msg import VisionEstimate
+            self.estimate_sub = rospy.Subscriber("/vision_estimate", VisionEstimate, callback=self.estimate_callback)
+        else:
+            # initialize subscriber to get joint angles from robot
+            # if one wants real joint states, uncomment this instead
+            #self.joint_states_sub = rospy.Subscriber("/robot/joint_states", JointState,callback=self.joint_callback)
+            # computer vision joint angles:
+            self.joint_states_sub = rospy.Subscriber("/joint_angles", Float64MultiArray,callback=self.joint_callback)
+
+            # target location subscriber
+            #self.target_sub = rospy.Subscriber("/target/joint_states", JointState,callback=self.target_callback) # real world location
+            self.target_sub = rospy.Subscriber("/target_location", Float64MultiArray,callback=self.target_callback) # computer vision result
+
     def joint_callback(self,data):
         # need to have fixed joint 0 before 3 angles from vision i.e. [0, data.position]
         self.joints = np.concatenate((np.array([0]),np.array(data.data)),axis=0) # update joint angles from ros subscriber
         #self.joints = np.array(data.position) # if using actual robot joint angles
+        self.scheduler.notify()
     def target_callback(self,data):
         #self.target_position = np.array(data.position)
         self.target_position = np.array(data.data)
+        self.scheduler.notify()
+    def estimate_callback(self,data):
+        # NaN estimates keep the previous values, like the unpublished ones of the separate topics
+        joint_angles = np.array(data.joint_angles)
+        if np.all(np.isfinite(joint_angles)):
+            self.joints = np.concatenate((np.array([0]),joint_angles),axis=0)
+        target_position = np.array(data.target_location)
+        if np.all(np.isfinite(target_position)):
+            self.target_position = target_position
+        self.scheduler.notify()
     
     def publishFKResult(self):
         fk_result_payload = Float64MultiArray()
@@ -56,102 +131,66 @@ class robot_control:
         self.fk_results_pub.publish(fk_result_payload)
 
     def getEndFKPos(self):
-        # to save space
-        q = self.joints
-        def s(angle):
-            return np.sin(angle)
-        def c(angle):
-            return np.cos(angle)
-
-        x = 3.5*(c(q[0])*s(q[2]) + s(q[0])*s(q[1])*c(q[2])) + 3*(s(q[0])*c(q[1])*s(q[3]) + c(q[3])*(c(q[0])*s(q[2]) + s(q[0])*s(q[1])*c(q[2])))
-        y = 3.5*(s(q[0])*s(q[2]) - c(q[0])*s(q[1])*c(q[2])) + 3*(c(q[3])*( s(q[0])*s(q[2]) - c(q[0])*s(q[1])*c(q[2]) ) - c(q[0])*c(q[1])*s(q[3]))
-        z = 3.5*c(q[1])*c(q[2]) + 3*(c(q[1])*c(q[2])*c(q[3]) - s(q[1])*s(q[3])) + 2.5
-        return np.array([x,y,z])
+        return forward_kinematics(self.joints)
 
     def getJacobian(self):
+        return jacobian(self.joints)
 
-        # to save space:
-        q = self.joints
-        def s(angle):
-            return np.sin(angle)
-        def c(angle):
-            return np.cos(angle)
-        
-        # get partial derivatives:
-        dx_dq0 = 3.5*(-s(q[2])*s(q[0]) + s(q[1])*c(q[2])*c(q[0])) + 3*(c(q[1])*s(q[3])*c(q[0]) + c(q[3])*(-s(q[2])*s(q[0]) + s(q[1])*c(q[2])*c(q[0])))
-        dx_dq1 = 3.5*(s(q[0])*c(q[2])*c(q[1])) + 3*(-s(q[0])*s(q[3])*s(q[1]) + c(q[3])*s(q[0])*c(q[2])*c(q[1]))
-        dx_dq2 = 3.5*(c(q[0])*c(q[3]) - s(q[0])*s(q[1])*s(q[2])) + 3*c(q[3])*(c(q[0])*c(q[2]) - s(q[0])*s(q[1])*s(q[2]))
-        dx_dq3 = 3*(s(q[0])*c(q[1])*c(q[3]) - s(q[3])*(c(q[0])*s(q[2]) + s(q[0])*c(q[2])*s(q[1])))
-
-        dy_dq0 = 3.5*(s(q[2])*c(q[0]) + s(q[1])*c(q[2])*s(q[0])) + 3*(c(q[3])*( s(q[2])*c(q[0]) + s(q[1])*c(q[2])*s(q[0]) ) + c(q[1])*s(q[3])*s(q[0]))
-        dy_dq1 = -3.5*c(q[0])*c(q[2])*c(q[1]) + 3*(-c(q[3])*c(q[0])*c(q[2])*c(q[1]) + c(q[0])*s(q[3])*s(q[1]))
-        dy_dq2 = 3.5*(s(q[0])*c(q[2]) + c(q[0])*s(q[1])*s(q[2])) + 3*c(q[3])*( s(q[0])*c(q[2]) + c(q[0])*s(q[1])*s(q[2]) )
-        dy_dq3 = 3*(-s(q[3])*( s(q[0])*s(q[2]) - c(q[0])*c(q[2])*s(q[1])) - c(q[0])*c(q[1])*c(q[3]))
-
-        dz_dq0 = 0
-        dz_dq1 = 3*(-s(q[1])*c(q[2])*c(q[3]) - c(q[1])*s(q[3])) - 3.5*s(q[1])*c(q[2])
-        dz_dq2 = -3.5*c(q[1])*s(q[2]) - 3*c(q[1])*s(q[2])*c(q[3])
-        dz_dq3 = 3*(-c(q[1])*c(q[2])*s(q[3]) - s(q[1])*c(q[3]))
-
-        # use partial derivatives to return the Jacobian
-        return np.array([[dx_dq0,dx_dq1,dx_dq2,dx_dq3],
-                         [dy_dq0,dy_dq1,dy_dq2,dy_dq3],
-                         [dz_dq0,dz_dq1,dz_dq2,dz_dq3]])
-
-    def getClosedLoopMovement(self,target):
+    def getClosedLoopMovement(self,target,dt=None):
         # target is np.array([x,y,z])
 
-        # get vector from end effector to the target position
-        error = target - self.getEndFKPos()
-
-
-        J = self.getJacobian()
-        # if q0 is fixed, we should account for this in the Jacobian
-        # dx,dy,dz can't be affected by change in q0, so set dx_dq0,dy_dq0,dz_dq0 to zero
-        J[0,0] = 0
-        J[1,0] = 0
-        J[2,0] = 0
-        # get pseudo-inverse of Jacobian
-        J_pinv = np.linalg.pinv(J)
-
-        # get current time and dt
+        # get current time, dt is the scheduled tick period unless called outside the control loop
         self.time = rospy.get_time() - self.start_time
-        dt = self.time - self.time_prev
+        if dt is None:
+            dt = self.time - self.time_prev
         self.time_prev = self.time
 
-        # get error derivative
-        de_dt = (error - self.error_prev)/dt # might need changing, see lab 3 solution
-
-
-        # proportinal gain and derivative gain
-        K_p = np.eye(3)*10
-        K_d = np.eye(3)*0.1
-        
-        # desired changes in joint angles q
-        dq = J_pinv @ (K_p @ error + K_d @ de_dt)
-        # angular velocity of joints
-        #dq = np.dot(J_pinv,(np.dot(K_p,error.T) + np.dot(K_d,de_dt.T))) 
-
-        # note that joint 1 can go from -pi -> pi (has full 360 degree freedom)
-        # need to handle this?
-
-        #q = self.joints + dt*dq # angular position of joints
-        q = self.joints + dt*dq
-        #q[0] = (q[0] + np.pi)%(2*np.pi) - np.pi
-        '''
-        print("J: " + str(self.getJacobian()))
-        print("J_pinv: " + str(J_pinv))
-        print("error: " + str(error))
-        print("dt: " + str(dt))
-        print("de_dt: " + str(de_dt))
-        print("dq: " + str(dq))
-        '''
+        # closed loop step with q0 fixed, see ivr_assignment.kinematics
+        q, error, condition = resolved_rate_step(self.joints, target, self.error_prev, dt,
+                                                 target_velocity=self.getTargetVelocity(), **self.solver_options)
+        self.condition_pub.publish(Float64(condition))
         return q
 
-    def moveToTarget(self):
+    def getTargetVelocity(self):
+        if not self.feed_forward or not self.loadTrajectories():
+            return None
+        t = rospy.get_time() - self.trajectory_start_time + self.feed_forward_lookahead
+        return self.trajectories.velocities_at(t)[self.trajectory_index]
+
+    def loadTrajectories(self):
+        # target_move.py may start after this node, so the parameters are checked at most once a second
+        if self.trajectories is not None:
+            return True
+        now = rospy.get_time()
+        if self.last_trajectory_check is not None and now - self.last_trajectory_check < 1.0:
+            return False
+        self.last_trajectory_check = now
+        if not rospy.has_param(TRAJECTORY_PARAM + "/start_time"):
+            return False
+        config = rospy.get_param(TRAJECTORY_PARAM)
+        self.trajectories = trajectory_tables(config['targets'], config.get('samples', DEFAULT_SAMPLES))
+        self.trajectory_index = self.trajectories.index(self.feed_forward_target)
+        self.trajectory_start_time = config['start_time']
+        return True
+
+    def moveToTarget(self,dt=None):
 
         #target = np.array([-5.0,-3.0,2.0])
-        q = self.getClosedLoopMovement(self.target_position)
+        with self.profiler.stage('control_step'):
+            q = self.getClosedLoopMovement(self.target_position,dt)
+
+        with self.profiler.stage('publish'):
+            self.publishJointCommands(q)
+
+        if self.profiler.enabled:
+            self.publishDiagnostics()
+
+    def publishJointCommands(self,q):
+        if self.command_mode == 'group':
+            joints = Float64MultiArray()
+            joints.data = q
+            self.joints_pub.publish(joints)
+            return
 
         joint1 = Float64()
         joint1.data = q[0]
@@ -168,16 +207,37 @@ class robot_control:
         self.joint3_pub.publish(joint3)
         self.joint4_pub.publish(joint4)
 
-        # delay before updating movement again
-        # otherwise the robot starts uncontrollably shaking/dancing/flying
-        rospy.sleep(0.05)
+    def publishDiagnostics(self):
+        now = rospy.get_time()
+        if now - self.last_diagnostics_time < self.profiling_period:
+            return
+        self.last_diagnostics_time = now
+        diagnostics = DiagnosticArray()
+        diagnostics.header.stamp = rospy.Time.now()
+        for stage, values in self.profiler.report_values():
+            status = DiagnosticStatus(level=DiagnosticStatus.OK, name="robot_control: " + stage, hardware_id="control")
+            status.values = [KeyValue(key, value) for key, value in values]
+            diagnostics.status.append(status)
+        self.diagnostics_pub.publish(diagnostics)
         
+    def publishControlTiming(self):
+        timing = self.scheduler.stats()
+        timing[2:] *= 1000
+        control_timing_payload = Float64MultiArray()
+        control_timing_payload.data = timing
+        self.control_timing_pub.publish(control_timing_payload)
+
     def run(self):
         while not rospy.is_shutdown():
-            if self.joints != [] and self.target_position != []:# and self.base_joint_location != []:
+            # the time between scheduled ticks, or None after a while without new estimates
+            dt = self.scheduler.wait()
+            if dt is None:
+                continue
+            if len(self.joints) > 0 and len(self.target_position) > 0:# and self.base_joint_location != []:
                 #print(self.base_joint_location)
-                self.moveToTarget()
+                self.moveToTarget(dt)
                 #self.publishFKResult()
+                self.publishControlTiming()
 
 # run the code if the node is called
 if __name__ == '__main__':
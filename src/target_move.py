@@ -5,46 +5,33 @@ import rospy
 import numpy as np
 from std_msgs.msg import String
 from std_msgs.msg import Float64
+from ivr_assignment.trajectories import trajectory_tables, DEFAULT_TARGETS, DEFAULT_SAMPLES
+
+
+# target paths of config/target_trajectories.yaml, loaded to this parameter by spawn.launch.
+# the node adds start_time, the ros time of t = 0 on every path, so robot_control can look them up too
+TRAJECTORY_PARAM = "/target_trajectories"
 
 
 # Publish data
 def move():
   rospy.init_node('target_pos_cmd', anonymous=True)
-  rate = rospy.Rate(30) # 30hz
-  # initialize a publisher to send joints' angular position to the robot
-  robot_joint1_pub = rospy.Publisher("/target/x_position_controller/command", Float64, queue_size=10)
-  robot_joint2_pub = rospy.Publisher("/target/y_position_controller/command", Float64, queue_size=10)
-  robot_joint3_pub = rospy.Publisher("/target/z_position_controller/command", Float64, queue_size=10)
-  robot_joint4_pub = rospy.Publisher("/target2/x2_position_controller/command", Float64, queue_size=10)
-  robot_joint5_pub = rospy.Publisher("/target2/y2_position_controller/command", Float64, queue_size=10)
-  robot_joint6_pub = rospy.Publisher("/target2/z2_position_controller/command", Float64, queue_size=10)
+  rate = rospy.Rate(rospy.get_param('~rate', 30)) # 30hz
+  targets = rospy.get_param(TRAJECTORY_PARAM + "/targets", DEFAULT_TARGETS)
+  samples = rospy.get_param(TRAJECTORY_PARAM + "/samples", DEFAULT_SAMPLES)
+  # every path is sampled over one period once, each tick only interpolates all of them in one lookup
+  tables = trajectory_tables(targets, samples)
+  # initialize a publisher per axis of every target's position controllers
+  publishers = [[rospy.Publisher(topic, Float64, queue_size=10) for topic in target['command_topics']] for target in targets]
   t0 = rospy.get_time()
+  rospy.set_param(TRAJECTORY_PARAM, {'targets': targets, 'samples': samples, 'start_time': t0})
   while not rospy.is_shutdown():
-    cur_time = np.array([rospy.get_time()])-t0
-    #y_d = float(6 + np.absolute(1.5* np.sin(cur_time * np.pi/100)))
-    x_d = 2.5* np.cos(cur_time * np.pi/15)
-    y_d = 2.5* np.sin(cur_time * np.pi/15)
-    z_d = 1* np.sin(cur_time * np.pi/15)
-    joint1=Float64()
-    joint1.data= 0.5 + x_d
-    joint2=Float64()
-    joint2.data= 0 + y_d
-    joint3=Float64()
-    joint3.data= 7 + z_d
-    robot_joint1_pub.publish(joint1)
-    robot_joint2_pub.publish(joint2)
-    robot_joint3_pub.publish(joint3)
-    x_d = 2+ 2* np.cos(cur_time * np.pi/15)
-    y_d = 2.5+ 1.5* np.sin(cur_time * np.pi/15)
-    joint4=Float64()
-    joint4.data=  x_d
-    joint5=Float64()
-    joint5.data=  y_d
-    joint6=Float64()
-    joint6.data= 7.5
-    robot_joint4_pub.publish(joint4)
-    robot_joint5_pub.publish(joint5)
-    robot_joint6_pub.publish(joint6)
+    cur_time = rospy.get_time()-t0
+    for target_publishers, position in zip(publishers, tables.positions_at(cur_time)):
+      for publisher, value in zip(target_publishers, position):
+        joint=Float64()
+        joint.data= value
+        publisher.publish(joint)
     rate.sleep()
 
 
@@ -55,5 +42,3 @@ if __name__ == '__main__':
     move()
   except rospy.ROSInterruptException:
     pass
-
-
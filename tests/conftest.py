@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the ivr_assignment package lives in src/, the synthetic frames of the benchmarks in benchmarks/
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(root, 'src'))
+sys.path.insert(0, os.path.join(root, 'benchmarks'))
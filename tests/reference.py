@@ -0,0 +1,123 @@
+import numpy as np
+import cv2
+from ivr_assignment.colour_classifier import ORANGE_THRESHOLDS
+from ivr_assignment.detection import threshold_and_dilate, JOINT_1_IMAGE_COORDINATES, JOINT_2_IMAGE_COORDINATES
+
+# the original detection code the faster versions in ivr_assignment.detection are checked against
+
+
+def get_black_joint_centers_full_frame(image):
+  # the original full frame hough search of joint_angles_black.py
+
+  binary_image = cv2.inRange(image, (0, 0, 0), (10, 10, 10))
+
+  joint_1_coordinates = JOINT_1_IMAGE_COORDINATES
+  joint_2_coordinates = JOINT_2_IMAGE_COORDINATES
+
+  joint_matches = cv2.HoughCircles(binary_image, cv2.HOUGH_GRADIENT, dp=1.0, minDist=0.78, maxRadius=18, param1=100, param2=7)
+
+  if(joint_matches is None or len(joint_matches) == 0 or len(joint_matches[0,:]) < 1):
+    return np.array([joint_2_coordinates, joint_2_coordinates], dtype=np.int64)
+
+  joint_matches = joint_matches.astype(np.int64)
+  joint_matches = joint_matches[0,:]
+
+  minimum_distance = 50
+
+  if(len(joint_matches) >= 2):
+    joint_centers = []
+    joints_found = False
+
+    while(True):
+      for joint_match in joint_matches:
+
+        match_to_joint_1_vector = joint_1_coordinates - joint_match[0:2]
+        match_to_joint_2_vector = joint_2_coordinates - joint_match[0:2]
+
+        distance_of_match_from_joint_1 = np.linalg.norm(match_to_joint_1_vector)
+        distance_of_match_from_joint_2 = np.linalg.norm(match_to_joint_2_vector)
+
+        if(distance_of_match_from_joint_1 >= minimum_distance and distance_of_match_from_joint_2 >= minimum_distance):
+          if(len(joint_centers) < 2):
+            joint_centers.append(joint_match[0:2])
+          if(len(joint_centers) >= 2):
+
+            match_distances_from_joint_2 = np.array( [ np.linalg.norm(joint_centers[0]-joint_2_coordinates) , np.linalg.norm(joint_centers[1]-joint_2_coordinates)] )
+
+            joint_3_center = joint_centers[ np.argmin(match_distances_from_joint_2) ]
+            joint_4_center = joint_centers[ np.argmax(match_distances_from_joint_2) ]
+
+            joint_centers[0] = joint_3_center
+            joint_centers[1] = joint_4_center
+
+            joints_found = True
+            break
+      if(joints_found == True):
+        return np.array(joint_centers, dtype=np.int64)
+      else:
+        minimum_distance = minimum_distance - 5
+
+  elif(len(joint_matches) == 1):
+    return np.array([joint_matches[0,0:2], joint_matches[0,0:2]], dtype=np.int64)
+
+
+def get_target_image_coord_contours(image, orange_image=None):
+  # the original contour based target search of joint_angles.py
+  ### process image
+  if orange_image is None:
+    orange_image = threshold_and_dilate(image,ORANGE_THRESHOLDS,2)
+
+  ### get all orange objects in image
+  contours,hierarchy = cv2.findContours(orange_image,cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+  area_ratios = []
+  centres = []
+  for contour in contours:
+    contour = cv2.approxPolyDP(contour, 0.5, True)
+    M = cv2.moments(contour)
+    cx = int(M['m10'] / M['m00'])
+    cy = int(M['m01'] / M['m00'])
+    centres.append(np.array([cx,cy]))
+    (x,y,w,h) = cv2.boundingRect(contour)
+
+    # get area of bounding box
+    bbox_area = w*h
+    # get ratio of bounding box area filled by orange shape
+    shape_area = np.sum(orange_image[y:y+h,x:x+w] * (1.0/255.0))
+    area_ratios.append(shape_area/bbox_area)
+
+  ### handle each relevant case where we detect a different number of orange objects:
+  if len(contours) == 1:
+    return centres[0]
+  if len(contours) == 2: # check if one shape is definitely a circle or rectangle (if we know one we can infer the other)
+    # check if definitely a rectangle
+    if contours[0].shape[0] == 4 or area_ratios[0] > 0.95:
+      return centres[1] # then other shape is sphere
+    if contours[1].shape[0] == 4 or area_ratios[1] > 0.95:
+      return centres[0]
+    # if we cant find definite rectangle, actually check for a circle
+    for i in range(2):
+      (x,y),r = cv2.minEnclosingCircle(contours[i])
+      min_circle_area = 3.14*r*r
+      circleness = cv2.contourArea(contours[i])/min_circle_area
+      if circleness > 0.9:
+        # definentely a circle
+        return centres[i]
+
+  if len(contours) == 3: # one shape is definitely a sphere or rectangle - other contours come from split shape
+    is_rectangle = [False,False,False]
+    for i in range(3):
+      # check if defenently a rectangle
+      if contours[i].shape[0] == 4 or area_ratios[i] > 0.95:
+        is_rectangle[i] = True
+    if np.sum(np.array(is_rectangle))==1: # we have exactly 1 rectangle, other 2 come from obscured sphere
+      s_ind = [n for n in range(3) if not is_rectangle[n]] # <- other indices for shapes that are not rectangle
+      return ((centres[s_ind[0]][0] + centres[s_ind[1]][0])//2,(centres[s_ind[0]][1] + centres[s_ind[1]][1])//2) # return middle of 2 split sphere shapes
+    # otherwise actually check for single circle:
+    for i in range(3):
+      (x,y),r = cv2.minEnclosingCircle(contours[i])
+      min_circle_area = 3.14*r*r
+      circleness = cv2.contourArea(contours[i])/min_circle_area
+      if circleness > 0.9:
+        # definentely a circle
+        return centres[i]
+  return None
@@ -0,0 +1,77 @@
+import numpy as np
+from synthetic import synthetic_frames
+from ivr_assignment.calibration import base_calibration
+from ivr_assignment.pipeline import vision_pipeline
+
+# [yz, xz] x [yellow, blue] image positions
+BASE_POSITIONS = np.array([[[398, 535], [398, 470]], [[400, 536], [401, 471]]], dtype=np.float64)
+
+
+def calibrate(calibration, positions=BASE_POSITIONS):
+  for i in range(calibration.frames):
+    completed = calibration.observe(positions)
+  return completed
+
+
+def test_calibrates_from_the_median_and_skips_occluded_frames():
+  calibration = base_calibration(frames=5)
+  occluded = BASE_POSITIONS.copy()
+  occluded[1,0] = np.nan
+  calibration.observe(occluded)
+  calibration.observe(BASE_POSITIONS + 50)
+  calibrate(calibration)
+  assert calibration.calibrated()
+  np.testing.assert_array_equal(calibration.positions, BASE_POSITIONS)
+  assert calibration.scale == calibration.metres_per_pixel()
+
+
+def test_save_and_load_round_trip(tmp_path):
+  path = str(tmp_path / 'calibration.json')
+  calibration = base_calibration(frames=3, path=path)
+  assert calibrate(calibration)
+  loaded = base_calibration()
+  assert not loaded.load(str(tmp_path / 'missing.json'))
+  assert loaded.load(path)
+  assert loaded.calibrated()
+  np.testing.assert_array_equal(loaded.positions, calibration.positions)
+  assert loaded.scale == calibration.scale
+
+
+def test_drift_starts_a_new_calibration():
+  calibration = base_calibration(frames=3, drift_check_interval=2, drift_tolerance=3.0)
+  calibrate(calibration)
+  # small changes and occlusions are not drift
+  nudged = BASE_POSITIONS + 1
+  nudged[0,1] = np.nan
+  calibration.observe(nudged)
+  assert calibration.calibrated()
+  # the cameras moved
+  calibration.observe(BASE_POSITIONS + 10)
+  assert not calibration.calibrated() and calibration.scale is None
+  assert calibration.recalibrations == 1
+  assert calibrate(calibration, BASE_POSITIONS + 10)
+  np.testing.assert_array_equal(calibration.positions, BASE_POSITIONS + 10)
+
+
+def test_drift_checks_only_every_interval():
+  calibration = base_calibration(frames=1, drift_check_interval=3)
+  calibrate(calibration)
+  checks = []
+  for i in range(6):
+    checks.append(calibration.needs_detection())
+    calibration.advance()
+  assert checks == [False, True, False, False, True, False]
+
+
+def test_calibrated_pipeline_uses_the_calibrated_scale():
+  yz_frames, xz_frames, joint_vectors = synthetic_frames(6, size=400, seed=5)
+  calibration = base_calibration(frames=3, drift_check_interval=0)
+  calibrated = vision_pipeline(calibration=calibration)
+  uncalibrated = vision_pipeline()
+  for yz_image, xz_image in zip(yz_frames, xz_frames):
+    estimate = calibrated.process(yz_image, xz_image)
+    expected = uncalibrated.process(yz_image, xz_image)
+  # the base spheres do not move, so the calibrated scale is the one measured every frame
+  assert calibration.calibrated()
+  np.testing.assert_allclose(estimate.end_effector_location, expected.end_effector_location, rtol=1e-12)
+  np.testing.assert_allclose(estimate.target_location, expected.target_location, rtol=1e-12)
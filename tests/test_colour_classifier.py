@@ -0,0 +1,42 @@
+import numpy as np
+import cv2
+import pytest
+from ivr_assignment.normalization import rgb_normalizer
+from ivr_assignment.colour_classifier import colour_classifier, COLOUR_THRESHOLDS
+from ivr_assignment.detection import get_joint_center
+
+SPHERE_COLOURS = [(0, 255, 255), (255, 0, 0), (0, 255, 0), (0, 0, 255), (0, 128, 255)]
+
+
+def normalized_frames():
+  normalizer = rgb_normalizer()
+  rng = np.random.default_rng(1)
+  frames = []
+  for i in range(4):
+    # the spheres and the target on the noisy grey background of the simulator, partly overlapping
+    image = np.full((400,400,3), 178, np.uint8)
+    cv2.add(image, rng.integers(0, 12, image.shape, dtype=np.uint8), dst=image)
+    for colour in SPHERE_COLOURS:
+      cv2.circle(image, tuple(int(x) for x in rng.integers(20, 380, 2)), 7, colour, -1)
+    frames.append(normalizer.normalize(image).copy())
+  # every colour box is hit somewhere in uniform noise, including pixels inside two boxes at once
+  frames.append(np.random.default_rng(0).integers(0, 256, (120,160,3), dtype=np.uint8))
+  return frames
+
+
+@pytest.mark.parametrize('name,thresholds', COLOUR_THRESHOLDS)
+def test_classifier_masks_match_in_range_and_dilate(name, thresholds):
+  classifier = colour_classifier()
+  kernel = np.ones((2, 2), np.uint8)
+  for image in normalized_frames():
+    classifier.classify(image)
+    expected = cv2.dilate(cv2.inRange(image, thresholds[0], thresholds[1]), kernel, iterations=2)
+    np.testing.assert_array_equal(classifier.mask(name), expected)
+
+
+@pytest.mark.parametrize('name,thresholds', COLOUR_THRESHOLDS)
+def test_classifier_centroids_match_get_joint_center(name, thresholds):
+  classifier = colour_classifier()
+  for image in normalized_frames():
+    classifier.classify(image)
+    np.testing.assert_array_equal(classifier.centroid(name), get_joint_center(image, thresholds, dilation=2))
@@ -0,0 +1,36 @@
+import os
+import numpy as np
+from ivr_assignment.evaluation import urdf_visual_centre, accuracy, occlusion_cases, ROBOT_URDF, YELLOW_SPHERE_LINK
+
+OBJECT_URDF = os.path.join(os.path.dirname(ROBOT_URDF), 'object.urdf')
+
+
+def test_yellow_sphere_centre_from_urdf():
+  # base_to_link0 at 0.5 m and the sphere_base visual 0.25 m above it
+  np.testing.assert_allclose(urdf_visual_centre(ROBOT_URDF, YELLOW_SPHERE_LINK), [0, 0, 0.75])
+  # the blue sphere is 2.5 m above it, the distance the vision pipeline scales by
+  np.testing.assert_allclose(urdf_visual_centre(ROBOT_URDF, 'sphere0'), [0, 0, 3.25])
+
+
+def test_target_joint_states_are_the_sphere_centre():
+  # the rotated prismatic frames and the -0.3 m fixed joint cancel the visual offset of the orange sphere
+  np.testing.assert_allclose(urdf_visual_centre(OBJECT_URDF, 'sphere'), [0, 0, 0], atol=1e-9)
+
+
+def test_target_error_in_the_vision_frame():
+  yellow = urdf_visual_centre(ROBOT_URDF, YELLOW_SPHERE_LINK)
+  true_joints = np.zeros((2,4))
+  true_target = np.array([[1.0, 2.0, 7.0], [-2.0, 0.5, 6.0]])
+  # what the vision pipeline reports for those poses, measured from the centre of the yellow sphere
+  target_location = np.array([[1.0, 2.0, 6.25], [-2.0, 0.5, 5.25]])
+  report = accuracy(np.zeros((2,3)), np.tile([0.0, 0.0, 9.0], (2,1)), target_location, true_joints, true_target, yellow)
+  assert report['target_rmse'] < 1e-12
+  assert report['end_effector_rmse'] < 1e-12
+  assert report['joint_rmse'] == {'joint2': 0.0, 'joint3': 0.0, 'joint4': 0.0}
+
+
+def test_occlusion_cases():
+  detections = np.ones((3,2,4), dtype=bool)
+  detections[1,0,2] = False
+  detections[2,:,3] = False
+  np.testing.assert_array_equal(occlusion_cases(detections), ['visible', 'one_view', 'both_views'])
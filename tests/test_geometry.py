@@ -0,0 +1,29 @@
+import numpy as np
+from synthetic import joint_positions, random_joint_vectors
+from ivr_assignment.geometry import compute_joint_angles, compute_joint_angles_batch, merge_plane_coordinates
+
+
+def test_joint_angles_of_exact_coordinates():
+  joint_vectors = random_joint_vectors(50, np.random.default_rng(0), fixed_base=True)
+  coordinates = np.array([joint_positions(q) for q in joint_vectors])
+  np.testing.assert_allclose(compute_joint_angles_batch(coordinates), joint_vectors[:,1:], rtol=0, atol=1e-12)
+  np.testing.assert_allclose(compute_joint_angles(coordinates[0]), joint_vectors[0,1:], rtol=0, atol=1e-12)
+
+
+def test_merge_plane_coordinates():
+  yz = np.array([[0.0, 0.0], [1.0, 10.0], [2.0, 20.0]])
+  xz = np.array([[5.0, 0.0], [6.0, 10.0], [7.0, 20.0]])
+  np.testing.assert_array_equal(merge_plane_coordinates(yz, xz), [[5, 0, 0], [6, 1, 10], [7, 2, 20]])
+
+
+def test_point_missing_from_xz_borrows_x_of_closest_on_z():
+  yz = np.array([[0.0, 0.0], [1.0, 10.0], [2.0, 13.0]])
+  xz = np.array([[5.0, 0.0], [6.0, 10.0], [np.nan, np.nan]])
+  # the third point is nearest to the second on the z axis of the yz view
+  np.testing.assert_array_equal(merge_plane_coordinates(yz, xz)[2], [6, 2, 13])
+
+
+def test_point_missing_from_yz_borrows_y_of_closest_on_z():
+  yz = np.array([[0.0, 0.0], [1.0, 10.0], [np.nan, np.nan]])
+  xz = np.array([[5.0, 0.0], [6.0, 10.0], [7.0, 12.0]])
+  np.testing.assert_array_equal(merge_plane_coordinates(yz, xz)[2], [7, 1, 12])
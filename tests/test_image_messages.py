@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from ivr_assignment.image_messages import bgr8_view, bgr8_image
+
+
+def image_message(image, encoding='bgr8', padding=0):
+  # the fields of a sensor_msgs/Image, rows padded with `padding` bytes
+  height, width = image.shape[:2]
+  step = width*3 + padding
+  data = np.zeros((height, step), np.uint8)
+  data[:,:width*3] = image.reshape(height, width*3)
+  return SimpleNamespace(height=height, width=width, encoding=encoding, step=step, data=data.tobytes())
+
+
+def test_bgr8_round_trip():
+  image = np.random.default_rng(0).integers(0, 256, (5,7,3), dtype=np.uint8)
+  view = bgr8_view(image_message(image))
+  np.testing.assert_array_equal(view, image)
+  assert not view.flags.writeable
+
+
+def test_padded_rows():
+  image = np.random.default_rng(1).integers(0, 256, (4,6,3), dtype=np.uint8)
+  msg = image_message(image, padding=6)
+  view = bgr8_image(msg, convert=None)
+  np.testing.assert_array_equal(view, image)
+  # a view of the message buffer, not a copy
+  assert view.strides[0] == msg.step
+
+
+def test_truncated_data_is_not_viewed():
+  msg = image_message(np.zeros((4,6,3), np.uint8))
+  msg.data = msg.data[:-1]
+  assert bgr8_view(msg) is None
+
+
+def test_other_encodings_are_converted():
+  image = np.zeros((2,3,3), np.uint8)
+  msg = image_message(image, encoding='rgb8')
+  assert bgr8_view(msg) is None
+  assert bgr8_image(msg, lambda msg: 'converted') == 'converted'
+
+
+def test_conversion_errors_propagate():
+  class conversion_error(Exception):
+    pass
+
+  def convert(msg):
+    raise conversion_error(msg.encoding)
+
+  msg = image_message(np.zeros((2,3,3), np.uint8), encoding='mono16')
+  with pytest.raises(conversion_error):
+    bgr8_image(msg, convert)
@@ -0,0 +1,57 @@
+import numpy as np
+from ivr_assignment.kalman import constant_velocity_filter
+
+
+def track(velocity, frames, start=(100.0, 200.0)):
+  return np.array(start) + np.outer(np.arange(frames), velocity)
+
+
+def test_converges_on_a_constant_velocity_track():
+  velocity = np.array([3.0, -2.0])
+  positions = track(velocity, 40)
+  noise = np.random.default_rng(0).normal(0, 1.0, positions.shape)
+  # little process noise for a track that really has constant velocity
+  kalman = constant_velocity_filter(1, acceleration_std=0.05)
+  for position in positions + noise:
+    kalman.predict()
+    kalman.update(position[np.newaxis])
+  np.testing.assert_allclose(kalman.state[0,2:], velocity, atol=0.3)
+  np.testing.assert_allclose(kalman.positions()[0], positions[-1], atol=1.5)
+  # the filtered position is more certain than a single measurement
+  assert kalman.position_std()[0] < 1.0
+
+
+def test_predicts_through_missing_measurements():
+  velocity = np.array([2.0, 1.0])
+  positions = track(velocity, 30)
+  kalman = constant_velocity_filter(2, max_coast=5)
+  for frame, position in enumerate(positions):
+    kalman.predict()
+    # the second point is never seen, the first one is occluded for 4 frames
+    measurements = np.full((2,2), np.nan)
+    if not 20 <= frame < 24:
+      measurements[0] = position
+    kalman.update(measurements)
+    if frame == 23:
+      std_while_coasting = kalman.position_std()[0]
+      np.testing.assert_allclose(kalman.positions()[0], position, atol=0.1)
+  np.testing.assert_allclose(kalman.positions()[0], positions[-1], atol=0.1)
+  assert kalman.position_std()[0] < std_while_coasting
+  assert np.isnan(kalman.positions()[1]).all()
+  assert kalman.position_std()[1] == np.inf
+
+
+def test_drops_a_track_after_max_coast():
+  kalman = constant_velocity_filter(1, max_coast=3)
+  kalman.predict()
+  kalman.update(np.array([[10.0, 10.0]]))
+  for frame in range(3):
+    kalman.predict()
+    kalman.update(np.full((1,2), np.nan))
+    assert kalman.tracking[0]
+  kalman.predict()
+  assert not kalman.tracking[0]
+  assert np.isnan(kalman.positions()).all()
+  # the next measurement starts a new track at rest
+  kalman.update(np.array([[50.0, 60.0]]))
+  np.testing.assert_array_equal(kalman.state[0], [50, 60, 0, 0])
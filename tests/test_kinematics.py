@@ -0,0 +1,50 @@
+import numpy as np
+from ivr_assignment.kinematics import (forward_kinematics, jacobian, forward_kinematics_batch, jacobian_batch,
+                                       damped_least_squares, inverse_3x3, symmetric_eigenvalues_3x3)
+
+JOINT_RANGES = np.array([np.pi, np.pi/2, np.pi/2, np.pi/2])
+
+
+def joint_vectors(n, seed=0):
+  return np.random.default_rng(seed).uniform(-JOINT_RANGES, JOINT_RANGES, (n,4))
+
+
+def test_jacobian_matches_finite_differences():
+  step = 1e-6
+  for q in joint_vectors(50):
+    numerical = np.stack([(forward_kinematics(q + step*e) - forward_kinematics(q - step*e))/(2*step) for e in np.eye(4)], axis=1)
+    np.testing.assert_allclose(jacobian(q), numerical, atol=1e-7)
+
+
+def test_batch_matches_single_configuration():
+  q = joint_vectors(50)
+  np.testing.assert_allclose(forward_kinematics_batch(q), [forward_kinematics(x) for x in q], rtol=0, atol=1e-12)
+  np.testing.assert_allclose(jacobian_batch(q), [jacobian(x) for x in q], rtol=0, atol=1e-12)
+
+
+def test_closed_form_3x3_helpers():
+  rng = np.random.default_rng(1)
+  for i in range(50):
+    A = rng.normal(size=(3,3))
+    np.testing.assert_allclose(inverse_3x3(A), np.linalg.inv(A), rtol=1e-9, atol=1e-9)
+    S = A @ A.T
+    np.testing.assert_allclose(symmetric_eigenvalues_3x3(S), np.linalg.eigvalsh(S), rtol=1e-9, atol=1e-9)
+
+
+def test_damped_least_squares_is_pseudo_inverse_away_from_singularities():
+  v = np.array([0.3, -0.2, 0.5])
+  for q in joint_vectors(50, seed=2):
+    J = jacobian(q)
+    if np.linalg.svd(J, compute_uv=False).min() < 1.0:
+      continue
+    dq, condition = damped_least_squares(J, v)
+    np.testing.assert_allclose(dq, np.linalg.pinv(J) @ v, atol=1e-10)
+    np.testing.assert_allclose(condition, np.linalg.cond(J), rtol=1e-9)
+
+
+def test_damped_least_squares_is_bounded_at_singular_pose():
+  # arm stretched straight up, every joint axis is orthogonal to the vertical
+  J = jacobian(np.zeros(4))
+  dq, condition = damped_least_squares(J, np.array([0.0, 0.0, 1.0]))
+  assert np.all(np.isfinite(dq))
+  assert condition == np.inf or condition > 1e6
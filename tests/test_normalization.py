@@ -0,0 +1,23 @@
+import numpy as np
+from ivr_assignment.normalization import rgb_normalizer, normalize_rgb_float, build_reciprocal_table, RECIPROCAL_SHIFT, MAX_CHANNEL_SUM
+
+
+def test_reciprocal_table_is_exact_for_every_channel_and_sum():
+  # every channel value c up to every channel sum s, against the float expression of normalize_rgb_float
+  sums, values = np.meshgrid(np.arange(1, MAX_CHANNEL_SUM+1), np.arange(256), indexing='ij')
+  valid = values <= sums
+  sums, values = sums[valid], values[valid]
+  table = build_reciprocal_table().astype(np.uint64)
+  fixed_point = (values.astype(np.uint64)*table[sums]) >> np.uint64(RECIPROCAL_SHIFT)
+  reference = ((values/sums)*255.0).astype(np.uint8)
+  np.testing.assert_array_equal(fixed_point, reference)
+
+
+def test_normalizer_matches_float_normalization():
+  rng = np.random.default_rng(0)
+  normalizer = rgb_normalizer()
+  for shape in [(64,80,3), (200,200,3), (64,80,3)]:
+    img = rng.integers(0, 256, shape, dtype=np.uint8)
+    # black, white and single channel pixels
+    img[0,:4] = [[0, 0, 0], [255, 255, 255], [255, 0, 0], [0, 0, 1]]
+    np.testing.assert_array_equal(normalizer.normalize(img), normalize_rgb_float(img))
@@ -0,0 +1,27 @@
+import threading
+import numpy as np
+from ivr_assignment.profiling import rolling_histogram, latency_profiler
+
+
+def test_histogram_counts_samples_from_several_threads():
+  histogram = rolling_histogram(window=100)
+
+  def add():
+    for i in range(20000):
+      histogram.add(1.0)
+
+  threads = [threading.Thread(target=add) for i in range(4)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert histogram.count == 80000
+  np.testing.assert_array_equal(histogram.percentiles(), [1.0, 1.0, 1.0, 1.0])
+
+
+def test_disabled_profiler_records_nothing():
+  profiler = latency_profiler()
+  with profiler.stage('stage'):
+    pass
+  profiler.record('end_to_end', 0.1)
+  assert profiler.summary() == {}
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from synthetic import synthetic_frames
+from ivr_assignment.normalization import rgb_normalizer
+from ivr_assignment.colour_classifier import colour_classifier, JOINT_NAMES
+from ivr_assignment.detection import get_target_image_coord
+from ivr_assignment.pyramid import pyramid_detector
+
+
+def full_resolution(image):
+  # centroids, target and pixel areas of the full frame search the pyramid replaces
+  normalized = rgb_normalizer().normalize(image)
+  classifier = colour_classifier(dilation=2)
+  classifier.classify(normalized)
+  centroids = dict((name, classifier.centroid(name)) for name in JOINT_NAMES)
+  areas = dict((name, classifier.moments[name][0]) for name in JOINT_NAMES)
+  return centroids, get_target_image_coord(normalized, classifier.mask('orange')), areas
+
+
+@pytest.mark.parametrize('factor', [2, 4])
+@pytest.mark.parametrize('seed', [0, 4])
+def test_pyramid_matches_full_resolution(factor, seed):
+  detector = pyramid_detector(factor=factor, dilation=2)
+  yz_frames, xz_frames, joint_vectors = synthetic_frames(20, seed=seed)
+  for frame in np.concatenate([yz_frames, xz_frames]):
+    centroids, target = detector.locate(frame)
+    expected_centroids, expected_target, areas = full_resolution(frame)
+    for name in JOINT_NAMES:
+      if np.allclose(centroids[name], expected_centroids[name], equal_nan=True):
+        continue
+      # only a sphere cut into slivers by the arm can lose pixels below the coarse step.
+      # the yellow sphere is never covered and gives the area of a whole one
+      assert factor > 2 and areas[name] < areas['yellow']/2
+    assert (target is None) == (expected_target is None)
+    if expected_target is not None:
+      np.testing.assert_allclose(target, expected_target)
+
+
+def test_missing_colour():
+  frame = synthetic_frames(1, seed=0)[0][0].copy()
+  frame[:] = 255
+  centroids, target = pyramid_detector(factor=2).locate(frame)
+  assert all(np.isnan(centroids[name]).all() for name in JOINT_NAMES)
+  assert target is None
+
+
+def test_factor_must_be_positive():
+  with pytest.raises(ValueError):
+    pyramid_detector(factor=0)
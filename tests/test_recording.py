@@ -0,0 +1,30 @@
+import numpy as np
+from ivr_assignment.recording import frame_recorder, frame_recording
+
+
+def frame(value):
+  return np.full((4,6,3), value, np.uint8)
+
+
+def test_recording_round_trip(tmp_path):
+  recorder = frame_recorder(str(tmp_path), 4, 6, capacity=10)
+  for i in range(3):
+    recorder.append(frame(i), frame(i + 100), stamp=i*0.1, joint_positions=[i, 0, 0, 0])
+  recorder.close()
+  recording = frame_recording(str(tmp_path))
+  assert len(recording) == 3
+  yz_image, xz_image = recording.frame_pair(2)
+  np.testing.assert_array_equal(yz_image, frame(2))
+  np.testing.assert_array_equal(xz_image, frame(102))
+  np.testing.assert_array_equal(recording.joint_positions[:,0], [0, 1, 2])
+  assert np.isnan(recording.target_positions).all()
+
+
+def test_unclosed_recording_keeps_written_frames(tmp_path):
+  # a recorder that is killed before close still leaves every frame up to the last metadata update
+  recorder = frame_recorder(str(tmp_path), 4, 6, capacity=100, meta_interval=5)
+  for i in range(12):
+    recorder.append(frame(i), frame(i), stamp=float(i))
+  recording = frame_recording(str(tmp_path))
+  assert len(recording) == 10
+  np.testing.assert_array_equal(recording.stamps, np.arange(10))
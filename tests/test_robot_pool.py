@@ -0,0 +1,77 @@
+import threading
+import numpy as np
+from ivr_assignment.robot_pool import robot_pool
+
+
+class fake_pipeline:
+  # records the pairs it processed; the first pair blocks until release is set
+  def __init__(self, robot, order, block=False):
+    self.robot = robot
+    self.order = order
+    self.started = threading.Event()
+    self.release = threading.Event()
+    if not block:
+      self.release.set()
+
+  def process(self, yz_image, xz_image):
+    self.started.set()
+    self.release.wait(5)
+    self.order.append((self.robot, yz_image))
+    return yz_image
+
+
+def test_robots_are_served_round_robin():
+  order = []
+  pipelines = [fake_pipeline(0, order, block=True), fake_pipeline(1, order), fake_pipeline(2, order)]
+  pool = robot_pool(pipelines, workers=1)
+  try:
+    pool.submit(0, 'a', None)
+    assert pipelines[0].started.wait(5)
+    # robot 0 is in flight, its next pair waits behind the robots that became ready first
+    pool.submit(0, 'b', None)
+    pool.submit(1, 'c', None)
+    pool.submit(2, 'd', None)
+    pipelines[0].release.set()
+    pool.wait()
+  finally:
+    pool.close()
+  assert order == [(0, 'a'), (1, 'c'), (2, 'd'), (0, 'b')]
+
+
+def test_freshest_pair_replaces_the_pending_one():
+  order = []
+  pipelines = [fake_pipeline(0, order, block=True), fake_pipeline(1, order)]
+  estimates = []
+  pool = robot_pool(pipelines, workers=1, on_estimate=lambda robot, estimate, context: estimates.append((robot, estimate, context)))
+  try:
+    pool.submit(0, 'a', None, context=1)
+    assert pipelines[0].started.wait(5)
+    pool.submit(0, 'b', None, context=2)
+    pool.submit(0, 'c', None, context=3)
+    pool.submit(1, 'd', None, context=4)
+    pool.submit(1, 'e', None, context=5)
+    pipelines[0].release.set()
+    pool.wait()
+    throughput, counts = pool.stats()
+  finally:
+    pool.close()
+  assert order == [(0, 'a'), (1, 'e'), (0, 'c')]
+  assert estimates == [(0, 'a', 1), (1, 'e', 5), (0, 'c', 3)]
+  np.testing.assert_array_equal(counts, [[2, 1], [1, 1]])
+
+
+def test_errors_do_not_stop_the_workers():
+  class failing_pipeline:
+    def process(self, yz_image, xz_image):
+      raise RuntimeError("vision failed")
+
+  order = []
+  pool = robot_pool([failing_pipeline(), fake_pipeline(1, order)], workers=2)
+  try:
+    pool.submit(0, 'a', None)
+    pool.submit(1, 'b', None)
+    pool.wait()
+  finally:
+    pool.close()
+  assert pool.errors == 1
+  assert order == [(1, 'b')]
@@ -0,0 +1,96 @@
+import numpy as np
+import cv2
+import pytest
+from ivr_assignment.normalization import rgb_normalizer
+from ivr_assignment.colour_classifier import colour_classifier, JOINT_NAMES
+from ivr_assignment.roi_tracking import roi_tracker
+
+COLOURS = {'yellow': (0, 255, 255), 'blue': (255, 0, 0), 'green': (0, 255, 0), 'red': (0, 0, 255)}
+ORANGE = (0, 128, 255)
+
+
+def scene(centres, sphere, box):
+  # 800x800 bgr frame with the joint spheres at centres, the orange sphere and the orange box next to it
+  rng = np.random.default_rng(0)
+  image = np.full((800,800,3), 178, np.uint8)
+  cv2.add(image, rng.integers(0, 12, image.shape, dtype=np.uint8), dst=image)
+  for name, centre in zip(JOINT_NAMES, centres):
+    cv2.circle(image, tuple(int(c) for c in centre), 14, COLOURS[name], -1)
+  cv2.circle(image, tuple(int(c) for c in sphere), 14, ORANGE, -1)
+  cv2.rectangle(image, (int(box[0]) - 14, int(box[1]) - 14), (int(box[0]) + 14, int(box[1]) + 14), ORANGE, -1)
+  return image
+
+
+def moving_frames(count, step=2):
+  # small steps between frames, as at the camera rate, with the box cut by the target window
+  centres = np.array([[398, 535], [398, 470], [430, 380], [470, 300]])
+  return [scene(centres + step*i*np.array([0, 0, 1, 1])[:,None], (300 + step*i, 200), (350 + step*i, 210)) for i in range(count)]
+
+
+def detect_sphere(image, mask):
+  # the one orange blob that does not fill its bounding box, None when that is ambiguous
+  count, labels, stats, centroids = cv2.connectedComponentsWithStats(mask)
+  spheres = [label for label in range(1, count) if stats[label,4] <= 0.95*stats[label,2]*stats[label,3]]
+  if len(spheres) != 1:
+    return None
+  return np.array([int(x) for x in centroids[spheres[0]]])
+
+
+def full_frame(image):
+  # centroids and target of the full frame search the tracker must reproduce
+  normalized = rgb_normalizer().normalize(image)
+  classifier = colour_classifier()
+  classifier.classify(normalized)
+  return dict((name, classifier.centroid(name)) for name in JOINT_NAMES), detect_sphere(normalized, classifier.mask('orange'))
+
+
+def assert_same(tracker, image):
+  expected_centroids, expected_target = full_frame(image)
+  centroids = tracker.locate(image, JOINT_NAMES)
+  target = tracker.locate_target(image, detect_sphere)
+  for name in JOINT_NAMES:
+    np.testing.assert_array_equal(centroids[name], expected_centroids[name])
+  np.testing.assert_array_equal(target, expected_target)
+
+
+def test_windows_match_full_frame_search():
+  tracker = roi_tracker()
+  for image in moving_frames(10):
+    assert_same(tracker, image)
+  # everything but the first frame is found in the windows, including the target next to the orange box
+  assert tracker.roi_attempts == 9*5
+  assert tracker.hit_rate() == 1.0
+
+
+def test_immediate_fallback_searches_the_same_frame():
+  tracker = roi_tracker(fallback='immediate')
+  frames = moving_frames(2, step=100)
+  assert_same(tracker, frames[0])
+  # the green and red spheres and the target jump far outside their windows
+  assert_same(tracker, frames[1])
+  assert tracker.hit_rate() < 1.0
+
+
+def test_deferred_fallback_searches_the_next_frame():
+  tracker = roi_tracker(fallback='deferred')
+  first, second = moving_frames(2, step=100)
+  first_centroids = tracker.locate(first, JOINT_NAMES)
+  tracker.locate_target(first, detect_sphere)
+  # a lost sphere keeps its last position for one frame, then the full search finds it
+  centroids = tracker.locate(second, JOINT_NAMES)
+  assert tracker.locate_target(second, detect_sphere) is None
+  np.testing.assert_array_equal(centroids['red'], first_centroids['red'])
+  assert_same(tracker, second)
+
+
+def test_full_search_interval():
+  tracker = roi_tracker(full_search_interval=2)
+  for image in moving_frames(4):
+    assert_same(tracker, image)
+  # frames 2 and 4 are searched in full
+  assert tracker.roi_attempts == 5
+
+
+def test_unknown_fallback():
+  with pytest.raises(ValueError):
+    roi_tracker(fallback='never')
@@ -0,0 +1,51 @@
+import pytest
+from ivr_assignment.scheduling import rate_scheduler
+
+
+class fake_clock:
+
+  # simulated time, sleeping advances it instead of blocking
+  def __init__(self):
+    self.time = 0.0
+
+  def __call__(self):
+    return self.time
+
+  def sleep(self, seconds):
+    self.time += seconds
+
+
+def tick(scheduler):
+  scheduler.notify()
+  return scheduler.wait()
+
+
+def test_steady_ticks_step_one_period():
+  clock = fake_clock()
+  scheduler = rate_scheduler(20, clock=clock, sleep=clock.sleep)
+  assert [tick(scheduler) for i in range(5)] == pytest.approx([0.05]*5)
+  assert clock.time == pytest.approx(0.2)
+  assert scheduler.deadline_misses == 0
+
+
+def test_gap_in_input_restarts_with_one_period():
+  clock = fake_clock()
+  scheduler = rate_scheduler(20, clock=clock, sleep=clock.sleep, idle_timeout=0.01)
+  tick(scheduler)
+  tick(scheduler)
+  # no estimates for 3 seconds
+  assert scheduler.wait() is None
+  clock.time += 3.0
+  assert tick(scheduler) == pytest.approx(0.05)
+  assert tick(scheduler) == pytest.approx(0.05)
+  assert scheduler.deadline_misses == 0
+
+
+def test_late_tick_step_is_clamped():
+  clock = fake_clock()
+  scheduler = rate_scheduler(20, clock=clock, sleep=clock.sleep, wait_for_data=False)
+  scheduler.wait()
+  # a step that runs for a second misses many deadlines but the next step stays bounded
+  clock.time += 1.0
+  assert scheduler.wait() == pytest.approx(0.1)
+  assert scheduler.deadline_misses > 0
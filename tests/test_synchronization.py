@@ -0,0 +1,70 @@
+import pytest
+from ivr_assignment.synchronization import pair_synchronizer
+
+
+def test_pairs_messages_within_slop():
+  sync = pair_synchronizer(slop=0.01)
+  assert sync.add(0, 1.000, 'yz1') is None
+  assert sync.add(1, 1.005, 'xz1') == ('yz1', 'xz1', 1.005)
+  # the pair comes out in stream order whichever stream completes it
+  assert sync.add(1, 2.000, 'xz2') is None
+  assert sync.add(0, 2.000, 'yz2') == ('yz2', 'xz2', 2.000)
+  assert sync.counts() == [2, 0, 0]
+
+
+def test_exact_stamps_with_zero_slop():
+  # slop 0 only pairs identical stamps, like message_filters.TimeSynchronizer
+  sync = pair_synchronizer(slop=0.0)
+  assert sync.add(0, 1.0, 'yz1') is None
+  assert sync.add(1, 1.001, 'xz1') is None
+  assert sync.add(1, 1.0, 'xz0') == ('yz1', 'xz0', 1.0)
+
+
+def test_freshest_pair_drops_older_messages():
+  sync = pair_synchronizer(slop=0.01)
+  for i in range(3):
+    sync.add(0, i*0.1, 'yz' + str(i))
+  # pairs with the newest frame of the other stream, the two older ones are dropped
+  assert sync.add(1, 0.2, 'xz2') == ('yz2', 'xz2', 0.2)
+  assert sync.counts() == [1, 2, 0]
+  # a late message behind the last pair can never be paired
+  assert sync.add(0, 0.15, 'late') is None
+  assert sync.counts() == [1, 3, 0]
+
+
+def test_queue_size_bounds_unpaired_messages():
+  sync = pair_synchronizer(slop=0.01, queue_size=2)
+  for i in range(5):
+    assert sync.add(0, float(i), 'yz' + str(i)) is None
+  assert len(sync.queues[0]) == 2
+  assert sync.counts() == [0, 3, 0]
+
+
+def test_claim_skips_superseded_pairs():
+  sync = pair_synchronizer(slop=0.01)
+  sync.add(0, 1.0, 'yz1')
+  first = sync.add(1, 1.0, 'xz1')
+  sync.add(0, 2.0, 'yz2')
+  second = sync.add(1, 2.0, 'xz2')
+  # the first pair was still waiting for the consumer when the second one arrived
+  assert not sync.claim(first[2])
+  assert sync.claim(second[2])
+  assert sync.counts() == [2, 0, 1]
+
+
+def test_drop_rate():
+  sync = pair_synchronizer(slop=0.01)
+  assert sync.drop_rate() == 0.0
+  sync.add(0, 0.9, 'yz0')
+  sync.add(0, 1.0, 'yz1')
+  first = sync.add(1, 1.0, 'xz1')
+  sync.add(0, 2.0, 'yz2')
+  sync.add(1, 2.0, 'xz2')
+  sync.claim(first[2])
+  # 5 messages received: one dropped without a partner and one stale pair of two
+  assert sync.drop_rate() == pytest.approx(3/5)
+
+
+def test_invalid_queue_size():
+  with pytest.raises(ValueError):
+    pair_synchronizer(queue_size=0)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from ivr_assignment.trajectories import trajectory_tables, sample_waypoints, sample_trajectory
+
+
+def original_paths(t):
+  # the analytic paths target_move.py published before the lookup tables, and their velocities
+  w = np.pi/15
+  target = [0.5 + 2.5*np.cos(w*t), 2.5*np.sin(w*t), 7 + np.sin(w*t)]
+  target2 = [2 + 2*np.cos(w*t), 2.5 + 1.5*np.sin(w*t), 7.5]
+  target_velocity = [-2.5*w*np.sin(w*t), 2.5*w*np.cos(w*t), w*np.cos(w*t)]
+  target2_velocity = [-2*w*np.sin(w*t), 1.5*w*np.cos(w*t), 0.0]
+  return np.array([target, target2]), np.array([target_velocity, target2_velocity])
+
+
+def test_default_tables_reproduce_the_original_paths():
+  tables = trajectory_tables()
+  # over two periods, between and on the samples
+  for t in np.concatenate([np.linspace(0, 60, 997), np.arange(0, 60, 30/1024)]):
+    positions, velocities = original_paths(t)
+    np.testing.assert_allclose(tables.positions_at(t), positions, rtol=0, atol=2e-5)
+    np.testing.assert_allclose(tables.velocities_at(t), velocities, rtol=0, atol=1e-4)
+
+
+def test_waypoints_are_visited_in_a_closed_loop():
+  waypoints = [[0, 0, 7], [2, 0, 7], [2, 2, 7]]
+  t = np.array([0.0, 1.0, 2.0, 3.0, 0.5, 4.0])
+  np.testing.assert_allclose(sample_waypoints(t, 3.0, waypoints),
+                             [[0, 0, 7], [2, 0, 7], [2, 2, 7], [0, 0, 7], [1, 0, 7], [2, 0, 7]])
+
+
+def test_index_and_unknown_shape():
+  tables = trajectory_tables()
+  assert tables.index('target2') == 1
+  with pytest.raises(ValueError):
+    sample_trajectory({'shape': 'spiral', 'period': 1.0}, np.zeros(1))